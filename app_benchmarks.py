@@ -0,0 +1,620 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Benchmarks for the Dash app.
+
+Run from the repository root, e.g. `python app_benchmarks.py set_index`. Uses the results store written
+by the pipeline if there is one, otherwise rebuilds one from the scraped data store into a temporary folder.
+"""
+
+# imports
+import copy
+import gc
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import random
+import runpy
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import pandas as pd
+import plotly.io as pio
+
+from results_store import ResultsSnapshot, ResultsStore, open_results, snapshot_path, write_snapshot
+from set_index import SetIndex
+
+DATA_COLLECTION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_collection")
+RESULTS_DB = os.path.join(DATA_COLLECTION, "results", "latest", "results.db")
+SET_CALENDAR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "set_release_calendar.csv")
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+
+_tmp_dir = None
+
+
+def results_db():
+    """Return the path of a results store to benchmark, rebuilding one offline if the pipeline hasn't written one."""
+    global _tmp_dir
+    if os.path.exists(RESULTS_DB):
+        return RESULTS_DB
+
+    if _tmp_dir is None:
+        # The offline rebuild lives with the pipeline
+        sys.path.append(DATA_COLLECTION)
+        from rebuild_results import rebuild_results
+
+        _tmp_dir = tempfile.TemporaryDirectory()
+        logging.getLogger().setLevel(logging.WARNING)
+        rebuild_results(db_path=os.path.join(_tmp_dir.name, "results.db"),
+                        results_csv=os.path.join(_tmp_dir.name, "scrape_results.csv"))
+
+    return os.path.join(_tmp_dir.name, "results.db")
+
+
+def set_calendar():
+    set_calendar_df = pd.read_csv(SET_CALENDAR)
+    set_calendar_df["set_name"] = set_calendar_df["set_name"].str.strip()
+
+    return set_calendar_df
+
+
+def query_callbacks(results_store, set_calendar_df, selected_format, opp_decks=None):
+    """What the callbacks looked up on a set change before the set index: calendar filter and store query each time."""
+    def set_dates():
+        set_df = set_calendar_df[set_calendar_df["set_name"] == selected_format]
+        return set_df.iloc[0]["start_date"], set_df.iloc[0]["end_date"]
+
+    lookups = {}
+    lookups["active_decks"] = results_store.games_per_deck(*set_dates())["deck"].unique().tolist()
+    gp_df = results_store.games_per_deck(*set_dates())
+    deck = gp_df.sort_values("games_played", ascending=False)["deck"].unique()[0]
+    lookups["active_deck"] = deck
+    deck_df = results_store.query(*set_dates(), decks=[deck])
+    lookups["opp_deck_options"] = deck_df[deck_df["deck"] == deck].sort_values("opposing_deck")["opposing_deck"].unique().tolist()
+    gp_df = results_store.games_per_deck(*set_dates())
+    top_decks = gp_df.sort_values("games_played", ascending=False)["deck"].unique().tolist()[0:5]
+    lookups["opp_decks"] = top_decks
+    opp_decks = top_decks if opp_decks is None else opp_decks
+    lookups["graph"] = results_store.query(*set_dates(), decks=[deck], opposing_decks=opp_decks)
+    unique_decks = list(dict.fromkeys(opp_decks + [deck]))
+    lookups["heatmap"] = results_store.query(*set_dates(), decks=unique_decks, opposing_decks=unique_decks)
+
+    return lookups
+
+
+def index_callbacks(set_index, selected_format, opp_decks=None):
+    """The same lookups from the set index."""
+    lookups = {}
+    lookups["active_decks"] = set_index.decks(selected_format)
+    deck = set_index.top_decks(selected_format, 1)[0]
+    lookups["active_deck"] = deck
+    lookups["opp_deck_options"] = set_index.opp_decks(selected_format, deck)
+    top_decks = set_index.top_decks(selected_format, 5)
+    lookups["opp_decks"] = top_decks
+    opp_decks = top_decks if opp_decks is None else opp_decks
+    lookups["graph"] = set_index.matchups(selected_format, [deck], opposing_decks=opp_decks)
+    unique_decks = list(dict.fromkeys(opp_decks + [deck]))
+    lookups["heatmap"] = set_index.matchups(selected_format, unique_decks, opposing_decks=unique_decks)
+
+    return lookups
+
+
+def bench_set_index(repeat=5):
+    """Compare a set change answered by calendar filters and store queries with lookups in the set index."""
+    set_calendar_df = set_calendar()
+    with ResultsStore(results_db(), read_only=True) as results_store:
+        start = time.perf_counter()
+        set_index = SetIndex(results_store, set_calendar_df)
+        build_seconds = time.perf_counter() - start
+
+        # Only sets with results; the rest would fail the same way either way
+        set_names = [set_name for set_name in set_index.sets if set_index.decks(set_name)]
+
+        same = True
+        for set_name in set_names:
+            old = query_callbacks(results_store, set_calendar_df, set_name)
+            new = index_callbacks(set_index, set_name)
+            for key, value in old.items():
+                same = same and (value.equals(new[key]) if isinstance(value, pd.DataFrame) else value == new[key])
+
+        times = {}
+        for name, callbacks in (("queries", lambda s: query_callbacks(results_store, set_calendar_df, s)),
+                                ("set index", lambda s: index_callbacks(set_index, s))):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for set_name in set_names:
+                    callbacks(set_name)
+            times[name] = (time.perf_counter() - start) / (repeat * len(set_names))
+
+    print(f"{len(set_names)} sets with results; set index built in {1000 * build_seconds:.1f}ms")
+    print(f"Identical dropdowns and matchups: {same}")
+    for name, seconds in times.items():
+        print(f"{name:>10}: {1000 * seconds:7.2f}ms per set change")
+
+    return times, same
+
+
+def load_app(cache_dir, db_path=None, poll_seconds=60):
+    """Import the Dash app against a results store (the benchmark's by default), with its figure cache in cache_dir."""
+    os.environ["RESULTS_DB"] = db_path or results_db()
+    os.environ["FIGURE_CACHE_DIR"] = cache_dir
+    os.environ["DATA_POLL_SECONDS"] = str(poll_seconds)
+    import data_watcher
+    import figure_cache
+    importlib.reload(data_watcher)
+    importlib.reload(figure_cache)
+    if "plot_win_rates" not in sys.modules:
+        return importlib.import_module("plot_win_rates")
+
+    # Only one app's watcher polls at a time
+    sys.modules["plot_win_rates"].app_data.stop()
+    return importlib.reload(sys.modules["plot_win_rates"])
+
+
+def popular_requests(app, n_requests=200, seed=0):
+    """Draw (callback, inputs) requests where a few popular decks and sets come up most of the time."""
+    rng = random.Random(seed)
+    set_index = app.app_data.get().set_index
+    set_names = [set_name for set_name in set_index.sets if set_index.decks(set_name)]
+    requests = []
+    for _ in range(n_requests):
+        # Recent sets first
+        set_name = set_names[-1 - min(int(rng.expovariate(0.7)), len(set_names) - 1)]
+        top_decks = set_index.top_decks(set_name, 10)
+        deck = top_decks[min(int(rng.expovariate(0.8)), len(top_decks) - 1)]
+        opp_decks = set_index.top_decks(set_name, 5)
+        if rng.random() < 0.3:
+            # Same decks picked in another order
+            opp_decks = rng.sample(opp_decks, len(opp_decks))
+        callback = "build_graph" if rng.random() < 0.5 else "build_heatmap"
+        requests.append((callback, (set_name, deck, opp_decks)))
+
+    return requests
+
+
+def _serve(args):
+    """Answer requests in a worker process, the way a gunicorn worker would."""
+    cache_dir, requests = args
+    # Forked from the benchmark, which already imported the app
+    app = sys.modules["plot_win_rates"]
+    for callback, inputs in requests:
+        getattr(app, callback)(inputs[0], inputs[1], list(inputs[2]))
+
+    return os.getpid()
+
+
+def bench_figure_cache(n_requests=200, workers=2):
+    """Serve popular requests from worker processes sharing the figure cache, and check cached figures are unchanged."""
+    logging.getLogger().setLevel(logging.WARNING)
+    results_db()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        app = load_app(cache_dir)
+        requests = popular_requests(app, n_requests)
+
+        # No cache: every request builds its figure
+        start = time.perf_counter()
+        for callback, inputs in requests:
+            getattr(app, callback).__wrapped__(inputs[0], inputs[1], list(inputs[2]))
+        uncached_ms = 1000 * (time.perf_counter() - start) / len(requests)
+
+        # Worker processes take turns through the requests, sharing the cache folder
+        chunks = [(cache_dir, requests[i::workers]) for i in range(workers)]
+        start = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            pids = set(pool.map(_serve, chunks))
+        cached_ms = 1000 * (time.perf_counter() - start) / len(requests)
+        stats = app.figure_cache.stats()
+
+        # The counts of exited workers are deleted by gunicorn's child_exit hook
+        child_exit = runpy.run_path(GUNICORN_CONF)["child_exit"]
+        for pid in pids:
+            child_exit(None, types.SimpleNamespace(pid=pid))
+        exited = app.figure_cache.stats()["workers"] == 0
+
+        # A cached figure is the figure the callback builds
+        callback, inputs = requests[0]
+        fresh = json.loads(pio.to_json(getattr(app, callback).__wrapped__(inputs[0], inputs[1], list(inputs[2])),
+                                       validate=False))
+        same = getattr(app, callback)(inputs[0], inputs[1], list(inputs[2])) == fresh
+
+        # A new data version misses
+        new_data = copy.copy(app.app_data.current)
+        new_data.version = "new-version"
+        app.app_data.current = new_data
+        hits = app.figure_cache.counts["hits"]
+        getattr(app, callback)(inputs[0], inputs[1], list(inputs[2]))
+        invalidated = app.figure_cache.counts["hits"] == hits and app.figure_cache.stats()["entries"] == 1
+
+    print(f"{len(requests)} requests, {len(set(map(str, requests)))} distinct, {workers} workers sharing the cache")
+    print(f"Cached figure identical to a fresh one: {same}; new data version misses: {invalidated}")
+    print(f"Stats: {stats}")
+    print(f"Counts of exited workers dropped: {exited}")
+    print(f"   no cache: {uncached_ms:7.2f}ms per request")
+    print(f"with cache: {cached_ms:7.2f}ms per request (including worker start up)")
+
+    return stats, same and invalidated and exited
+
+
+def legacy_build_heatmap(app, selected_format, selected_active_deck, selected_opp_deck):
+    """build_heatmap before it was vectorized: total_gp applied row by row, then the matrix and hovertext filled in loops."""
+    # The app no longer imports the pipeline's analysis module
+    from limitless_analysis import total_gp
+
+    go = app.go
+    selected_opp_deck.append(selected_active_deck)
+    unique_decks = []
+    for deck in selected_opp_deck:
+        if deck not in unique_decks:
+            unique_decks.append(deck)
+
+    filtered_df = app.app_data.get().set_index.matchups(selected_format, unique_decks, opposing_decks=unique_decks)
+
+    heatmap_gp = pd.DataFrame(columns=unique_decks, index=unique_decks)
+    heatmap_wr = pd.DataFrame(columns=unique_decks, index=unique_decks)
+
+    filtered_df["total_games"] = filtered_df.apply(lambda x: total_gp(filtered_df, x), axis=1)
+    filtered_df["weight"] = filtered_df["games_played"]/filtered_df["total_games"]
+    filtered_df["wt_wr"] = filtered_df["winrate"] * filtered_df["weight"]
+
+    agg_df = filtered_df.groupby(['deck', 'opposing_deck']).agg({"wt_wr": "sum", "games_played": "sum"}).reset_index()
+
+    for active_deck in heatmap_wr:
+        filtered_df = agg_df[agg_df['deck']==active_deck]
+        wr_ls = []
+        gp_ls = []
+        for deck in heatmap_wr.index:
+            if deck in filtered_df['opposing_deck'].unique():
+                winrate = filtered_df[filtered_df['opposing_deck']==deck].iloc[0]['wt_wr']
+                gp = filtered_df[filtered_df['opposing_deck']==deck].iloc[0]['games_played']
+                wr_ls.append(round(winrate,2))
+                gp_ls.append(gp)
+            else:
+                wr_ls.append(None)
+                gp_ls.append(None)
+        heatmap_wr[active_deck] = wr_ls
+        heatmap_gp[active_deck] = gp_ls
+
+    hovertext = []
+    for xi, xx in enumerate(heatmap_wr.columns):
+        hovertext.append(list())
+        for yi, yy in enumerate(heatmap_wr.index):
+            hovertext[-1].append(f"Active Deck: {yy}<br />Opposing Deck: {xx}<br />Win Rate: {heatmap_wr.values[xi][yi]}<br />Games Played: {heatmap_gp.values[xi][yi]}")
+
+    fig = go.Figure(data=go.Heatmap(z=heatmap_wr.values, x=heatmap_wr.columns.tolist(), y=heatmap_wr.index.tolist(),
+                                    hoverinfo='text', text=hovertext, texttemplate="%{z}", textfont={"size": 12},
+                                    hoverongaps=False, xgap=3, ygap=3))
+    fig.update_layout(title_text=f"Average win rates since {selected_format}'s release",
+                      title={"x": 0.5, "y": 0.9, "xanchor": "center", "yanchor": "bottom"},
+                      xaxis_title="Active Decks", yaxis_title="Opposing Decks")
+
+    return fig
+
+
+def bench_heatmap(deck_counts=(5, 20, 60), repeat=3):
+    """Compare the old and vectorized build_heatmap on the most played decks of a set, checking the figures match."""
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        app = load_app(cache_dir)
+    build_heatmap = app.build_heatmap.__wrapped__
+    set_index = app.app_data.get().set_index
+
+    # Every set with results, with its most played deck (or none) against the next most played ones, plus a deck it never saw
+    same = True
+    cases = 0
+    for set_name in set_index.sets:
+        top_decks = set_index.top_decks(set_name)
+        if not top_decks:
+            continue
+        # The last case is a cleared active deck dropdown
+        for active_deck, n in ((top_decks[0], 1), (top_decks[0], 5), (top_decks[0], 20), (None, 5)):
+            opp_decks = top_decks[1:n + 1] + ["Not A Deck"]
+            old = pio.to_json(legacy_build_heatmap(app, set_name, active_deck, list(opp_decks)), validate=False)
+            selected = list(opp_decks)
+            new = pio.to_json(build_heatmap(set_name, active_deck, selected), validate=False)
+            same = same and old == new and selected == opp_decks
+            cases += 1
+    print(f"Identical figures for {cases} set and deck selections: {same}")
+
+    set_name = max(set_index.sets, key=lambda set_name: len(set_index.decks(set_name)))
+    top_decks = set_index.top_decks(set_name)
+    times = {}
+    for n in deck_counts:
+        active_deck, opp_decks = top_decks[0], top_decks[1:n]
+        for name, func in (("legacy", lambda: legacy_build_heatmap(app, set_name, active_deck, list(opp_decks))),
+                           ("vectorized", lambda: build_heatmap(set_name, active_deck, list(opp_decks)))):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            times[(n, name)] = (time.perf_counter() - start) / repeat
+        print(f"{n:3d} decks ({set_name}): legacy {1000 * times[(n, 'legacy')]:8.1f}ms, "
+              f"vectorized {1000 * times[(n, 'vectorized')]:6.1f}ms")
+
+    return times, same
+
+
+def _figure_dict(figure):
+    """A callback's figure as a dictionary, whether it was built or served from the cache."""
+    return figure if isinstance(figure, dict) else json.loads(pio.to_json(figure, validate=False))
+
+
+def _layout_components(component):
+    """Every component in a Dash layout, depth first."""
+    yield component
+    children = getattr(component, "children", None)
+    for child in (children if isinstance(children, list) else [children]):
+        if hasattr(child, "to_plotly_json"):
+            yield from _layout_components(child)
+
+
+def bench_hot_reload(threads=4, seconds_before=1.0, seconds_after=1.0):
+    """Replace the results store under a running app while threads call its callbacks.
+
+    The new store gives the most played deck of the latest set every game, so old and new figures differ.
+    Every figure served has to be exactly the old or the new version's figure, and once the new version
+    is loaded only new figures may be served, from the callbacks and from the figure cache.
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir, tempfile.TemporaryDirectory() as cache_dir:
+        db_path = os.path.join(tmp_dir, "results.db")
+        shutil.copy(results_db(), db_path)
+        app = load_app(cache_dir, db_path=db_path, poll_seconds=0.05)
+        # Importing the app starts no watcher; the app's first request does
+        started_on_import = any(thread.name == "data-watcher" and thread.is_alive() for thread in threading.enumerate())
+        app.app_data.start()
+
+        old_data = app.app_data.get()
+        set_name = [set_name for set_name in old_data.set_index.sets if old_data.set_index.decks(set_name)][-1]
+        deck = old_data.set_index.top_decks(set_name, 1)[0]
+        opp_decks = old_data.set_index.top_decks(set_name, 5)
+        requests = [(app.build_graph, (set_name, deck, opp_decks)), (app.build_heatmap, (set_name, deck, opp_decks)),
+                    (app.available_opp_decks, (set_name,))]
+
+        # The new version, written next to the store the way rebuild_results writes one
+        new_path = os.path.join(tmp_dir, "results.db.new")
+        shutil.copy(db_path, new_path)
+        start_date, end_date = old_data.set_index.dates(set_name)
+        with ResultsStore(new_path) as store:
+            deck_df = store.query(start_date, end_date, decks=[deck])
+            deck_df["wins"], deck_df["losses"], deck_df["ties"] = deck_df["games_played"], 0, 0
+            store.upsert(deck_df)
+
+        old_figures = [_figure_dict(func.__wrapped__(*inputs)) if hasattr(func, "__wrapped__") else func(*inputs)
+                       for func, inputs in requests]
+
+        served = [[] for _ in range(threads)]
+        errors = []
+        stop = threading.Event()
+
+        def serve(results):
+            while not stop.is_set():
+                for i, (func, inputs) in enumerate(requests):
+                    try:
+                        start = time.perf_counter()
+                        output = func(*[list(x) if isinstance(x, list) else x for x in inputs])
+                        results.append((i, time.perf_counter(), time.perf_counter() - start,
+                                        _figure_dict(output) if i < 2 else output))
+                    except Exception as e:
+                        errors.append(repr(e))
+
+        workers = [threading.Thread(target=serve, args=(results,)) for results in served]
+        for worker in workers:
+            worker.start()
+        time.sleep(seconds_before)
+
+        swap_start = time.perf_counter()
+        os.replace(new_path, db_path)
+        while app.app_data.current is old_data and time.perf_counter() - swap_start < 60:
+            time.sleep(0.01)
+        swapped = time.perf_counter()
+        time.sleep(seconds_after)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        app.app_data.stop()
+
+        new_data = app.app_data.get()
+        # A page loaded after the swap lists the new version's decks
+        layout_decks = [component.options for component in _layout_components(app.serve_layout())
+                        if getattr(component, "id", None) in ("dropdown_deck", "dropdown_opp_deck")]
+        layout_current = layout_decks == [[{"label": x, "value": x} for x in decks]
+                                          for decks in (new_data.decks, new_data.opp_decks)]
+        new_figures = [_figure_dict(func.__wrapped__(*inputs)) if hasattr(func, "__wrapped__") else func(*inputs)
+                       for func, inputs in requests]
+        figure_files = os.listdir(os.path.join(cache_dir, "figures"))
+
+    results = [result for thread_results in served for result in thread_results]
+    # Only whole versions, and nothing old once the new version is in (allowing for calls that started before)
+    whole = all(output in (old_figures[i], new_figures[i]) for i, _, _, output in results)
+    stale = sum(output != new_figures[i] for i, done, seconds, output in results if done - seconds > swapped)
+    changed = all(old_figures[i] != new_figures[i] for i in range(2))
+    cached_new = all(filename.endswith(f"-{new_data.version}.json") for filename in figure_files)
+    latencies = sorted(seconds for _, _, seconds, _ in results)
+
+    print(f"{len(results)} callbacks from {threads} threads, {len(errors)} errors {errors[:3]}")
+    print(f"Store replaced, new version serving after {swapped - swap_start:.2f}s (polling every 0.05s)")
+    print(f"Old and new figures differ: {changed}; every figure a whole version: {whole}; "
+          f"stale after the swap: {stale}; cache only holds the new version: {cached_new} ({len(figure_files)} files)")
+    print(f"Watcher started on import: {started_on_import}; layout lists the new version's decks: {layout_current}")
+    print(f"Callback latency: median {1000 * latencies[len(latencies) // 2]:.1f}ms, max {1000 * latencies[-1]:.1f}ms")
+
+    return not errors and changed and whole and stale == 0 and cached_new and not started_on_import and layout_current
+
+
+def memory_usage(pid="self"):
+    """Resident, proportional, shared and private memory of a process in MB, from /proc (Linux only)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0]) / 1024
+
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+            "private": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def _memory_worker(ready, done, preload, db_path, cache_dir, post_fork):
+    """A forked worker: load the app unless the master preloaded it, answer popular requests, then wait to be measured."""
+    if post_fork is not None:
+        post_fork(None, None)
+    app = sys.modules["plot_win_rates"] if preload else load_app(cache_dir, db_path=db_path)
+    for callback, inputs in popular_requests(app, 50):
+        getattr(app, callback).__wrapped__(inputs[0], inputs[1], list(inputs[2]))
+    ready.release()
+    done.wait()
+
+
+def _memory_master(preload, db_path, workers, queue):
+    """Start workers the way gunicorn does, with or without preload_app, and measure every process."""
+    logging.getLogger().setLevel(logging.WARNING)
+    fork = multiprocessing.get_context("fork")
+    ready, done = fork.Semaphore(0), fork.Event()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        hooks = {}
+        if preload:
+            # The same hooks gunicorn runs with the repository's config
+            hooks = runpy.run_path(GUNICORN_CONF)
+            load_app(cache_dir, db_path=db_path)
+            hooks["on_starting"](None)
+        processes = []
+        for _ in range(workers):
+            if "pre_fork" in hooks:
+                hooks["pre_fork"](None, None)
+            process = fork.Process(target=_memory_worker,
+                                   args=(ready, done, preload, db_path, cache_dir, hooks.get("post_fork")))
+            process.start()
+            processes.append(process)
+        for _ in processes:
+            ready.acquire()
+
+        queue.put({"master": memory_usage(), "master_gc": gc.isenabled(),
+                   "workers": [memory_usage(process.pid) for process in processes]})
+        done.set()
+        for process in processes:
+            process.join()
+
+
+def bench_memory(workers=3):
+    """Per-worker memory of the app served by forked workers, each loading the app or sharing the master's preload."""
+    db_path = results_db()
+    spawn = multiprocessing.get_context("spawn")
+    reports = {}
+    for preload in (False, True):
+        # A fresh master for each mode, so nothing is loaded before it forks unless it preloads
+        queue = spawn.Queue()
+        master = spawn.Process(target=_memory_master, args=(preload, db_path, workers, queue))
+        master.start()
+        reports[preload] = queue.get()
+        master.join()
+
+    for preload, report in reports.items():
+        print(f"{'preload' if preload else 'per worker'}: master rss {report['master']['rss']:.1f}MB, "
+              f"garbage collection in the master after forking: {report['master_gc']}")
+        for stat in ("rss", "pss", "shared", "private"):
+            values = [worker[stat] for worker in report["workers"]]
+            print(f"  worker {stat:>7}: " + ", ".join(f"{value:6.1f}" for value in values) + "MB")
+        total = report["master"]["pss"] + sum(worker["pss"] for worker in report["workers"])
+        print(f"  total pss of master and {workers} workers: {total:.1f}MB")
+
+    return reports
+
+
+def _peak_rss():
+    """Highest resident memory of this process so far in MB (Linux only)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+
+def _startup(kind, path, queue):
+    """Load the app's results one way in a fresh process, measuring wall time and resident memory."""
+    before = memory_usage()["rss"]
+    start = time.perf_counter()
+    if kind == "csv":
+        # The app before the results store: the whole results CSV with inferred types
+        loaded = pd.read_csv(path)
+    else:
+        with (ResultsStore(path, read_only=True) if kind == "store" else open_results(path)) as results:
+            loaded = (SetIndex(results, set_calendar()), results.decks("deck"), results.decks("opposing_deck"))
+    seconds = time.perf_counter() - start
+    queue.put({"seconds": seconds, "before": before, "rss": memory_usage()["rss"], "peak": _peak_rss()})
+    del loaded
+
+
+def bench_snapshot(repeat=3):
+    """Compare loading the app's data from the binary snapshot with the results store and the results CSV."""
+    logging.getLogger().setLevel(logging.WARNING)
+    set_calendar_df = set_calendar()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "results.db")
+        csv_path = os.path.join(tmp_dir, "scrape_results.csv")
+        shutil.copy(results_db(), db_path)
+        with ResultsStore(db_path, read_only=True) as store:
+            plot_df = store.to_plot_df()
+            plot_df.to_csv(csv_path, header=True, index=False)
+            write_snapshot(plot_df, db_path)
+
+            # The snapshot answers every query the app makes with the store's DataFrames
+            with open_results(db_path) as snapshot:
+                same = isinstance(snapshot, ResultsSnapshot) and snapshot.query().equals(plot_df)
+                same = same and all(snapshot.decks(column) == store.decks(column) for column in ("deck", "opposing_deck"))
+                store_index, snapshot_index = SetIndex(store, set_calendar_df), SetIndex(snapshot, set_calendar_df)
+                for set_name in store_index.sets:
+                    if not store_index.decks(set_name):
+                        same = same and not snapshot_index.decks(set_name)
+                        continue
+                    old, new = index_callbacks(store_index, set_name), index_callbacks(snapshot_index, set_name)
+                    for key, value in old.items():
+                        same = same and (value.equals(new[key]) if isinstance(value, pd.DataFrame) else value == new[key])
+                frame_mb = {"csv": pd.read_csv(csv_path).memory_usage(deep=True).sum() / 2 ** 20,
+                            "snapshot": snapshot.plot_df.memory_usage(deep=True).sum() / 2 ** 20}
+
+        # A fresh process for every load, as when a dyno starts
+        spawn = multiprocessing.get_context("spawn")
+        results = {}
+        for kind, path in (("csv", csv_path), ("store", db_path), ("snapshot", db_path)):
+            runs = []
+            for _ in range(repeat):
+                queue = spawn.Queue()
+                process = spawn.Process(target=_startup, args=(kind, path, queue))
+                process.start()
+                runs.append(queue.get())
+                process.join()
+            results[kind] = {stat: min(run[stat] for run in runs) for stat in ("seconds", "before", "rss", "peak")}
+        sizes = {kind: os.path.getsize(path) / 2 ** 20
+                 for kind, path in (("csv", csv_path), ("store", db_path), ("snapshot", snapshot_path(db_path)))}
+
+    print(f"Snapshot gives identical queries, deck lists and set index lookups: {same}")
+    print(f"Results frame: csv {frame_mb['csv']:.1f}MB, snapshot {frame_mb['snapshot']:.1f}MB (deep memory usage)")
+    for kind, result in results.items():
+        loads = "read_csv only" if kind == "csv" else "set index and deck lists"
+        print(f"{kind:>9}: {1000 * result['seconds']:7.1f}ms, rss {result['before']:5.1f} -> {result['rss']:5.1f}MB, "
+              f"peak {result['peak']:5.1f}MB, {sizes[kind]:5.1f}MB on disk ({loads})")
+
+    return results, same
+
+
+BENCHMARKS = {
+    "set_index": bench_set_index,
+    "figure_cache": bench_figure_cache,
+    "heatmap": bench_heatmap,
+    "hot_reload": bench_hot_reload,
+    "memory": bench_memory,
+    "snapshot": bench_snapshot,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from limitless_scrape import fetch_page, find_round_count, parse_pairings_table, parse_players_table, trim_round_urls
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Maximum number of requests in flight to a single host
+MAX_REQUESTS_PER_HOST = 8
+
+
+class HostLimiter:
+    """Hand out one semaphore per host so that no host gets more than `limit` concurrent requests."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.semaphores = {}
+
+    def get(self, url):
+        host = urlparse(url).netloc
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.limit)
+
+        return self.semaphores[host]
+
+
+async def fetch_and_parse(url, parser, limiter, executor):
+    """Download a page and parse it without blocking the event loop.
+
+    The download is limited by the per-host semaphore. Both the blocking request and the
+    parsing run in the executor.
+
+    Arguments:
+        url (str): URL of the page to scrape.
+        parser (function): Function that turns the HTML of the page into a DataFrame.
+        limiter (HostLimiter): Per-host concurrency limiter.
+        executor (ThreadPoolExecutor): Executor that runs the blocking calls.
+
+    Returns:
+        df (DataFrame): Output of the parser for the page.
+
+    """
+    loop = asyncio.get_running_loop()
+
+    async with limiter.get(url):
+        page = await loop.run_in_executor(executor, fetch_page, url)
+
+    return await loop.run_in_executor(executor, parser, page)
+
+
+def parse_first_round(page):
+    """Parse the first round of pairings and read the number of rounds from its round navigation.
+
+    Arguments:
+        page (str): HTML of the Pairings page for round 1.
+
+    Returns:
+        df (DataFrame): Pairings for round 1, or None if the page has no pairings table.
+        round_count (int): Number of rounds in the tournament, or None if unknown.
+
+    """
+    return parse_pairings_table(page), find_round_count(page)
+
+
+async def scrape_tournament(t_urls, limiter, executor):
+    """Scrape the Standings and every round of Pairings for a tournament concurrently.
+
+    Round 1 is downloaded together with the Standings; its round navigation tells us which other
+    rounds exist, and those are then downloaded together. If the navigation is missing, rounds are
+    downloaded one at a time until the first round without pairings.
+
+    Arguments:
+        t_urls (dict): Dictionary with the tournament's Standings URL and Pairings URLs, as created
+                       by create_urls.
+        limiter (HostLimiter): Per-host concurrency limiter.
+        executor (ThreadPoolExecutor): Executor that runs the blocking calls.
+
+    Returns:
+        t_dict (dict): Dictionary with the same "players" and "pairings" keys as multi_latenight_scrape.
+
+    """
+    round_urls = t_urls['rounds']
+
+    players_df, (first_df, round_count) = await asyncio.gather(
+        fetch_and_parse(t_urls['standings'], parse_players_table, limiter, executor),
+        fetch_and_parse(round_urls[0], parse_first_round, limiter, executor)
+    )
+
+    round_dfs = [first_df]
+
+    if first_df is None or first_df.empty:
+        # Tournament has no pairings
+        round_dfs = []
+    elif round_count is not None:
+        # Round count is known, download the remaining rounds at once
+        round_urls = trim_round_urls(round_urls, round_count)
+        round_tasks = [fetch_and_parse(url, parse_pairings_table, limiter, executor) for url in round_urls[1:]]
+        round_dfs.extend(await asyncio.gather(*round_tasks))
+    else:
+        # Round count is unknown, stop at the first round without pairings
+        for url in round_urls[1:]:
+            df = await fetch_and_parse(url, parse_pairings_table, limiter, executor)
+            if df is None or df.empty:
+                break
+            round_dfs.append(df)
+
+    # Keep the round numbering of scrape_limitless_latenight
+    all_round_dict = {}
+    for round_i, df in enumerate(round_dfs, start=1):
+        all_round_dict[f"round_{round_i}_dict"] = {"df": df}
+
+    return {"players": players_df, "pairings": all_round_dict}
+
+
+async def async_multi_latenight_scrape(url_dict, max_per_host=MAX_REQUESTS_PER_HOST):
+    """Scrape Standings and Pairings tabs for multiple tournaments concurrently.
+
+    Arguments:
+        url_dict (dict): Dictionary that contains URLs for the Standings and Pairings pages of the tournament(s).
+        max_per_host (int): Maximum number of concurrent requests sent to a single host.
+
+    Returns:
+        all_tournament_dict (dict): Dictionary that has DataFrames for the Standings and Pairings tables for each
+                                    tournament present in the url_dict.
+
+    """
+    limiter = HostLimiter(max_per_host)
+
+    # Threads are only used for blocking calls, so size the pool to the number of requests allowed in flight
+    hosts = {urlparse(t).netloc for t in url_dict}
+    with ThreadPoolExecutor(max_workers=max_per_host * max(len(hosts), 1)) as executor:
+        logging.info(f"Scraping {len(url_dict)} tournaments with up to {max_per_host} requests per host...")
+        t_dicts = await asyncio.gather(*[scrape_tournament(url_dict[t], limiter, executor) for t in url_dict])
+
+    # Results come back in the same order as url_dict
+    all_tournament_dict = {}
+    for t, t_dict in zip(url_dict, t_dicts):
+        all_tournament_dict[f"{t}"] = t_dict
+
+    return all_tournament_dict
+
+
+def concurrent_latenight_scrape(url_dict, max_per_host=MAX_REQUESTS_PER_HOST):
+    """Blocking wrapper around async_multi_latenight_scrape; drop-in replacement for multi_latenight_scrape.
+
+    Arguments:
+        url_dict (dict): Dictionary that contains URLs for the Standings and Pairings pages of the tournament(s).
+        max_per_host (int): Maximum number of concurrent requests sent to a single host.
+
+    Returns:
+        all_tournament_dict (dict): Dictionary that has DataFrames for the Standings and Pairings tables for each
+                                    tournament present in the url_dict.
+
+    """
+    return asyncio.run(async_multi_latenight_scrape(url_dict, max_per_host=max_per_host))
@@ -0,0 +1,1106 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Benchmarks for the scraping and processing pipeline.
+
+Run from the data_collection folder, e.g. `python benchmarks.py round_discovery`.
+"""
+
+# imports
+import hashlib
+import html
+import json
+import logging
+import os
+import pickle
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from http_cache import CACHE_DIR, HttpCache
+from http_client import HttpClient
+import async_scrape
+import scrape_pipeline
+from limitless_analysis import (archetype_wr_per_round, archetype_wr_per_tournament, build_matchup_tensor, create_plot_df,
+                                deck_and_records, multi_tournament_wr_per_tournament, pool_workers,
+                                pooled_wr_per_tournament, slim_tournament, sum_over_tournaments)
+from rebuild_results import rebuild_results
+from results_store import ResultsSnapshot, ResultsStore, open_results
+from scrape_journal import ScrapeJournal
+from scraped_store import SCRAPED_STORE, read_csv_tournament, read_scraped, stored_tournaments, tournament_folder
+from snapshot_log import SnapshotLog, checkpoint_log
+from wr_parity import baseline_archetype_wr_per_round, by_id
+from limitless_scrape import (MAX_ROUNDS, TableBuilder, create_urls, make_table_soup, parse_completed_tournaments, parse_pairings_table,
+                              parse_players_table)
+
+SET_CALENDAR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "set_release_calendar.csv")
+
+# Standings, Pairings and organizer pages, named <kind>_<page>.html. They were rebuilt from tables in the
+# scraped data store wrapped in a page layout, not downloaded from the site
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_KINDS = {"standings": "players", "pairings": "pairings", "organizer": "organizer"}
+
+
+def _escape(value):
+    return html.escape("" if pd.isna(value) else str(value))
+
+
+def pairings_page(round_df, round_count=MAX_ROUNDS):
+    """Render a saved round of pairings back into the HTML layout of a Pairings page."""
+    rows = ['<tr><th>Table</th><th>Player 1</th><th></th><th></th><th>Player 2</th></tr>']
+    for _, row in round_df.iterrows():
+        cells = []
+        for player in ("Player 1", "Player 2"):
+            if row[f"{player} Name"] == "*Bye*":
+                cells.append(f'<td>{_escape(row[player])}</td>')
+            else:
+                cells.append(f'<td><a href="/tournament/x/player/{_escape(row[f"{player} ID"])}">'
+                             f'<div class="name">{_escape(row[f"{player} Name"])}</div>'
+                             f'<div class="score">{_escape(row[f"{player} Record"])}</div></a></td>')
+        rows.append(f'<tr data-winner="{_escape(row["Winner ID"])}"><td>{_escape(row["Pairing"])}</td>{cells[0]}'
+                    f'<td>{_escape(row["Player 1 Score"])}</td><td>{_escape(row["Player 2 Score"])}</td>{cells[1]}</tr>')
+
+    nav = "".join(f'<a href="/tournament/x/pairings?round={i}">{i}</a>' for i in range(1, round_count + 1))
+
+    return f'<html><body><nav>{nav}</nav><table class="striped">{"".join(rows)}</table></body></html>'
+
+
+def standings_page(players_df):
+    """Render a saved players table back into the HTML layout of a Standings page."""
+    headers = ["Place", "Name", "", "Points", "Record", "Opp. Win %", "Opp. Opp. %", "Deck", "List"]
+    rows = ["<tr>" + "".join(f"<th>{h}</th>" for h in headers) + "</tr>"]
+    for _, row in players_df.iterrows():
+        cells = [_escape(row["Place"]),
+                 f'<a href="/tournament/x/player/{_escape(row["Player ID"])}">{_escape(row["Name"])}</a>',
+                 _escape(row["Country"]), _escape(row["Points"]), _escape(row["Record"]),
+                 _escape(row["Opp. Win %"]), _escape(row["Opp. Opp. %"]),
+                 f'<span data-tooltip="{_escape(row["Deck"])}">icon</span>', _escape(row["List"])]
+        rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+
+    return f'<html><body><table class="striped">{"".join(rows)}</table></body></html>'
+
+
+def fixture_corpus(fixtures_dir=FIXTURES):
+    """Load (kind, html) pages from the fixtures, which were rebuilt from scraped tables rather than downloaded."""
+    corpus = []
+    for filename in sorted(os.listdir(fixtures_dir)):
+        with open(os.path.join(fixtures_dir, filename), encoding="utf-8") as f:
+            corpus.append((FIXTURE_KINDS[filename.split("_")[0]], f.read()))
+
+    return corpus
+
+
+def cached_corpus(cache_dir=CACHE_DIR):
+    """Load (kind, html) pages saved by the HTTP cache."""
+    index_path = os.path.join(cache_dir, "index.json")
+    if not os.path.exists(index_path):
+        return []
+
+    with open(index_path) as f:
+        index = json.load(f)
+
+    corpus = []
+    for url, entry in index.items():
+        if "standings" in url:
+            kind = "players"
+        elif "pairings" in url:
+            kind = "pairings"
+        elif "organizer" in url:
+            kind = "organizer"
+        else:
+            continue
+        object_path = os.path.join(cache_dir, "objects", entry["sha256"][:2], entry["sha256"])
+        if os.path.exists(object_path):
+            with open(object_path, encoding="utf-8") as f:
+                corpus.append((kind, f.read()))
+
+    return corpus
+
+
+def played_rounds(t_dict):
+    """Count the rounds with at least one pairing in a tournament read from the scraped data store."""
+    round_count = 0
+    for round_num in range(1, MAX_ROUNDS + 1):
+        round_dict = t_dict["pairings"].get(f"round_{round_num}_pairings")
+        if round_dict is None or round_dict["df"].empty:
+            break
+        round_count = round_num
+
+    return round_count
+
+
+def bench_round_discovery(store_dir=SCRAPED_STORE):
+    """Compare requests per tournament when probing 14 rounds against reading the round count.
+
+    Uses the tournaments already in the scraped data store. Probing always sends 1 Standings request and
+    MAX_ROUNDS Pairings requests. With the round navigation, only the played rounds are requested;
+    without it, one extra request finds the first empty round.
+    """
+    rows = []
+    for t, t_dict in read_scraped(store_dir).items():
+        rounds = played_rounds(t_dict)
+        rows.append({
+            "tournament": t,
+            "rounds": rounds,
+            "fixed_probe": 1 + MAX_ROUNDS,
+            "round_nav": 1 + max(rounds, 1),
+            "stop_at_empty": 1 + min(rounds + 1, MAX_ROUNDS),
+        })
+
+    df = pd.DataFrame(rows)
+    totals = df[["fixed_probe", "round_nav", "stop_at_empty"]].sum()
+
+    print(f"Tournaments: {len(df)}")
+    print(f"Rounds played: mean {df['rounds'].mean():.2f}, min {df['rounds'].min()}, max {df['rounds'].max()}")
+    for strategy, total in totals.items():
+        saved = totals["fixed_probe"] - total
+        print(f"{strategy:>14}: {total:6d} requests, {total / len(df):5.2f} per tournament, "
+              f"{saved / len(df):5.2f} saved per tournament")
+
+    return df
+
+
+PAGE_PARSERS = {
+    "players": parse_players_table,
+    "pairings": parse_pairings_table,
+    "organizer": parse_completed_tournaments,
+}
+
+
+def bench_parsers(corpus=None):
+    """Time html5lib against the table-only lxml parser and check that both give identical rows.
+
+    Uses the pages in fixtures/ plus any pages in the HTTP cache. The fixtures were rebuilt from tables
+    in the scraped data store, so on their own they only show parity on that rebuilt markup; only the
+    cached pages were downloaded from the site.
+    """
+    sources = ""
+    if corpus is None:
+        fixtures, cached = fixture_corpus(), cached_corpus()
+        corpus = fixtures + cached
+        sources = f" ({len(fixtures)} rebuilt from scraped tables in fixtures/, {len(cached)} downloaded, from the HTTP cache)"
+
+    timings = {"html5lib": 0.0, "lxml": 0.0}
+    soup_timings = {"html5lib": 0.0, "lxml": 0.0}
+    mismatches = 0
+    for kind, page in corpus:
+        parser_func = PAGE_PARSERS[kind]
+        results = {}
+        for parser in timings:
+            start = time.perf_counter()
+            make_table_soup(page, parser)
+            soup_timings[parser] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            results[parser] = parser_func(page, parser=parser)
+            timings[parser] += time.perf_counter() - start
+
+        old, new = results["html5lib"], results["lxml"]
+        if (old is None) != (new is None) or (old is not None and not old.equals(new)):
+            mismatches += 1
+
+    print(f"Pages: {len(corpus)}{sources}, mismatched tables: {mismatches}")
+    for parser, seconds in timings.items():
+        print(f"{parser:>9}: {seconds:7.2f}s total, {1000 * seconds / max(len(corpus), 1):7.2f}ms per page, "
+              f"{soup_timings[parser]:7.2f}s building the soup")
+    print(f"  speedup: {timings['html5lib'] / timings['lxml']:.1f}x total, "
+          f"{soup_timings['html5lib'] / soup_timings['lxml']:.1f}x building the soup")
+
+    return timings, mismatches
+
+
+def synthetic_event(n_players=256, n_rounds=10, seed=0):
+    """Create the Standings and Pairings pages of a made-up event with random pairings and results."""
+    rng = random.Random(seed)
+    decks = [f"Deck {i}" for i in range(24)]
+    players = pd.DataFrame({
+        "Place": [str(i + 1) for i in range(n_players)],
+        "Name": [f"Player {i}" for i in range(n_players)],
+        "Country": "",
+        "Points": "0",
+        "Record": "0 - 0 - 0",
+        "Opp. Win %": "",
+        "Opp. Opp. %": "",
+        "Deck": [rng.choice(decks) for _ in range(n_players)],
+        "List": "",
+        "Player ID": [f"player{i}" for i in range(n_players)],
+    })
+
+    round_pages = []
+    for round_num in range(1, n_rounds + 1):
+        order = rng.sample(range(n_players), n_players)
+        rows = []
+        for pairing, (p1, p2) in enumerate(zip(order[::2], order[1::2]), start=1):
+            winner = rng.choice([p1, p2, None])
+            rows.append({
+                "Pairing": str(pairing), "Player 1": "", "Player 1 Score": "", "Player 2 Score": "", "Player 2": "",
+                "Player 1 Name": f"Player {p1}", "Player 2 Name": f"Player {p2}",
+                "Player 1 Record": "0-0-0", "Player 2 Record": "0-0-0",
+                "Winner ID": "0" if winner is None else f"player{winner}",
+                "Player 1 ID": f"player{p1}", "Player 2 ID": f"player{p2}",
+            })
+        round_pages.append(pairings_page(pd.DataFrame(rows), n_rounds))
+
+    return standings_page(players), round_pages
+
+
+def loc_append_frame(columns, rows):
+    """Build a DataFrame the way the scrapers used to, one df.loc append per row."""
+    df = pd.DataFrame(columns=columns)
+    for row in rows:
+        df.loc[len(df)] = row
+
+    return df
+
+
+def builder_frame(columns, rows):
+    """Build a DataFrame with TableBuilder."""
+    table_builder = TableBuilder(columns)
+    for row in rows:
+        table_builder.append(row)
+
+    return table_builder.to_frame()
+
+
+def bench_row_builder(n_players=256, n_rounds=10):
+    """Compare df.loc appends with TableBuilder when turning parsed rows into DataFrames.
+
+    The rows come from the Standings and Pairings pages of a synthetic event, so both methods
+    build exactly the tables the scrapers build.
+    """
+    standings, round_pages = synthetic_event(n_players, n_rounds)
+
+    start = time.perf_counter()
+    tables = [parse_players_table(standings)] + [parse_pairings_table(page) for page in round_pages]
+    parse_seconds = time.perf_counter() - start
+
+    timings = {}
+    for name, build in (("df.loc", loc_append_frame), ("TableBuilder", builder_frame)):
+        start = time.perf_counter()
+        frames = [build(df.columns.tolist(), df.values.tolist()) for df in tables]
+        timings[name] = time.perf_counter() - start
+
+        for frame, df in zip(frames, tables):
+            assert frame.columns.tolist() == df.columns.tolist() and not (frame.values != df.values).any()
+
+    n_rows = sum(len(df) for df in tables)
+    print(f"Event: {n_players} players, {n_rounds} rounds, {n_rows} rows in {len(tables)} tables")
+    print(f"Full parse with TableBuilder: {parse_seconds:.3f}s")
+    for name, seconds in timings.items():
+        print(f"{name:>13}: {seconds:.3f}s to build the frames, {1e6 * seconds / n_rows:7.1f}us per row")
+    print(f"      speedup: {timings['df.loc'] / timings['TableBuilder']:.0f}x")
+
+    return timings
+
+
+def load_scraped_data(store_dir=SCRAPED_STORE):
+    """Read every tournament in the scraped data store that has decks in its standings."""
+    return {t: t_dict for t, t_dict in read_scraped(store_dir).items() if "Deck" in t_dict["players"]}
+
+
+def same_counts(old, new):
+    """Check two all_archetype_dicts for equal counts, key order and int/float types."""
+    if list(old) != list(new):
+        return False
+    for deck in old:
+        if list(old[deck]) != list(new[deck]):
+            return False
+        for opp in old[deck]:
+            for key, value in old[deck][opp].items():
+                if value != new[deck][opp][key] or isinstance(value, float) != isinstance(new[deck][opp][key], float):
+                    return False
+
+    return True
+
+
+def bench_archetype_wr(store_dir=SCRAPED_STORE):
+    """Check archetype_wr_per_round against the original loop on every round in the scraped data store, and time both.
+
+    The original loop is the verbatim copy in wr_parity, fed Player IDs in place of the display names so its
+    name join matches players the way deck_and_records now does. The ID swap is included in its time.
+    """
+    tournaments = load_scraped_data(store_dir)
+
+    # Undetermined results are logged per match by the old loop
+    logging.getLogger().setLevel(logging.WARNING)
+
+    timings = {"loop": 0.0, "vectorized": 0.0}
+    mismatches = 0
+    n_rounds = 0
+    for t_dict in tournaments.values():
+        old, new = {}, {}
+        for round_dict in t_dict["pairings"].values():
+            n_rounds += 1
+            start = time.perf_counter()
+            old = baseline_archetype_wr_per_round(*by_id(round_dict, t_dict["players"]), old)
+            timings["loop"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            new = archetype_wr_per_round(round_dict, t_dict["players"], new)
+            timings["vectorized"] += time.perf_counter() - start
+
+            if not same_counts(old, new):
+                mismatches += 1
+
+    print(f"Tournaments: {len(tournaments)}, rounds: {n_rounds}, rounds with different counts: {mismatches}")
+    for name, seconds in timings.items():
+        print(f"{name:>11}: {seconds:6.2f}s, {1000 * seconds / n_rounds:6.2f}ms per round")
+    print(f"    speedup: {timings['loop'] / timings['vectorized']:.1f}x")
+
+    return timings, mismatches
+
+
+def bench_tournament_wr(store_dir=SCRAPED_STORE):
+    """Compare counting a tournament round by round with counting every round in one pass.
+
+    Also checks that the per-round counts of the single pass add up to the tournament counts.
+    """
+    tournaments = load_scraped_data(store_dir)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    timings = {"per_round": 0.0, "single_pass": 0.0}
+    mismatches = 0
+    for t_dict in tournaments.values():
+        t_dict = dict(t_dict, name="", date="")
+        results = {}
+        for mode in timings:
+            start = time.perf_counter()
+            results[mode] = archetype_wr_per_tournament(t_dict, single_pass=(mode == "single_pass"))
+            timings[mode] += time.perf_counter() - start
+
+        single_pass = results["single_pass"]
+        if not same_counts(results["per_round"]["t_wlt_dict"], single_pass["t_wlt_dict"]):
+            mismatches += 1
+            continue
+
+        # Sum of the rounds must match the tournament
+        summed = {}
+        for round_dict in single_pass["t_wlt_by_round"].values():
+            for deck, mu_dict in round_dict.items():
+                for opp, wlt in mu_dict.items():
+                    total = summed.setdefault((deck, opp), {"wins": 0, "losses": 0, "ties": 0})
+                    for key in total:
+                        total[key] += wlt[key]
+        for deck, mu_dict in single_pass["t_wlt_dict"].items():
+            for opp, wlt in mu_dict.items():
+                if summed.get((deck, opp)) != wlt:
+                    mismatches += 1
+
+    print(f"Tournaments: {len(tournaments)}, tournaments with different counts: {mismatches}")
+    for name, seconds in timings.items():
+        print(f"{name:>12}: {seconds:6.2f}s, {1000 * seconds / len(tournaments):7.2f}ms per tournament")
+    print(f"     speedup: {timings['per_round'] / timings['single_pass']:.1f}x")
+
+    return timings, mismatches
+
+
+def legacy_create_plot_df(all_tournament_results_dict):
+    """calc_wr on every dictionary, then create_plot_df one df.loc append per matchup, as before the matchup tensor."""
+    headers = ["deck", "opposing_deck", "t_url", "date", "wins", "winrate", "games_played"]
+    plot_df = pd.DataFrame(columns=headers)
+    for t_url, t_dict in all_tournament_results_dict.items():
+        for deck_of_interest, archetype_dict in t_dict['t_wlt_dict'].items():
+            for opposing_deck, wlt_counts in archetype_dict.items():
+                games_played = wlt_counts["wins"] + wlt_counts["losses"] + wlt_counts["ties"]
+                # calc_wr raised ZeroDivisionError on matchups with only undetermined results
+                winrate = round(wlt_counts["wins"] / games_played, 2) if games_played else np.nan
+                plot_df.loc[len(plot_df)] = [deck_of_interest, opposing_deck, t_url, t_dict['date'],
+                                             wlt_counts["wins"], winrate, games_played]
+
+    return plot_df
+
+
+def bench_plot_df(store_dir=SCRAPED_STORE):
+    """Compare plot_df built from nested dictionaries with plot_df built from the matchup tensor."""
+    tournaments = load_scraped_data(store_dir)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for t, t_dict in tournaments.items():
+        t_dict["name"], t_dict["date"] = t, t
+    results = multi_tournament_wr_per_tournament(tournaments)
+
+    start = time.perf_counter()
+    old = legacy_create_plot_df(results)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = create_plot_df(results)
+    plot_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tensor = build_matchup_tensor(results)
+    tensor_seconds = time.perf_counter() - start
+
+    same = (old[["deck", "opposing_deck", "t_url", "date"]].equals(new[["deck", "opposing_deck", "t_url", "date"]])
+            and np.array_equal(old[["wins", "winrate", "games_played"]].astype(float).values,
+                               new[["wins", "winrate", "games_played"]].values, equal_nan=True))
+
+    start = time.perf_counter()
+    totals = sum_over_tournaments(tensor)
+    sum_seconds = time.perf_counter() - start
+
+    tensor_bytes = sum(tensor[key].nbytes for key in ("t_idx", "deck_idx", "opp_idx", "wlt"))
+    dense_bytes = len(tensor["tournaments"]) * len(tensor["decks"]) ** 2 * 3 * 4
+    print(f"Matchups: {len(new)}, tournaments: {len(tensor['tournaments'])}, decks: {len(tensor['decks'])}, identical plot_df: {same}")
+    print(f"calc_wr + df.loc plot_df: {legacy_seconds:6.2f}s")
+    print(f"tensor + plot_df:         {plot_seconds:6.2f}s ({tensor_seconds:.2f}s building the tensor)")
+    print(f"Sum over all tournaments: {1000 * sum_seconds:.2f}ms, {int(totals.sum())} results")
+    print(f"Tensor entries: {tensor_bytes / 1e6:.2f} MB, dense (T, D, D, 3) float32 would be {dense_bytes / 1e6:.0f} MB")
+
+    return same
+
+
+def bench_parallel_wr(store_dir=SCRAPED_STORE, worker_counts=(2, 4), chunksizes=(1, None)):
+    """Compare counting every tournament in this process with the process pool, for a few worker counts and chunk sizes."""
+    tournaments = load_scraped_data(store_dir)
+    logging.getLogger().setLevel(logging.WARNING)
+    for t, t_dict in tournaments.items():
+        t_dict["name"], t_dict["date"] = t, t
+
+    full_bytes = len(pickle.dumps(tournaments))
+    slim_bytes = len(pickle.dumps({t: slim_tournament(t_dict) for t, t_dict in tournaments.items()}))
+    print(f"Tournaments: {len(tournaments)}, CPUs: {os.cpu_count()}")
+    print(f"Pickled tournaments: {full_bytes / 1e6:.1f} MB, {slim_bytes / 1e6:.1f} MB with only the columns the analysis reads")
+
+    start = time.perf_counter()
+    expected = multi_tournament_wr_per_tournament(tournaments, workers=1)
+    sequential = time.perf_counter() - start
+    print(f"{'sequential':>22}: {sequential:6.2f}s")
+
+    timings = {}
+    for workers in worker_counts:
+        for chunksize in chunksizes:
+            start = time.perf_counter()
+            results = pooled_wr_per_tournament(tournaments, workers, chunksize)
+            timings[(workers, chunksize)] = time.perf_counter() - start
+
+            # Same results, in the same order
+            same = list(results) == list(expected) and results == expected
+            label = f"{workers} workers, chunk {chunksize or 'auto'}"
+            print(f"{label:>22}: {timings[(workers, chunksize)]:6.2f}s, "
+                  f"{sequential / timings[(workers, chunksize)]:.1f}x, identical: {same}")
+
+    print(f"multi_tournament_wr_per_tournament(workers=None) uses {pool_workers(len(tournaments))} process(es) here")
+
+    return sequential, timings
+
+
+def legacy_deck_and_records(round_dict, players_df):
+    """deck_and_records before the Player ID join: two merges on the display names."""
+    round_df = round_dict["df"]
+    round_df = round_df.merge(players_df[["Deck", "Name"]], left_on="Player 1 Name", right_on="Name").drop("Name", axis=1)
+    round_df = round_df.rename({"Deck": "Player 1 Deck"}, axis=1)
+    round_df = round_df.merge(players_df[["Deck", "Name"]], left_on="Player 2 Name", right_on="Name").drop("Name", axis=1)
+    round_df = round_df.rename({"Deck": "Player 2 Deck"}, axis=1)
+
+    return round_df
+
+
+def bench_player_join(store_dir=SCRAPED_STORE):
+    """Compare joining pairings to standings on display names with the integer Player ID join."""
+    tournaments = load_scraped_data(store_dir)
+    logging.getLogger().setLevel(logging.ERROR)
+
+    timings = {"names": 0.0, "player_id": 0.0}
+    rounds = pairings = name_rows = id_rows = exploded = different = 0
+    for t_dict in tournaments.values():
+        players_df = t_dict["players"]
+        for round_dict in t_dict["pairings"].values():
+            start = time.perf_counter()
+            old = legacy_deck_and_records(round_dict, players_df)
+            timings["names"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            new = deck_and_records(round_dict, players_df)
+            timings["player_id"] += time.perf_counter() - start
+
+            rounds += 1
+            pairings += len(round_dict["df"])
+            name_rows += len(old)
+            id_rows += len(new)
+            exploded += len(old) > len(round_dict["df"])
+
+            # Pairing by pairing, the decks must match wherever the names were unique
+            columns = ["Pairing", "Player 1 Deck", "Player 2 Deck"]
+            old = old[columns].sort_values("Pairing", kind="mergesort").drop_duplicates("Pairing", keep=False)
+            new = new[columns].set_index("Pairing").loc[old["Pairing"]].reset_index()
+            different += (old.reset_index(drop=True) != new).any(axis=1).sum()
+
+    print(f"Rounds: {rounds}, pairings: {pairings}")
+    print(f"Rows after the name join: {name_rows}, rounds that grew past their pairing count: {exploded}")
+    print(f"Rows after the Player ID join: {id_rows}, pairings with different decks: {different}")
+    for name, seconds in timings.items():
+        print(f"{name:>10}: {seconds:6.2f}s, {1000 * seconds / rounds:6.2f}ms per round")
+
+    return timings, different
+
+
+def checkpoint_dates():
+    """Map every tournament in the newest dated checkpoint to its date, by its name in the scraped data store."""
+    ckpt_df = checkpoint_log().rebuild()
+
+    return {tournament_folder(url): date for url, date in zip(ckpt_df["url"], ckpt_df["date"])}
+
+
+def scraped_plot_df(store_dir=SCRAPED_STORE):
+    """Build plot_df for every tournament in the scraped data store, dated from the checkpoint."""
+    tournaments = load_scraped_data(store_dir)
+    dates = checkpoint_dates()
+    for t, t_dict in tournaments.items():
+        t_dict["name"], t_dict["date"] = t, dates.get(t, t)
+
+    return create_plot_df(multi_tournament_wr_per_tournament(tournaments))
+
+
+def legacy_update_results(results_csv, net_new_results):
+    """update_results before the results store: reload the whole history, concat, drop duplicates, save."""
+    current_results = pd.read_csv(results_csv)
+    updated_plot_df = pd.concat([net_new_results, current_results], ignore_index=True)
+    updated_plot_df = updated_plot_df.drop_duplicates(ignore_index=True)
+    updated_plot_df.to_csv(results_csv, header=True, index=False)
+
+    return updated_plot_df
+
+
+def bench_results_store(store_dir=SCRAPED_STORE, new_tournaments=5):
+    """Compare adding tournaments one at a time to the CSV history with upserting them into the results store."""
+    logging.getLogger().setLevel(logging.WARNING)
+    plot_df = scraped_plot_df(store_dir)
+    t_urls = plot_df["t_url"].unique().tolist()
+    history = plot_df[plot_df["t_url"].isin(t_urls[:-new_tournaments])]
+
+    timings = {"csv": 0.0, "upsert": 0.0, "upsert + export": 0.0}
+    with tempfile.TemporaryDirectory() as tmp:
+        results_csv = os.path.join(tmp, "scrape_results.csv")
+        history.to_csv(results_csv, index=False)
+
+        with ResultsStore(os.path.join(tmp, "results.db")) as store:
+            store.upsert(history)
+
+            for t_url in t_urls[-new_tournaments:]:
+                new_rows = plot_df[plot_df["t_url"] == t_url]
+
+                start = time.perf_counter()
+                legacy_update_results(results_csv, new_rows)
+                timings["csv"] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                store.upsert(new_rows)
+                timings["upsert"] += time.perf_counter() - start
+                store.to_plot_df().to_csv(os.path.join(tmp, "export.csv"), index=False)
+                timings["upsert + export"] += time.perf_counter() - start
+
+            # Adding the same tournaments again must not change anything, the version included
+            before, version = store.to_plot_df(), store.version()
+            store.upsert(plot_df[plot_df["t_url"].isin(t_urls[-new_tournaments:])])
+            after = store.to_plot_df()
+            idempotent = len(before) == len(after) == len(plot_df) and store.version() == version
+
+            # Every matchup reads back with the same counts and win rate
+            columns = ["deck", "opposing_deck", "t_url", "date", "wins", "losses", "ties", "winrate", "games_played"]
+            expected = plot_df[columns].sort_values(["t_url", "deck", "opposing_deck"], ignore_index=True)
+            stored = after[columns].sort_values(["t_url", "deck", "opposing_deck"], ignore_index=True)
+            same = expected.equals(stored)
+
+    print(f"History: {len(history)} matchups, adding {new_tournaments} tournaments one at a time")
+    print(f"Re-adding tournaments leaves {len(after)} rows and the version (idempotent: {idempotent}), "
+          f"identical to plot_df: {same}")
+    for name, seconds in timings.items():
+        print(f"{name:>16}: {1000 * seconds / new_tournaments:8.2f}ms per tournament")
+
+    return timings, idempotent and same
+
+
+def write_csv_tree(tournaments, scraped_data):
+    """Write tournaments in the old scraped_data layout: players.csv and round_1.csv ... round_14.csv per folder."""
+    for t, t_dict in tournaments.items():
+        t_folder = os.path.join(scraped_data, t)
+        os.makedirs(t_folder, exist_ok=True)
+        t_dict["players"].to_csv(os.path.join(t_folder, "players.csv"), index=False)
+        for round_key, round_dict in t_dict["pairings"].items():
+            round_dict["df"].to_csv(os.path.join(t_folder, f"round_{round_key.split('_')[1]}.csv"), index=False)
+
+
+def folder_size(folder):
+    """Return the number of files under folder and their total size in bytes."""
+    files = [os.path.join(root, name) for root, _, names in os.walk(folder) for name in names]
+
+    return len(files), sum(os.path.getsize(path) for path in files)
+
+
+def bench_scraped_store(store_dir=SCRAPED_STORE):
+    """Compare reloading every tournament from the old CSV tree with reading the parquet store."""
+    tournaments = read_scraped(store_dir)
+
+    with tempfile.TemporaryDirectory() as scraped_data:
+        write_csv_tree(tournaments, scraped_data)
+
+        start = time.perf_counter()
+        from_csv = {folder: read_csv_tournament(os.path.join(scraped_data, folder)) for folder in sorted(os.listdir(scraped_data))}
+        csv_seconds = time.perf_counter() - start
+        csv_files, csv_bytes = folder_size(scraped_data)
+
+    start = time.perf_counter()
+    from_store = read_scraped(store_dir)
+    store_seconds = time.perf_counter() - start
+    store_files, store_bytes = folder_size(store_dir)
+
+    same = list(from_csv) == list(from_store) and all(
+        from_csv[t]["players"].equals(from_store[t]["players"])
+        and all(from_csv[t]["pairings"][key]["df"].equals(round_dict["df"]) for key, round_dict in from_store[t]["pairings"].items())
+        for t in from_store
+    )
+
+    print(f"Tournaments: {len(from_store)}, identical: {same}")
+    print(f"  CSV tree: {csv_files:5d} files, {csv_bytes / 1e6:5.1f} MB, reload {csv_seconds:6.2f}s")
+    print(f"   parquet: {store_files:5d} files, {store_bytes / 1e6:5.1f} MB, reload {store_seconds:6.2f}s")
+    print(f"   speedup: {csv_seconds / store_seconds:.1f}x")
+
+    return csv_seconds, store_seconds
+
+
+def bench_results_queries(store_dir=SCRAPED_STORE, repeat=20):
+    """Compare the app's lookups as pandas masks over plot_df with indexed queries on the results store.
+
+    For every set in the release calendar, times the lookups the app's callbacks make: the games played
+    by each deck in the set (dropdowns), and the matchups of its most played deck against the next five
+    (graphs). Reading every row of the set's date range is timed too.
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    plot_df = scraped_plot_df(store_dir)
+    set_calendar_df = pd.read_csv(SET_CALENDAR, encoding="utf-8-sig")
+    sort_keys = ["t_url", "deck", "opposing_deck"]
+
+    timings = {lookup: {"masks": 0.0, "store": 0.0} for lookup in ("date range", "deck games", "matchups")}
+    different = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        with ResultsStore(os.path.join(tmp, "results.db")) as store:
+            store.upsert(plot_df)
+
+        store = ResultsStore(os.path.join(tmp, "results.db"), read_only=True)
+        for _, set_row in set_calendar_df.iterrows():
+            start_date, end_date = set_row["start_date"], set_row["end_date"]
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                format_df = plot_df[(plot_df['date'] >= start_date) & (plot_df['date'] <= end_date)]
+            timings["date range"]["masks"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                queried_df = store.query(start_date, end_date)
+            timings["date range"]["store"] += time.perf_counter() - start
+
+            different += not format_df.sort_values(sort_keys, ignore_index=True).equals(
+                queried_df.sort_values(sort_keys, ignore_index=True))
+            if format_df.empty:
+                continue
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                format_df = plot_df[(plot_df['date'] >= start_date) & (plot_df['date'] <= end_date)]
+                gp_df = format_df.groupby('deck')['games_played'].sum().reset_index()
+            timings["deck games"]["masks"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                queried_gp_df = store.games_per_deck(start_date, end_date)
+            timings["deck games"]["store"] += time.perf_counter() - start
+
+            different += not (gp_df["deck"].tolist() == queried_gp_df["deck"].tolist()
+                              and np.allclose(gp_df["games_played"], queried_gp_df["games_played"]))
+
+            top_decks = format_df.groupby("deck")["games_played"].sum().sort_values(ascending=False).index.tolist()
+            deck, opposing_decks = top_decks[0], top_decks[1:6]
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                format_df = plot_df[(plot_df['date'] >= start_date) & (plot_df['date'] <= end_date)]
+                active_deck_df = format_df[format_df["deck"] == deck]
+                opp_deck_df = active_deck_df[active_deck_df["opposing_deck"].isin(opposing_decks)]
+            timings["matchups"]["masks"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                queried_df = store.query(start_date, end_date, decks=[deck], opposing_decks=opposing_decks)
+            timings["matchups"]["store"] += time.perf_counter() - start
+
+            different += not opp_deck_df.sort_values(sort_keys, ignore_index=True).equals(
+                queried_df.sort_values(sort_keys, ignore_index=True))
+        store.close()
+
+    lookups = len(set_calendar_df) * repeat
+    print(f"Matchups: {len(plot_df)}, sets: {len(set_calendar_df)}, lookups with different rows: {different}")
+    for lookup, times in timings.items():
+        print(f"{lookup:>10}: masks {1000 * times['masks'] / lookups:6.2f}ms, store {1000 * times['store'] / lookups:6.2f}ms, "
+              f"{times['masks'] / times['store']:.1f}x")
+
+    return timings, different
+
+
+def bench_snapshot_log(store_dir=SCRAPED_STORE, new_tournaments=5):
+    """Compare saving a full dated copy of the results on every run with appending to the snapshot log.
+
+    Each run adds one tournament to the results store and saves the exported results both ways.
+    The last run re-adds a tournament that is already stored, which moves its rows to the end.
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    plot_df = scraped_plot_df(store_dir)
+    t_urls = plot_df["t_url"].unique().tolist()
+    history = plot_df[plot_df["t_url"].isin(t_urls[:-new_tournaments])]
+    runs = [[t_url] for t_url in t_urls[-new_tournaments:]] + [[t_urls[0]]]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dated_dir = os.path.join(tmp, "dated")
+        log = SnapshotLog(os.path.join(tmp, "log"), "scrape_results")
+        os.makedirs(dated_dir)
+
+        exports = {}
+        times = {"full copy": 0.0, "snapshot log": 0.0}
+        with ResultsStore(os.path.join(tmp, "results.db")) as store:
+            store.upsert(history)
+            for i, run in enumerate([[]] + runs):
+                date = f"2023-10-{i + 1:02d}"
+                store.upsert(plot_df[plot_df["t_url"].isin(run)])
+                exports[date] = store.to_plot_df()
+
+                start = time.perf_counter()
+                exports[date].to_csv(os.path.join(dated_dir, f"scrape_results_{date}.csv"), index=False)
+                times["full copy"] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                log.append(exports[date], date)
+                times["snapshot log"] += time.perf_counter() - start
+
+        # Every dated copy rebuilds from the log byte for byte
+        rebuild_seconds = 0.0
+        same = True
+        for date, export in exports.items():
+            start = time.perf_counter()
+            rebuilt = log.rebuild(date)
+            rebuild_seconds += (time.perf_counter() - start) / len(exports)
+            same = same and rebuilt.to_csv(index=False) == export.to_csv(index=False)
+
+        sizes = {"full copy": folder_size(dated_dir), "snapshot log": folder_size(log.log_dir)}
+        kinds = [entry["kind"] for entry in log.entries()]
+
+    print(f"History: {len(history)} matchups, {len(exports)} runs, snapshots: {kinds}")
+    print(f"Every snapshot rebuilds byte for byte: {same}, {1000 * rebuild_seconds:.1f}ms per rebuild")
+    for name, (n_files, n_bytes) in sizes.items():
+        print(f"{name:>12}: {n_files:3d} files, {n_bytes / 1e6:6.2f} MB, {1000 * times[name] / len(exports):7.1f}ms per run")
+
+    return sizes, same
+
+
+def synthetic_site(store_dir=SCRAPED_STORE, n_tournaments=6):
+    """Render the first tournaments in the scraped data store as a {url: html} site, with their url_dict."""
+    site = {}
+    tournaments = read_scraped(store_dir, tournaments=stored_tournaments(store_dir)[:n_tournaments])
+    for t, t_dict in tournaments.items():
+        if "Deck" not in t_dict["players"]:
+            continue
+        t_url = f"https://play.limitlesstcg.com/tournament/{t.split('_', 1)[1]}/"
+        site[f"{t_url}standings"] = standings_page(t_dict["players"])
+        rounds = played_rounds(t_dict)
+        for round_num in range(1, rounds + 1):
+            round_df = t_dict["pairings"][f"round_{round_num}_pairings"]["df"]
+            site[f"{t_url}pairings?round={round_num}"] = pairings_page(round_df, rounds)
+
+    url_dict = create_urls(sorted({url.rsplit("/", 1)[0] + "/" for url in site}))
+
+    return site, url_dict
+
+
+def bench_scrape_journal(store_dir=SCRAPED_STORE, crash_after=40):
+    """Kill a journaled scrape part way, resume it, and check it matches a scrape that never died.
+
+    Pages are served from tournaments in the scraped data store instead of the website.
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    site, url_dict = synthetic_site(store_dir)
+    fetched = []
+    failed = []
+
+    def fake_fetch(url):
+        if crash_after is not None and len(fetched) >= crash_after:
+            failed.append(url)
+            raise RuntimeError("Simulated crash")
+        fetched.append(url)
+        return site[url]
+
+    fetch_page = scrape_pipeline.fetch_page
+    scrape_pipeline.fetch_page = fake_fetch
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = ScrapeJournal(tmp)
+            try:
+                scrape_pipeline.pipelined_latenight_scrape(url_dict, fetch_workers=4, journal=journal)
+            except RuntimeError:
+                pass
+            # Downloads stop with the scrape; only the fetchers that were mid-download may still try one
+            time.sleep(0.2)
+            failed_downloads = len(failed)
+            stopped = failed_downloads <= 4
+            first_run = len(fetched)
+            complete_after_crash = sum(journal.is_complete(t) for t in url_dict)
+
+            crash_after = None
+            start = time.perf_counter()
+            resumed = scrape_pipeline.pipelined_latenight_scrape(url_dict, fetch_workers=4, journal=journal)
+            resume_seconds = time.perf_counter() - start
+            second_run = len(fetched) - first_run
+            complete = all(journal.is_complete(t) for t in url_dict)
+            refetched = len(fetched) - len(set(fetched))
+
+        fetched.clear()
+        clean = scrape_pipeline.pipelined_latenight_scrape(url_dict, fetch_workers=4)
+    finally:
+        scrape_pipeline.fetch_page = fetch_page
+
+    same = list(resumed) == list(clean)
+    for t in clean:
+        same = same and resumed[t]["players"].equals(clean[t]["players"])
+        same = same and list(resumed[t]["pairings"]) == list(clean[t]["pairings"])
+        same = same and all(resumed[t]["pairings"][key]["df"].equals(round_dict["df"])
+                            for key, round_dict in clean[t]["pairings"].items())
+
+    print(f"{len(url_dict)} tournaments, {len(site)} pages; crashed after {first_run} downloads "
+          f"with {complete_after_crash} tournaments complete; {failed_downloads} downloads tried after the crash")
+    print(f"Resumed run downloaded {second_run} pages ({refetched} downloaded twice, still queued at the crash) "
+          f"in {resume_seconds:.2f}s; every journal complete: {complete}")
+    print(f"Identical to a scrape that never died: {same}")
+
+    return second_run, complete and same and stopped
+
+
+def bench_scrape_engines(store_dir=SCRAPED_STORE, latency=0.02, max_per_host=4):
+    """Scrape the same tournaments with the asyncio engine and the pipeline, and check both give the same tables.
+
+    Pages are served from tournaments in the scraped data store after `latency` seconds, instead of the website.
+    Also records the most requests either engine had in flight at once, which must stay within max_per_host.
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    site, url_dict = synthetic_site(store_dir)
+    lock = threading.Lock()
+    in_flight = {"now": 0, "max": 0}
+
+    def fake_fetch(url):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        time.sleep(latency)
+        with lock:
+            in_flight["now"] -= 1
+        return site[url]
+
+    engines = {
+        "async": lambda: async_scrape.concurrent_latenight_scrape(url_dict, max_per_host=max_per_host),
+        "pipeline": lambda: scrape_pipeline.pipelined_latenight_scrape(url_dict, fetch_workers=2 * max_per_host,
+                                                                       max_per_host=max_per_host),
+    }
+    fetch_pages = async_scrape.fetch_page, scrape_pipeline.fetch_page
+    async_scrape.fetch_page = scrape_pipeline.fetch_page = fake_fetch
+    results, timings, peaks = {}, {}, {}
+    try:
+        for engine, run in engines.items():
+            in_flight["max"] = 0
+            start = time.perf_counter()
+            results[engine] = run()
+            timings[engine] = time.perf_counter() - start
+            peaks[engine] = in_flight["max"]
+    finally:
+        async_scrape.fetch_page, scrape_pipeline.fetch_page = fetch_pages
+
+    new, old = results["async"], results["pipeline"]
+    same = list(new) == list(old)
+    for t in old:
+        same = same and new[t]["players"].equals(old[t]["players"]) and list(new[t]["pairings"]) == list(old[t]["pairings"])
+        same = same and all(new[t]["pairings"][key]["df"].equals(round_dict["df"]) for key, round_dict in old[t]["pairings"].items())
+    within_limit = all(peak <= max_per_host for peak in peaks.values())
+
+    print(f"{len(url_dict)} tournaments, {len(site)} pages, {1000 * latency:.0f}ms per request, {max_per_host} requests per host")
+    print(f"Identical tables from both engines: {same}; requests in flight within the limit: {within_limit} {peaks}")
+    for engine, seconds in timings.items():
+        print(f"{engine:>9}: {seconds:6.2f}s")
+
+    return timings, same and within_limit
+
+
+def bench_offline_rebuild(store_dir=SCRAPED_STORE):
+    """Rebuild the results from the scraped data store with sockets disabled, and time every stage.
+
+    The rebuilt results are checked against plot_df built straight from the store.
+    """
+    def no_network(*args, **kwargs):
+        raise RuntimeError("Network access during the offline rebuild")
+
+    connect = socket.socket.connect
+    socket.socket.connect = no_network
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            results_csv = os.path.join(tmp, "scrape_results.csv")
+            db_path = os.path.join(tmp, "results.db")
+            timings = rebuild_results(store_dir=store_dir, db_path=db_path, results_csv=results_csv)
+            rebuilt = pd.read_csv(results_csv)
+
+            # The app loads the snapshot written with the store, and gets the store's matchups from it
+            with ResultsStore(db_path, read_only=True) as store, open_results(db_path) as snapshot:
+                snapshot_same = isinstance(snapshot, ResultsSnapshot) and snapshot.query().equals(store.to_plot_df())
+    finally:
+        socket.socket.connect = connect
+
+    logging.getLogger().setLevel(logging.WARNING)
+    expected = scraped_plot_df(store_dir)
+    rebuilt["t_url"] = rebuilt["t_url"].map(tournament_folder)
+    columns = ["deck", "opposing_deck", "t_url", "date", "wins", "losses", "ties", "winrate", "games_played"]
+    rebuilt = rebuilt[columns].sort_values(["t_url", "deck", "opposing_deck"], ignore_index=True)
+    expected = expected[columns].sort_values(["t_url", "deck", "opposing_deck"], ignore_index=True)
+    same = len(rebuilt) == len(expected) and np.allclose(rebuilt[columns[4:]], expected[columns[4:]], equal_nan=True)
+    same = same and rebuilt[columns[:4]].astype(str).equals(expected[columns[:4]].astype(str))
+
+    print(f"Rebuilt {len(rebuilt)} matchups with no network access, identical to plot_df: {same}")
+    print(f"Up to date results snapshot identical to the store: {snapshot_same}")
+    for stage, seconds in timings.items():
+        print(f"{stage:>10}: {seconds:6.2f}s")
+
+    return timings, same and snapshot_same
+
+
+class CachedResponse:
+    """The parts of a requests response that HttpCache.store reads."""
+
+    def __init__(self, text):
+        self.text = text
+        self.headers = {"ETag": f'"{len(text)}"'}
+
+
+def bench_http_cache(store_dir=SCRAPED_STORE, n_tournaments=30, fetch_workers=8):
+    """Store pages in the HTTP cache from several threads, writing index.json on every page and in batches.
+
+    The cache holds half the pages, so it evicts as it goes. Pages are rendered from tournaments in
+    the scraped data store. Afterwards the index on disk must match the cache and point to every body
+    left on disk and nothing else.
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    site, _ = synthetic_site(store_dir, n_tournaments)
+    # Some pages twice, under another URL, so bodies are shared
+    pages = list(site.items()) + [(f"{url}&copy", page) for url, page in list(site.items())[::4]]
+    max_bytes = sum(len(page.encode("utf-8")) for page in site.values()) // 2
+
+    timings, ok = {}, True
+    for label, write_every in (("every page", 1), ("batched", None)):
+        with tempfile.TemporaryDirectory() as tmp:
+            kwargs = {} if write_every is None else {"write_every": write_every}
+            cache = HttpCache(tmp, max_bytes=max_bytes, **kwargs)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=fetch_workers) as pool:
+                list(pool.map(lambda item: cache.store(item[0], CachedResponse(item[1])), pages))
+            cache.flush()
+            timings[label] = time.perf_counter() - start
+
+            stats = cache.stats()
+            reloaded = HttpCache(tmp, max_bytes=max_bytes)
+            on_disk = {name for folder in os.listdir(os.path.join(tmp, "objects"))
+                       for name in os.listdir(os.path.join(tmp, "objects", folder))}
+            consistent = reloaded.index == cache.index and on_disk == set(cache.refs)
+            consistent = consistent and stats["bytes"] == sum(os.path.getsize(reloaded._object_path(h)) for h in on_disk)
+            ok = ok and consistent and stats["bytes"] <= max_bytes
+
+        print(f"{label:>10}: {timings[label]:6.2f}s for {len(pages)} pages, {stats['evictions']} evictions, "
+              f"{stats['urls']} URLs and {stats['bytes'] / 1e6:.1f}MB kept (limit {max_bytes / 1e6:.1f}MB); "
+              f"index matches the bodies on disk: {consistent}")
+    print(f"   speedup: {timings['every page'] / timings['batched']:.1f}x")
+
+    revalidation = check_revalidation(next(iter(site.values())))
+    print(f"Running tournament revalidated, corrected page picked up, completed tournament served without "
+          f"requests, also after a restart: {revalidation}")
+
+    return timings, ok and revalidation
+
+
+class SiteResponse:
+    """A response from SiteServer, with what HttpClient.get_text reads."""
+
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class SiteServer:
+    """Serves pages in place of HttpClient.get, answering conditional requests with 304 like the site."""
+
+    def __init__(self, pages):
+        self.pages = dict(pages)
+        self.requests = 0
+
+    def get(self, url, headers=None):
+        self.requests += 1
+        page = self.pages[url]
+        etag = f'"{hashlib.sha256(page.encode("utf-8")).hexdigest()[:16]}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return SiteResponse(304)
+
+        return SiteResponse(200, page, {"ETag": etag})
+
+
+def check_revalidation(page):
+    """Fetch a tournament page through HttpClient while the tournament runs, is corrected and is completed."""
+    tournament = "https://play.limitlesstcg.com/tournament/check/"
+    url = tournament + "standings"
+    server = SiteServer({url: page})
+    with tempfile.TemporaryDirectory() as tmp:
+        client = HttpClient(cache=HttpCache(tmp))
+        client.get = server.get
+        # Running: stored, then revalidated on every fetch
+        ok = client.get_text(url) == page and client.get_text(url) == page and server.requests == 2
+        # Corrected while running
+        server.pages[url] = page + "<!-- corrected -->"
+        ok = ok and client.get_text(url) == server.pages[url] and server.requests == 3
+        # Listed as completed: one more revalidation, then no requests
+        client.mark_completed([tournament])
+        ok = ok and client.get_text(url) == server.pages[url] and server.requests == 4
+        ok = ok and client.get_text(url) == server.pages[url] and server.requests == 4
+        client.cache.flush()
+
+        # The next run serves it before the organizer page is read
+        restarted = HttpClient(cache=HttpCache(tmp))
+        restarted.get = server.get
+        ok = ok and restarted.get_text(url) == server.pages[url] and server.requests == 4
+        restarted.cache.flush()
+
+    return ok
+
+
+BENCHMARKS = {
+    "round_discovery": bench_round_discovery,
+    "parsers": bench_parsers,
+    "row_builder": bench_row_builder,
+    "archetype_wr": bench_archetype_wr,
+    "tournament_wr": bench_tournament_wr,
+    "plot_df": bench_plot_df,
+    "parallel_wr": bench_parallel_wr,
+    "player_join": bench_player_join,
+    "results_store": bench_results_store,
+    "scraped_store": bench_scraped_store,
+    "results_queries": bench_results_queries,
+    "snapshot_log": bench_snapshot_log,
+    "scrape_journal": bench_scrape_journal,
+    "scrape_engines": bench_scrape_engines,
+    "offline_rebuild": bench_offline_rebuild,
+    "http_cache": bench_http_cache,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Build the results store and its binary snapshot from the results in git.
+
+The full results, the store and the snapshot are generated files and aren't committed, so a deploy only
+pushes the daily additions to the snapshot log in results/dated. Heroku runs this while building the app
+(bin/post_compile); after a fresh clone, run it with `python data_collection/build_results.py`.
+Nothing here scrapes or parses.
+"""
+
+# imports
+import logging
+import os
+
+import pandas as pd
+
+from results_store import RESULTS_DB, ResultsStore, write_snapshot
+from snapshot_log import checkpoint_log, results_log
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+RESULTS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "latest", "scrape_results.csv")
+
+
+def build_results(db_path=RESULTS_DB, results_csv=RESULTS_CSV):
+    """Build the results store at db_path and its binary snapshot from scrape_results.csv.
+
+    If results_csv is missing, it is first restored from the newest snapshot in the results' snapshot log.
+    Every run saves a snapshot of the results and of the checkpoint, so a results snapshot older than the
+    newest checkpoint snapshot means the log is missing results, and nothing is built.
+    The store is built next to any old one and swapped in once complete.
+
+    Arguments:
+        db_path (str): Path of the SQLite results store to build.
+        results_csv (str): Path of the full results, as written by update_results.
+    """
+    if not os.path.exists(results_csv):
+        results_date = results_log().dates()[-1]
+        checkpoint_date = checkpoint_log().dates()[-1]
+        if results_date < checkpoint_date:
+            raise ValueError(f"Newest results in the snapshot log are from {results_date}, but the checkpoint "
+                             f"was updated on {checkpoint_date}; add the current results to the log first")
+        logging.info(f"{results_csv} not found, restoring the {results_date} results from the snapshot log")
+        os.makedirs(os.path.dirname(results_csv), exist_ok=True)
+        results_log().restore(results_date, results_csv)
+
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with ResultsStore(tmp_path) as store:
+        store.upsert(pd.read_csv(results_csv))
+        plot_df = store.to_plot_df()
+    os.replace(tmp_path, db_path)
+    write_snapshot(plot_df, db_path)
+
+
+if __name__ == "__main__":
+    build_results()
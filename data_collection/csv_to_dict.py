@@ -13,58 +13,39 @@ import datetime
 
 from limitless_scrape import *
 from limitless_analysis import *
+from scraped_store import SCRAPED_STORE, read_scraped
+from rebuild_results import load_checkpoint
 
 
 # In[2]:
 
 
 # Create path for scraped data
-scraped_data = os.path.join(os.getcwd(), "scraped_data")
-
-folder_paths = [x[0] for x in os.walk(scraped_data)][1:]
+scraped_data = SCRAPED_STORE
 
 
 # In[3]:
 
 
 def csv_to_dict(t_dir):
-    folder_paths = [x[0] for x in os.walk(t_dir)][1:]
-    
-    # Dict for all csv files
-    csv_dict = {}
-
-    for path in folder_paths: 
-        csvs = glob.glob(os.path.join(path, '*.csv'))
-        csv_dict[path] = csvs
+    # Read in all scraped data from the store; one entry per tournament
+    stored_dict = read_scraped(t_dir)
     
     # Read in all scraped data into a new dict; add date
     scraped_dict = {}
 
-    for t in csv_dict:
-        # Read in players/standings
+    for t in stored_dict:
+        # Players/standings and rounds, keyed by the end of the tournament name
         t_name = t.split('_')[-1]
-        scraped_dict[t_name] = {}
-        scraped_dict[t_name]['players'] = pd.read_csv(os.path.join(t, "players.csv"))
-
-        # Read in rounds 
-        scraped_dict[t_name]["pairings"] = {}
-
-        for round_num in range(1,15):
-            csv_path = os.path.join(t, f"round_{round_num}.csv")
-            # print(csv_path)
-            try:
-                scraped_dict[t_name]["pairings"][f"round_{round_num}_pairings"] = {} 
-                scraped_dict[t_name]["pairings"][f"round_{round_num}_pairings"]["df"] = pd.read_csv(csv_path)
-            except:
-                continue
+        scraped_dict[t_name] = stored_dict[t]
                 
-    # Scrape completed tournaments to get dates
-    df_latenight = scrape_for_dates_and_url()
+    # Get dates from the checkpoint, so no scraping is needed
+    ckpt_df = load_checkpoint()
     
     # For every tournament, if t_name in URL, grab the date
     for t in scraped_dict:
-        row = df_latenight[df_latenight['URL'].str.contains(t)]
-        scraped_dict[t]["date"] = row.iloc[0]["Date"]
+        row = ckpt_df[ckpt_df['url'].str.contains(t)]
+        scraped_dict[t]["date"] = row.iloc[0]["date"]
     
     return scraped_dict
     
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "http_cache")
+
+# Evict least recently used pages once the cached bodies take more space than this
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+# Eviction frees space down to this fraction of MAX_CACHE_BYTES, so a full cache isn't sorted on every miss
+EVICT_TO = 0.9
+
+# Write index.json after this many new pages; flush() writes the rest
+INDEX_WRITE_EVERY = 100
+
+
+class HttpCache:
+    """On-disk cache of raw HTML responses.
+
+    Bodies are stored once per content hash under objects/, and index.json maps every URL to the hash
+    of its body along with the ETag and Last-Modified headers needed for conditional requests. Whoever
+    stores a page says whether it is immutable, e.g. a page of a tournament that was already completed
+    when it was downloaded; those are served straight from the cache, every other page is revalidated.
+
+    index.json is written every write_every new pages and by flush(), which runs on exit, rather than
+    on every page. A body is on disk before its URL is in the index, so a crash in between only leaves
+    a body that the next store of the page reuses.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, write_every=INDEX_WRITE_EVERY):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.write_every = write_every
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock = threading.Lock()
+        # Only one thread writes index.json at a time, without holding up lookups and stores
+        self.write_lock = threading.Lock()
+        self.dirty = False
+        self.unwritten = 0
+        self.counts = {"hits": 0, "revalidated": 0, "misses": 0, "evictions": 0}
+
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+
+        # Number of URLs pointing to every body, and the size of every body
+        self.refs = {}
+        self.sizes = {}
+        self.total_bytes = 0
+        for entry in self.index.values():
+            self._add_ref(entry)
+
+        # Access times are only kept in memory between writes, save them on exit
+        atexit.register(self.flush)
+
+    def _add_ref(self, entry):
+        content_hash = entry["sha256"]
+        if content_hash not in self.refs:
+            self.refs[content_hash] = 0
+            self.sizes[content_hash] = entry["size"]
+            self.total_bytes += entry["size"]
+        self.refs[content_hash] += 1
+
+    def _drop_ref(self, entry):
+        """Forget a URL's body, and return True if no other URL points to it."""
+        content_hash = entry["sha256"]
+        self.refs[content_hash] -= 1
+        if self.refs[content_hash] > 0:
+            return False
+        del self.refs[content_hash]
+        self.total_bytes -= self.sizes.pop(content_hash)
+
+        return True
+
+    def _object_path(self, content_hash):
+        return os.path.join(self.cache_dir, "objects", content_hash[:2], content_hash)
+
+    def _read_body(self, content_hash):
+        with open(self._object_path(content_hash), encoding="utf-8") as f:
+            return f.read()
+
+    def lookup(self, url):
+        """Return the cached entry for url, or None. Marks the entry as recently used."""
+        with self.lock:
+            entry = self.index.get(url)
+            if entry is None or not os.path.exists(self._object_path(entry["sha256"])):
+                return None
+            entry["last_access"] = time.time()
+            self.dirty = True
+            return dict(entry)
+
+    def conditional_headers(self, entry):
+        """Build the If-None-Match/If-Modified-Since headers to revalidate a cached entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def hit(self, entry, revalidated=False):
+        """Count a page served from the cache and return its body."""
+        with self.lock:
+            self.counts["revalidated" if revalidated else "hits"] += 1
+
+        return self._read_body(entry["sha256"])
+
+    def set_immutable(self, url):
+        """Serve the cached page at url without revalidating it from now on."""
+        with self.lock:
+            entry = self.index.get(url)
+            if entry is not None and not entry.get("immutable"):
+                entry["immutable"] = True
+                self.dirty = True
+
+    def store(self, url, response, immutable=False):
+        """Save the body and validators of a 200 response, then evict pages if the cache is too big.
+
+        Arguments:
+            url (str): URL of the page.
+            response (Response): Response with the page.
+            immutable (bool): True if the page will never change, so it is never revalidated.
+
+        Returns:
+            body (str): HTML of the page.
+
+        """
+        body = response.text
+        data = body.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(content_hash)
+
+        # Identical bodies are only written once
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, object_path)
+
+        entry = {
+            "sha256": content_hash,
+            "size": len(data),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "immutable": immutable,
+            "last_access": time.time(),
+        }
+        with self.lock:
+            self.counts["misses"] += 1
+            old_entry = self.index.get(url)
+            self._add_ref(entry)
+            self.index[url] = entry
+            if old_entry is not None and self._drop_ref(old_entry):
+                self._remove_body(old_entry["sha256"])
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.dirty = True
+            self.unwritten += 1
+            write = self.unwritten >= self.write_every
+
+        if write:
+            self.flush()
+
+        return body
+
+    def _evict(self):
+        """Drop least recently used URLs until the bodies fit in EVICT_TO of max_bytes. Caller holds the lock."""
+        for url, entry in sorted(self.index.items(), key=lambda item: item[1]["last_access"]):
+            if self.total_bytes <= self.max_bytes * EVICT_TO:
+                break
+            del self.index[url]
+            self.counts["evictions"] += 1
+
+            # Only delete the body once no other URL points to it
+            if self._drop_ref(entry):
+                self._remove_body(entry["sha256"])
+
+    def _remove_body(self, content_hash):
+        try:
+            os.remove(self._object_path(content_hash))
+        except FileNotFoundError:
+            pass
+
+    def flush(self):
+        """Atomically replace index.json if pages or access times haven't been written yet."""
+        with self.write_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                # Copy the entries, and write them without holding up the other threads
+                index = {url: dict(entry) for url, entry in self.index.items()}
+                self.dirty = False
+                self.unwritten = 0
+
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+
+    def stats(self):
+        """Return hit/miss counts, the hit rate, and the size of the cache."""
+        with self.lock:
+            stats = dict(self.counts)
+            stats["urls"] = len(self.index)
+            stats["bytes"] = self.total_bytes
+
+        served = stats["hits"] + stats["revalidated"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["revalidated"]) / served, 3) if served else None
+
+        return stats
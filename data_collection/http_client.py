@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import datetime
+import email.utils
+import logging
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+from tenacity.wait import wait_base
+
+from http_cache import HttpCache
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+request_header = {"User-Agent":  "Late Night Results Compiler (andrew.dang94@gmail.com)"}
+
+# Seconds to wait for a connection, and then for the server to send data
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+# Number of keep-alive connections kept open per host; should be at least the scraper's concurrency
+POOL_SIZE = 16
+
+# Retry settings for server errors, rate limiting, timeouts and dropped connections
+MAX_ATTEMPTS = 5
+BACKOFF_MULTIPLIER = 0.5
+MAX_BACKOFF = 30
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Longest Retry-After waited for; a server asking for more gets retried sooner
+MAX_RETRY_AFTER = 120
+
+# The tournament a page belongs to, e.g. https://play.limitlesstcg.com/tournament/<id>/ of its pairings
+TOURNAMENT_URL = re.compile(r"^(.*/tournament/[^/?#]+/)")
+
+
+def parse_retry_after(value, now=None):
+    """Return the seconds to wait from a Retry-After header, given in seconds or as an HTTP date.
+
+    Arguments:
+        value (str): Value of the Retry-After header, or None.
+        now (datetime): Current time, for HTTP dates; the current UTC time by default.
+
+    Returns:
+        seconds (float): Seconds to wait, at least 0, or None if there is no usable value.
+
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    # HTTP dates are in GMT; a date without a zone is taken as UTC
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+
+    return max((retry_at - now).total_seconds(), 0.0)
+
+
+class RetryableStatusError(Exception):
+    """Raised when the server answers with a status code that is worth retrying.
+
+    retry_after holds the seconds the server asked to wait in its Retry-After header (e.g. with a 429
+    or 503), or None.
+    """
+
+    def __init__(self, url, status_code, retry_after=None):
+        super().__init__(f"{url} returned status code {status_code}")
+        self.url = url
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class WaitRetryAfter(wait_base):
+    """Tenacity wait that waits as long as the server's Retry-After says, and uses fallback otherwise."""
+
+    def __init__(self, fallback, max_wait=MAX_RETRY_AFTER):
+        self.fallback = fallback
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state):
+        retry_after = getattr(retry_state.outcome.exception(), "retry_after", None)
+        if retry_after is not None:
+            return min(retry_after, self.max_wait)
+
+        return self.fallback(retry_state)
+
+
+def is_retryable(exception):
+    """Retry on server errors, rate limiting, timeouts and connection errors."""
+    return isinstance(exception, (RetryableStatusError, requests.ConnectionError, requests.Timeout))
+
+
+class HttpClient:
+    """Pooled HTTP client used by every scraping function.
+
+    One requests.Session keeps connections to play.limitlesstcg.com alive between pages. Every
+    request has connect and read timeouts, and failed requests are retried after the wait the server
+    asks for in Retry-After, or with jittered exponential backoff if it doesn't say. The client counts
+    requests, new connections (handshakes), reused connections and retries.
+
+    If a HttpCache is given, get_text revalidates cached pages with a conditional GET. Pages of the
+    tournaments passed to mark_completed, i.e. listed as completed on the organizer page, are stored
+    as immutable and served from the cache without any request from then on. Pages of tournaments
+    that were still running are revalidated, so standings and pairings published later are picked up.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_attempts=MAX_ATTEMPTS, cache=None):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.cache = cache
+
+        self.session = requests.Session()
+        self.session.headers.update(request_header)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.adapter = adapter
+
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "retries": 0}
+        self.completed = set()
+
+    def mark_completed(self, tournament_urls):
+        """Cache the pages of these tournaments for good; they are listed as completed on the organizer page."""
+        with self.lock:
+            self.completed.update(tournament_urls)
+
+    def is_completed(self, url):
+        """Return True if url is a page of a tournament passed to mark_completed."""
+        match = TOURNAMENT_URL.match(url)
+        with self.lock:
+            return match is not None and match.group(1) in self.completed
+
+    def _get(self, url, headers=None):
+        """Send a single GET request; raise RetryableStatusError for status codes worth retrying."""
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        with self.lock:
+            self.counts["requests"] += 1
+
+        if response.status_code in RETRY_STATUS_CODES:
+            raise RetryableStatusError(url, response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+
+        return response
+
+    def _count_retry(self, retry_state):
+        with self.lock:
+            self.counts["retries"] += 1
+        logging.info(f"Retrying after attempt {retry_state.attempt_number} failed: {retry_state.outcome.exception()}")
+
+    def get(self, url, headers=None):
+        """Send a GET request, retrying on server errors, rate limiting, timeouts and connection errors.
+
+        Arguments:
+            url (str): URL of the page to download.
+            headers (dict): Extra request headers.
+
+        Returns:
+            response (Response): Response of the last attempt.
+
+        """
+        retrying = Retrying(
+            retry=retry_if_exception(is_retryable),
+            wait=WaitRetryAfter(wait_random_exponential(multiplier=BACKOFF_MULTIPLIER, max=MAX_BACKOFF)),
+            stop=stop_after_attempt(self.max_attempts),
+            before_sleep=self._count_retry,
+            reraise=True
+        )
+
+        return retrying(self._get, url, headers=headers)
+
+    def get_text(self, url):
+        """Return the HTML of a page, from the cache when possible.
+
+        Arguments:
+            url (str): URL of the page to download.
+
+        Returns:
+            page (str): HTML of the page.
+
+        """
+        if self.cache is None:
+            return self.get(url).text
+
+        entry = self.cache.lookup(url)
+
+        # Stored after the tournament was completed, no need to ask the server
+        if entry is not None and entry.get("immutable"):
+            return self.cache.hit(entry)
+
+        completed = self.is_completed(url)
+        headers = self.cache.conditional_headers(entry) if entry is not None else None
+        response = self.get(url, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            # Still current now that the tournament is over, so it won't change again
+            if completed:
+                self.cache.set_immutable(url)
+            return self.cache.hit(entry, revalidated=True)
+
+        # Only successful responses are worth keeping
+        if response.status_code == 200:
+            return self.cache.store(url, response, immutable=completed)
+
+        return response.text
+
+    def stats(self):
+        """Return the number of requests, handshakes, reused connections and retries so far, plus cache statistics."""
+        # Every connection pool counts the connections it had to open
+        pools = self.adapter.poolmanager.pools
+        handshakes = sum(pools[key].num_connections for key in pools.keys())
+
+        with self.lock:
+            stats = dict(self.counts)
+
+        stats["handshakes"] = handshakes
+        stats["reuses"] = stats["requests"] - handshakes
+
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+
+        return stats
+
+
+# Shared client, created on first use
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the HttpClient shared by all scraping functions."""
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(cache=HttpCache())
+
+    return _client
@@ -5,8 +5,7 @@
 import numpy as np
 import pandas as pd
 
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 import re
 import logging
@@ -17,7 +16,89 @@ logger.setLevel(logging.INFO)
 
 import os
 
-request_header = {"User-Agent":  "Late Night Results Compiler (andrew.dang94@gmail.com)"}
+from http_client import get_client, request_header
+from results_store import RESULTS_DB, ResultsStore, write_snapshot
+from snapshot_log import SnapshotLog
+
+# Number of rounds to try when the round count can't be read from the Pairings page
+MAX_ROUNDS = 14
+
+# Parser used for every page. 'html5lib' builds the whole DOM and is kept only to compare against
+HTML_PARSER = 'lxml'
+
+
+def fetch_page(url):
+    """Send a GET request through the shared HTTP client and return the HTML of the page.
+
+    Arguments:
+        url (str): URL of the page to download.
+
+    Returns:
+        page (str): HTML of the page.
+
+    """
+    return get_client().get_text(url)
+
+
+class TableBuilder:
+    """Collect the rows of a table column by column and create the DataFrame once at the end.
+
+    Replaces growing a DataFrame with df.loc[len(df)] = row, which copies the frame for every row. 
+    The column order is fixed when the builder is created, and every column gets the dtype given 
+    in dtypes (object by default, which is what the scraped text columns have always had).
+
+    Arguments:
+        columns (list): Column names, in order.
+        dtypes (dict): Optional dtype for each column name.
+    """
+
+    def __init__(self, columns, dtypes=None):
+        self.columns = list(columns)
+        self.dtypes = dtypes or {}
+        self.values = [[] for _ in self.columns]
+
+    def __len__(self):
+        return len(self.values[0]) if self.values else 0
+
+    def append(self, row):
+        """Add a row; it must have one value per column."""
+        if len(row) != len(self.columns):
+            raise ValueError(f"Row has {len(row)} values but the table has {len(self.columns)} columns: {row}")
+
+        for column_values, value in zip(self.values, row):
+            column_values.append(value)
+
+    def to_frame(self):
+        """Create the DataFrame from the collected rows."""
+        data = {}
+        for i, (column, column_values) in enumerate(zip(self.columns, self.values)):
+            data[i] = pd.Series(column_values, dtype=self.dtypes.get(column, object))
+
+        # Columns are keyed by position first, so repeated header names are kept
+        df = pd.DataFrame(data)
+        df.columns = self.columns
+
+        return df
+
+
+def make_table_soup(page, parser=HTML_PARSER):
+    """Parse only the tables of a page.
+
+    With lxml, a SoupStrainer skips everything outside of <table> tags, so only the tables are built. 
+    html5lib can't use a SoupStrainer and builds the full DOM.
+
+    Arguments:
+        page (str): HTML of the page.
+        parser (str): Name of the parser used by BeautifulSoup, 'lxml' or 'html5lib'.
+
+    Returns:
+        soup (BeautifulSoup): Parsed tables of the page.
+
+    """
+    if parser == 'html5lib':
+        return BeautifulSoup(page, 'html5lib')
+
+    return BeautifulSoup(page, parser, parse_only=SoupStrainer('table'))
 
 
 def create_urls(tournaments):
@@ -41,8 +122,8 @@ def create_urls(tournaments):
         round_urls = []
         standings_url = t + "standings"
         
-        # Get urls for rounds 
-        for i in range(1,15):
+        # Get urls for rounds; only used as an upper bound, see find_round_count
+        for i in range(1, MAX_ROUNDS + 1):
             round_url = t + f"pairings?round={i}"
             round_urls.append(round_url)
         
@@ -61,6 +142,10 @@ def scrape_limitless_latenight(urls):
 
     Scrapes the pairings pages of a Late Night tournament. Returns a DataFrame
     containing Player Names, Player Recods, Player IDs, and the result of each pairing.
+
+    The number of rounds is read from the round navigation of the first Pairings page, so 
+    only rounds that were played are downloaded. If the navigation can't be found, rounds are 
+    scraped in order until the first round without pairings.
     
     Arguments: 
         urls (list): list of urls
@@ -73,109 +158,27 @@ def scrape_limitless_latenight(urls):
     
     # Empty dictionary to store results of each round 
     all_round_dict = {}
+    round_urls = list(urls)
     
     # Loop through each round 
-    for round_i, url in enumerate(urls, start=1):
+    round_i = 0
+    while round_i < len(round_urls):
+        round_i += 1
+
         # Create dictionaries to store data 
         round_dict = {}
         
-        page = requests.get(url, headers=request_header).text
-        soup = BeautifulSoup(page, 'html5lib')
+        page = fetch_page(round_urls[round_i - 1])
+        df = parse_pairings_table(page)
 
-        # Find the table
-        table = soup.find('table')
+        # If no table or no pairings, round doesn't exist, neither do the rounds after it
+        if df is None or df.empty:
+            break
 
-        # If no table, round doesn't exist, go to next round
-        if table == None:
-            continue
+        # Only keep the rounds listed in the round navigation
+        if round_i == 1:
+            round_urls = trim_round_urls(round_urls, find_round_count(page))
 
-        # get headers
-        headers = []
-        
-        # Find headers
-        for item in table.find_all('th'):
-            title = item.text
-            headers.append(title)
-
-        # Rename headers
-        headers[0] = 'Pairing'
-        headers[1] = "Player 1"
-        headers[2] = 'Player 1 Score'
-        headers[3] = 'Player 2 Score'
-        headers[4] = 'Player 2'
-        headers.append('Player 1 Name')
-        headers.append('Player 2 Name')
-        headers.append('Player 1 Record')
-        headers.append('Player 2 Record')
-        headers.append('Winner ID')
-        headers.append('Player 1 ID')
-        headers.append('Player 2 ID')
-
-        # Create df
-        df = pd.DataFrame(columns = headers)
-
-        players_list = ['skip']
-        records_list = ['skip']
-        ids_list = ['skip']
-
-        # Get the data in each row
-        for row_i, row in enumerate(table.find_all('tr')[1:], start=1):
-
-            # Get player id of winner
-            winner_id = row.get('data-winner')
-            
-            data = row.find_all('td')
-
-            # empty list of player names and records 
-            pairings = []
-            records = []
-            player_ids = []
-
-            # Get data for each row
-            for ri, td in enumerate(data):
-                # Get player names and records for each row, found in the 'a' tag 
-                a = td.find_all('a')
-                
-                # get player names, player ids, and player records
-                for tag in a:
-                    # player ids
-                    href = tag.get('href')
-                    player_id = href.split('player/')[-1]
-                    player_ids.append(player_id)
-                        
-                    # records and names
-                    score = tag.find('div', {"class": "score"}).string
-                    player = tag.find('div', {"class": "name"}).string
-                    pairings.append(player)
-                    records.append(score)
-
-            # Make sure players and records list has len 2
-            if len(player_ids) != 2:
-                player_ids.append("*Bye*")
-            
-            if len(pairings) != 2:
-                pairings.append("*Bye*")
-
-            if len(records) != 2:
-                records.append("N/A")
-
-            # append append pairings to player_list and records to records_list
-            players_list.append(pairings)
-            records_list.append(records)
-            ids_list.append(player_ids)
-
-            # Get data from row
-            row_data = [td.text.strip() for td in data]
-            # Add player names and records to row data
-            row_data.extend(players_list[row_i])
-            row_data.extend(records_list[row_i])
-            row_data.append(winner_id)
-            row_data.extend(ids_list[row_i])
-
-            # Write row to df
-            length = len(df)
-            df.loc[length] = row_data
-            
         # # Save df to dictionary
         round_dict["df"] = df
 
@@ -183,6 +186,157 @@ def scrape_limitless_latenight(urls):
         
     
     return all_round_dict
+
+
+def find_round_count(page):
+    """Find the number of rounds in a tournament from the round navigation of a Pairings page.
+
+    Arguments:
+        page (str): HTML of a tournament's Pairings page.
+
+    Returns:
+        round_count (int): Highest round number linked from the page. None if the page has no 
+                           round navigation.
+
+    """
+    rounds = [int(r) for r in re.findall(r'pairings\?round=(\d+)', page)]
+
+    if len(rounds) == 0:
+        return None
+
+    return max(rounds)
+
+
+def trim_round_urls(round_urls, round_count):
+    """Cut the list of Pairings URLs down to the rounds that were played.
+
+    Arguments:
+        round_urls (list): Pairings URLs created by create_urls.
+        round_count (int): Number of rounds in the tournament, or None if unknown.
+
+    Returns:
+        round_urls (list): Pairings URLs for rounds 1 to round_count. Unchanged if round_count is None.
+
+    """
+    if round_count is None:
+        return round_urls
+
+    t = round_urls[0].split("pairings?round=")[0]
+
+    return [t + f"pairings?round={i}" for i in range(1, round_count + 1)]
+
+
+def parse_pairings_table(page, parser=HTML_PARSER):
+    """Parse the pairings table of a single round.
+
+    Arguments:
+        page (str): HTML of a tournament's Pairings page for one round.
+        parser (str): Name of the parser used by BeautifulSoup.
+
+    Returns:
+        df (DataFrame): DataFrame with Player Names, Player Records, Player IDs, and the result
+                        of each pairing. None if the page has no pairings table.
+
+    """
+    soup = make_table_soup(page, parser)
+
+    # Find the table
+    table = soup.find('table')
+
+    # If no table, round doesn't exist
+    if table == None:
+        return None
+
+    # get headers
+    headers = []
+    
+    # Find headers
+    for item in table.find_all('th'):
+        title = item.text
+        headers.append(title)
+
+    # Rename headers
+    headers[0] = 'Pairing'
+    headers[1] = "Player 1"
+    headers[2] = 'Player 1 Score'
+    headers[3] = 'Player 2 Score'
+    headers[4] = 'Player 2'
+    headers.append('Player 1 Name')
+    headers.append('Player 2 Name')
+    headers.append('Player 1 Record')
+    headers.append('Player 2 Record')
+    headers.append('Winner ID')
+    headers.append('Player 1 ID')
+    headers.append('Player 2 ID')
+
+    # Collect rows, create df at the end
+    table_builder = TableBuilder(headers)
+
+    players_list = ['skip']
+    records_list = ['skip']
+    ids_list = ['skip']
+
+    # Get the data in each row
+    for row_i, row in enumerate(table.find_all('tr')[1:], start=1):
+
+        # Get player id of winner
+        winner_id = row.get('data-winner')
+        
+        data = row.find_all('td')
+
+        # empty list of player names and records 
+        pairings = []
+        records = []
+        player_ids = []
+
+        # Get data for each row
+        for ri, td in enumerate(data):
+            # Get player names and records for each row, found in the 'a' tag 
+            a = td.find_all('a')
+            
+            # get player names, player ids, and player records
+            for tag in a:
+                # player ids
+                href = tag.get('href')
+                player_id = href.split('player/')[-1]
+                player_ids.append(player_id)
+                    
+                # records and names
+                # Copy to plain str; a NavigableString keeps the whole parse tree alive
+                score = tag.find('div', {"class": "score"}).string
+                player = tag.find('div', {"class": "name"}).string
+                score = str(score) if score is not None else None
+                player = str(player) if player is not None else None
+                pairings.append(player)
+                records.append(score)
+
+        # Make sure players and records list has len 2
+        if len(player_ids) != 2:
+            player_ids.append("*Bye*")
+        
+        if len(pairings) != 2:
+            pairings.append("*Bye*")
+
+        if len(records) != 2:
+            records.append("N/A")
+
+        # append append pairings to player_list and records to records_list
+        players_list.append(pairings)
+        records_list.append(records)
+        ids_list.append(player_ids)
+
+        # Get data from row
+        row_data = [td.text.strip() for td in data]
+        # Add player names and records to row data
+        row_data.extend(players_list[row_i])
+        row_data.extend(records_list[row_i])
+        row_data.append(winner_id)
+        row_data.extend(ids_list[row_i])
+
+        # Write row to df
+        table_builder.append(row_data)
+
+    return table_builder.to_frame()
     
     
 def scrape_players_and_decks(url):
@@ -201,8 +355,24 @@ def scrape_players_and_decks(url):
 
     """
     # Send request to get html
-    page = requests.get(url, headers=request_header).text
-    soup = BeautifulSoup(page, 'html5lib')
+    page = fetch_page(url)
+  
+    return parse_players_table(page)
+
+
+def parse_players_table(page, parser=HTML_PARSER):
+    """Parse the Standings table of a tournament.
+
+    Arguments:
+        page (str): HTML of a tournament's Standings page.
+        parser (str): Name of the parser used by BeautifulSoup.
+
+    Returns:
+        df (DataFrame): DataFrame that contains Player IDs, Player Names, and the deck that 
+                        each player played with for the tournament. 
+
+    """
+    soup = make_table_soup(page, parser)
         
     # Find the table
     player_table = soup.find('table')
@@ -218,8 +388,8 @@ def scrape_players_and_decks(url):
     headers[2] = 'Country'
     headers.append("Player ID")
 
-    # Create df
-    df = pd.DataFrame(columns = headers)
+    # Collect rows, create df at the end
+    table_builder = TableBuilder(headers)
 
     # Find the rows
     for row in player_table.find_all('tr')[1:]:
@@ -247,10 +417,9 @@ def scrape_players_and_decks(url):
         row_data = [td.text.strip() for td in data]
         row_data.append(player_id)
         row_data[pos] = deckname
-        length = len(df)
-        df.loc[length] = row_data
+        table_builder.append(row_data)
   
-    return df
+    return table_builder.to_frame()
         
         
 def multi_latenight_scrape(url_dict):
@@ -305,8 +474,42 @@ def scrape_for_dates_and_url():
     # Page for scraping tournaments 
     url = 'https://play.limitlesstcg.com/organizer/194'
 
-    page = requests.get(url, headers=request_header).text
-    soup = BeautifulSoup(page, 'html5lib')
+    page = fetch_page(url)
+    df = parse_completed_tournaments(page)
+
+    # Pages of completed tournaments are cached for good, pages of running ones are revalidated
+    get_client().mark_completed(df["URL"])
+
+    # filter tournaments for late nights; exclude special events 
+    df_latenight = df[
+    (~df[df.columns[1]].str.contains("Late Late")) &
+    (~df[df.columns[1]].str.contains("Invitational")) &
+    (~df[df.columns[1]].str.contains("Testing")) &
+    (~df[df.columns[1]].str.contains("Bonus Event")) &
+    (~df[df.columns[1]].str.contains("Marvel Snap")) & 
+    (~df[df.columns[1]].str.contains("Atlas")) &
+    (~df[df.columns[1]].str.contains("Upper Hand")) & 
+    (~df[df.columns[1]].str.contains("Metafy Regionals")) &
+    (~df[df.columns[1]].str.contains("Special")) &
+    (~df[df.columns[1]].str.contains("Fan Expo"))
+    ]
+    
+    return df_latenight
+
+
+def parse_completed_tournaments(page, parser=HTML_PARSER):
+    """Parse the table of completed tournaments on the organizer page.
+
+    Arguments:
+        page (str): HTML of the organizer page.
+        parser (str): Name of the parser used by BeautifulSoup.
+
+    Returns:
+        df (DataFrame): DataFrame that contains the date, name, format and url of every completed 
+                        tournament on the organizer page.
+
+    """
+    soup = make_table_soup(page, parser)
 
     # Completed table is the second one 
     completed = soup.find('table', {'class': 'striped completed-tournaments'})
@@ -325,8 +528,8 @@ def scrape_for_dates_and_url():
     headers[2] = 'Format'
     headers.append("URL")
 
-    # Create empty df 
-    df = pd.DataFrame(columns = headers)
+    # Collect rows, create df at the end
+    table_builder = TableBuilder(headers)
 
     # Look for td 
     date_list = []
@@ -354,24 +557,9 @@ def scrape_for_dates_and_url():
         # add date and url to row_data
         row_data[0] = date_list[row_i]
         row_data.append(url_list[row_i])
-        length = len(df)
-        df.loc[length] = row_data
+        table_builder.append(row_data)
 
-    # filter tournaments for late nights; exclude special events 
-    df_latenight = df[
-    (~df[df.columns[1]].str.contains("Late Late")) &
-    (~df[df.columns[1]].str.contains("Invitational")) &
-    (~df[df.columns[1]].str.contains("Testing")) &
-    (~df[df.columns[1]].str.contains("Bonus Event")) &
-    (~df[df.columns[1]].str.contains("Marvel Snap")) & 
-    (~df[df.columns[1]].str.contains("Atlas")) &
-    (~df[df.columns[1]].str.contains("Upper Hand")) & 
-    (~df[df.columns[1]].str.contains("Metafy Regionals")) &
-    (~df[df.columns[1]].str.contains("Special")) &
-    (~df[df.columns[1]].str.contains("Fan Expo"))
-    ]
-    
-    return df_latenight
+    return table_builder.to_frame()
 
 
 def add_date_to_dict(all_tournament_dict, df_latenight):
@@ -404,58 +592,79 @@ def add_date_to_dict(all_tournament_dict, df_latenight):
     return all_tournament_dict
 
 
-def update_results(current_results, net_new_results):
+def update_results(net_new_results, db_path=RESULTS_DB):
     """Add net new tournament results to existing dataset.
 
-    Takes the processed results from the latest folder and appends the processed data of the net new tournaments.
-    Saves the DataFrame back into the latest folder, as well as the dated folder with a date string. 
+    Upserts the processed data of the net new tournaments into the results store, keyed by tournament, deck and 
+    opposing deck. Only the rows of the net new tournaments are written, and a tournament that is already in the 
+    store replaces its old rows, so no deduplication over the whole history is needed. The full results are then 
+    exported to the latest folder, along with the binary snapshot the app loads, and the rows that changed since 
+    the last run are added to the snapshot log in the dated folder, from which the results of any date can be rebuilt. 
+
+    If the store doesn't exist yet, it is first filled from results/latest/scrape_results.csv.
 
     Arguments:
-        current_results (df): DataFrame with processed data of previously scraped tournaments.
         net_new_results (df): DataFrame with processed data of net net tournaments that were just scraped. 
+        db_path (str): Path to the SQLite results store.
     """
-    
-    # Add newly scraped data to previously scraped data
-    updated_plot_df = pd.concat([net_new_results, current_results], ignore_index=True)
-    logging.info(f"Number of rows before dropping duplicates: {updated_plot_df.shape[0]}")
 
-    # Drop duplicate rows 
-    updated_plot_df = updated_plot_df.drop_duplicates(ignore_index=True)
-    logging.info(f"Number of rows after dropping duplicates: {updated_plot_df.shape[0]}")
-   
-    # Define variables and paths for saving checkpoint
+    # Define variables and paths for saving results
     today = datetime.date.today().strftime("%Y-%m-%d")
     path_to_latest = os.path.join(os.getcwd(), "results/latest/scrape_results.csv")
-    path_to_dated = os.path.join(os.getcwd(), f"results/dated/scrape_results_{today}.csv")
-    
-     # Save ckpt to latest and dated
+    results_log = SnapshotLog(os.path.join(os.getcwd(), "results/dated"), "scrape_results")
+
+    with ResultsStore(db_path) as store:
+        # First run with the store: start from the existing results
+        if store.is_empty() and os.path.exists(path_to_latest):
+            logging.info("Results store is empty. Loading existing results into it...")
+            store.upsert(pd.read_csv(path_to_latest))
+
+        # Add newly scraped data to previously scraped data
+        store.upsert(net_new_results)
+        updated_plot_df = store.to_plot_df()
+    logging.info(f"Number of rows in results: {updated_plot_df.shape[0]}")
+   
+     # Save results to latest and dated
     logging.info("Saving results to 'latest' folder...")
     updated_plot_df.to_csv(path_to_latest, header=True, index=False)
-    logging.info("Saving results to 'dated' folder...")
-    updated_plot_df.to_csv(path_to_dated, header=True, index=False)   
+    write_snapshot(updated_plot_df, db_path)
+    logging.info("Adding results to the snapshot log in 'dated' folder...")
+    results_log.append(updated_plot_df, today)
     
     
-def update_checkpoint(wr_dict, ckpt_df):
+def update_checkpoint(wr_dict, ckpt_df, journal=None):
     """Update checkpoint file with the date and URLs of net new tournaments scraped.
 
     Takes the checkpoint.csv from the latest folder and updates it to include the 
-    net new tournament dates and URLs. 
+    net new tournament dates and URLs. The net new rows are added to the snapshot log in the dated folder.
+    With a scrape journal, only tournaments whose journal is complete are recorded, so a tournament 
+    that wasn't fully scraped is scraped again on the next run.
 
     Arguments:
         wr_dict (dict): Dictionary with the win rates of decks across multiple tournaments for net new tournaments.
         ckpt_df (DataFrame): DataFrame that contains URL and dates of tournaments already scraped. 
+        journal (ScrapeJournal): Optional journal the tournaments were scraped with.
+
+    Returns:
+        checkpointed (list): URLs of the tournaments added to the checkpoint.
     """
     
     # Create DataFrame for data just scraped to update the checkpoint
     headers = ["date", "name", "url"]
 
-    net_new_url_df = pd.DataFrame(columns=headers)
+    table_builder = TableBuilder(headers)
+    checkpointed = []
     
     # Add data to net_new_url_df
     for url, t_dict in wr_dict.items():
+            if journal is not None and not journal.is_complete(url):
+                logging.warning(f"Scrape journal of {url} is not complete, leaving it out of the checkpoint")
+                continue
             row = [t_dict["date"], t_dict["name"], url]
-            length = len(net_new_url_df)
-            net_new_url_df.loc[length] = row
+            table_builder.append(row)
+            checkpointed.append(url)
+
+    net_new_url_df = table_builder.to_frame()
     
     # Add net new to checkpoint
     ckpt_df = pd.concat([ckpt_df, net_new_url_df], ignore_index=True)
@@ -463,36 +672,12 @@ def update_checkpoint(wr_dict, ckpt_df):
     # Define variables and paths for saving checkpoint
     today = datetime.date.today().strftime("%Y-%m-%d")
     path_to_latest = os.path.join(os.getcwd(), "checkpoint/latest/checkpoint.csv")
-    path_to_dated = os.path.join(os.getcwd(), f"checkpoint/dated/checkpoint_{today}.csv")
+    checkpoint_log = SnapshotLog(os.path.join(os.getcwd(), "checkpoint/dated"), "checkpoint")
     
     # Save ckpt to latest and dated
     logging.info("Saving checkpoint to 'latest' folder...")
     ckpt_df.to_csv(path_to_latest, header=True, index=False)
-    logging.info("Saving checkpoint to 'dated' folder...")
-    ckpt_df.to_csv(path_to_dated, header=True, index=False)
+    logging.info("Adding checkpoint to the snapshot log in 'dated' folder...")
+    checkpoint_log.append(ckpt_df, today)
 
-
-def scrape_results_to_csv(scrape_results_dict):
-    """Saves scraped data to CSVs so scraping isn't required everytime a change is made to analysis. 
-
-    Args:
-        scrape_results_dict (dict): Dictionary that contains all the scraped tables. 
-    """
-    for key, value in scrape_results_dict.items():
-        strings = key.split('/')
-        folder_name = '_'.join(strings[-3:-1])
-        folder_path = f"scraped_data/{folder_name}"
-        os.makedirs(folder_path, exist_ok=True)
-        for table_name, table_value in value.items():
-            if table_name == "players":
-                filename = "players.csv"
-                file_path = f"{folder_path}/{filename}"
-                df = value[table_name]
-                df.to_csv(file_path, index=False, header=True)
-            if table_name == "pairings":
-                pairings_dict = value[table_name]
-                for round_dict, round_dict_value in pairings_dict.items():
-                    round_filename = f"{round_dict.split('_dict')[0]}.csv"
-                    round_file_path = f"{folder_path}/{round_filename}"
-                    round_df = round_dict_value['df']
-                    round_df.to_csv(round_file_path, index=False, header=True)
\ No newline at end of file
+    return checkpointed
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Rebuild the results from the scraped data store without touching the website.
+
+Run from the data_collection folder after changing the analysis, e.g. `python rebuild_results.py`.
+Tournament dates and names come from the checkpoint, the scraped tables from the scraped data store,
+and the results store, its binary snapshot and results/latest/scrape_results.csv are regenerated.
+Nothing here imports the scraper or the HTTP client.
+"""
+
+# imports
+import logging
+import os
+import time
+
+import pandas as pd
+
+from limitless_analysis import create_plot_df, multi_tournament_wr_per_tournament
+from results_store import RESULTS_DB, ResultsStore, write_snapshot
+from scraped_store import READ_WORKERS, SCRAPED_STORE, read_scraped, stored_tournaments, tournament_folder
+from snapshot_log import checkpoint_log
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CHECKPOINT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoint", "latest", "checkpoint.csv")
+RESULTS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "latest", "scrape_results.csv")
+
+# Number of threads reading the scraped data store
+read_workers = READ_WORKERS
+
+# Most processes counting WLT per tournament; 1 counts them in this process, which is fastest unless there are
+# several cores and many tournaments, None allows one process per core when there are (see pool_workers)
+analysis_workers = 1
+
+
+def load_checkpoint(checkpoint_csv=CHECKPOINT_CSV):
+    """Read the date, name and URL of every scraped tournament from the checkpoint.
+
+    Falls back to the newest snapshot in the checkpoint's snapshot log if the latest checkpoint is missing.
+    """
+    if os.path.exists(checkpoint_csv):
+        return pd.read_csv(checkpoint_csv, dtype=str, keep_default_na=False)
+
+    logging.warning(f"{checkpoint_csv} not found, using the newest dated checkpoint")
+    return checkpoint_log().rebuild()
+
+
+def rebuild_results(checkpoint_csv=CHECKPOINT_CSV, store_dir=SCRAPED_STORE, db_path=RESULTS_DB, results_csv=RESULTS_CSV,
+                    read_workers=READ_WORKERS, analysis_workers=1):
+    """Regenerate the results store, its binary snapshot and scrape_results.csv from the scraped data store.
+
+    Tournaments are keyed by URL and dated from the checkpoint, as in scrape_and_process. The new results
+    store is built next to the old one and swapped in once complete, so the app never sees it half built.
+
+    Arguments:
+        checkpoint_csv (str): Checkpoint with the date, name and URL of every tournament.
+        store_dir (str): Folder of the scraped data store.
+        db_path (str): Path to the SQLite results store to regenerate.
+        results_csv (str): Path of the scrape_results.csv to regenerate.
+        read_workers (int): Number of threads reading the scraped data store.
+        analysis_workers (int): Most processes counting WLT per tournament; 1 counts them in this process,
+                                None allows one per core when there are enough tournaments.
+
+    Returns:
+        timings (dict): Wall time in seconds of every stage, and in total.
+
+    """
+    timings = {}
+    start = stage_start = time.perf_counter()
+
+    def stage_done(stage):
+        nonlocal stage_start
+        timings[stage] = round(time.perf_counter() - stage_start, 3)
+        logging.info(f"{stage}: {timings[stage]:.2f}s")
+        stage_start = time.perf_counter()
+
+    # 1. Tournament metadata from the checkpoint, for the tournaments that are in the store
+    ckpt_df = load_checkpoint(checkpoint_csv)
+    stored = set(stored_tournaments(store_dir))
+    ckpt_df = ckpt_df[ckpt_df["url"].map(tournament_folder).isin(stored)]
+    missing = len(stored) - len(ckpt_df)
+    if missing > 0:
+        logging.warning(f"{missing} tournaments in the scraped data store are not in the checkpoint, skipping them")
+    stage_done("checkpoint")
+
+    # 2. Load the scraped tables in parallel
+    folders = [tournament_folder(url) for url in ckpt_df["url"]]
+    stored_dict = read_scraped(store_dir, tournaments=folders, workers=read_workers)
+    all_tournament_dict = {}
+    for folder, (_, row) in zip(folders, ckpt_df.iterrows()):
+        t_dict = stored_dict[folder]
+        t_dict["date"], t_dict["name"] = row["date"], row["name"]
+        all_tournament_dict[row["url"]] = t_dict
+    stage_done("load")
+
+    # 3. WLT counts for each deck in each tournament
+    all_tournament_results_dict = multi_tournament_wr_per_tournament(all_tournament_dict, workers=analysis_workers)
+    stage_done("count")
+
+    # 4. Win rates and plot_df
+    plot_df = create_plot_df(all_tournament_results_dict)
+    stage_done("plot_df")
+
+    # 5. Fresh results store, swapped in for the old one
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with ResultsStore(tmp_path) as store:
+        store.upsert(plot_df)
+        updated_plot_df = store.to_plot_df()
+    os.replace(tmp_path, db_path)
+    stage_done("store")
+
+    # 6. Export, as update_results does
+    os.makedirs(os.path.dirname(results_csv), exist_ok=True)
+    updated_plot_df.to_csv(results_csv, header=True, index=False)
+    write_snapshot(updated_plot_df, db_path)
+    stage_done("export")
+
+    timings["total"] = round(time.perf_counter() - start, 3)
+    logging.info(f"Rebuilt {len(updated_plot_df)} matchups from {len(all_tournament_dict)} tournaments "
+                 f"in {timings['total']:.2f}s: {timings}")
+
+    return timings
+
+
+# The analysis workers re-import this script when processes are spawned, so only rebuild when run directly
+if __name__ == "__main__":
+    rebuild_results(read_workers=read_workers, analysis_workers=analysis_workers)
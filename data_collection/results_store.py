@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import hashlib
+import logging
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+RESULTS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "latest", "results.db")
+
+# Columns of plot_df kept in the store; win rates are calculated when reading
+KEY_COLUMNS = ["t_url", "deck", "opposing_deck"]
+STAT_COLUMNS = ["date", "wins", "losses", "ties", "games_played"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matchup_stats (
+    t_url TEXT NOT NULL,
+    deck TEXT NOT NULL,
+    opposing_deck TEXT NOT NULL,
+    date TEXT,
+    wins REAL,
+    losses REAL,
+    ties REAL,
+    games_played REAL,
+    PRIMARY KEY (t_url, deck, opposing_deck)
+);
+CREATE INDEX IF NOT EXISTS matchup_stats_matchup_date ON matchup_stats (deck, opposing_deck, date);
+CREATE INDEX IF NOT EXISTS matchup_stats_date ON matchup_stats (date);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+PLOT_COLUMNS = "deck, opposing_deck, t_url, date, wins, losses, ties, games_played"
+
+# Column types of the binary snapshot: archetypes and URLs as categoricals, counts as float32 (whole numbers,
+# NaN where older results have no losses or ties), and win rates kept as float64 so they read back unchanged
+SNAPSHOT_DTYPES = {
+    "deck": "category",
+    "opposing_deck": "category",
+    "t_url": "category",
+    "wins": "float32",
+    "losses": "float32",
+    "ties": "float32",
+    "winrate": "float64",
+    "games_played": "float32",
+}
+DATE_FORMAT = "%Y-%m-%d"
+
+
+class ResultsStore:
+    """SQLite store of the wins, losses, ties and games played of every matchup at every tournament.
+
+    Rows are keyed by (t_url, deck, opposing_deck). Adding a tournament only touches that tournament's
+    rows, so new results are added without reading or deduplicating the rest of the history, and
+    adding a tournament that is already in the store replaces its rows instead of duplicating them.
+
+    Matchups are indexed on (deck, opposing_deck, date) and on date, so the date range of a set and
+    the matchups of a deck within it are index seeks. The Dash app opens the store read only.
+    """
+
+    def __init__(self, db_path=RESULTS_DB, read_only=False):
+        self.db_path = db_path
+
+        if read_only:
+            # Read-only connections can be shared by the app's threads
+            self.connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self.connection = sqlite3.connect(db_path)
+            self.connection.executescript(SCHEMA)
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def version(self):
+        """Return the version of the stored data, which changes whenever an upsert changes the matchups."""
+        return _read_version(self.connection, self.db_path)
+
+    def is_empty(self):
+        return self.connection.execute("SELECT 1 FROM matchup_stats LIMIT 1").fetchone() is None
+
+    def tournaments(self):
+        """Return the URL of every tournament in the store."""
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT t_url FROM matchup_stats")]
+
+    def _tournament_rows(self, t_urls):
+        """Return the stored rows of the tournaments in t_urls, in key order."""
+        rows = []
+        for t_url in t_urls:
+            rows += self.connection.execute(
+                f"SELECT {', '.join(KEY_COLUMNS + STAT_COLUMNS)} FROM matchup_stats WHERE t_url = ? "
+                f"ORDER BY deck, opposing_deck", (t_url,)
+            ).fetchall()
+
+        return rows
+
+    def upsert(self, plot_df):
+        """Add the matchups of the tournaments in plot_df, replacing anything already stored for those tournaments.
+
+        If that changes the stored matchups, the store's version becomes a hash of the previous version and
+        the tournaments' new rows, so the same results written in the same order always give the same
+        version. Writing matchups that are already stored leaves the version as it was.
+
+        Arguments:
+            plot_df (DataFrame): DataFrame as returned by create_plot_df. Columns missing from older results
+                                 (e.g. losses and ties) are stored as NULL.
+
+        Returns:
+            row_count (int): Number of matchups written.
+
+        """
+        rows = plot_df.reindex(columns=KEY_COLUMNS + STAT_COLUMNS)
+        rows = rows.astype(object).where(rows.notna(), None)
+        t_urls = rows["t_url"].unique().tolist()
+
+        # One transaction, so a tournament is either fully replaced or left untouched, along with the version
+        with self.connection:
+            old_rows = self._tournament_rows(t_urls)
+            self.connection.executemany("DELETE FROM matchup_stats WHERE t_url = ?", [(t_url,) for t_url in t_urls])
+            self.connection.executemany(
+                f"INSERT INTO matchup_stats ({', '.join(KEY_COLUMNS + STAT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(KEY_COLUMNS + STAT_COLUMNS))}) "
+                f"ON CONFLICT ({', '.join(KEY_COLUMNS)}) DO UPDATE SET "
+                + ", ".join(f"{col} = excluded.{col}" for col in STAT_COLUMNS),
+                rows.itertuples(index=False, name=None)
+            )
+
+            # The rows as SQLite stores them, so the version doesn't depend on the dtypes of plot_df
+            new_rows = self._tournament_rows(t_urls)
+            if new_rows != old_rows:
+                row = self.connection.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()
+                sha = hashlib.sha256(row[0].encode("utf-8") if row is not None else b"")
+                sha.update(repr(new_rows).encode("utf-8"))
+                self.connection.execute(
+                    "INSERT INTO store_meta (key, value) VALUES ('version', ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                    (sha.hexdigest(),)
+                )
+
+        logging.info(f"Stored {len(rows)} matchups from {len(t_urls)} tournaments")
+
+        return len(rows)
+
+    def _read_plot_df(self, where="", params=()):
+        """Run a SELECT on matchup_stats and add win rates, keeping the order the rows were stored in."""
+        plot_df = pd.read_sql_query(f"SELECT {PLOT_COLUMNS} FROM matchup_stats {where} ORDER BY rowid",
+                                    self.connection, params=params)
+        # Same rounding as create_plot_df
+        winrate = [round(wr, 2) for wr in (plot_df["wins"] / plot_df["games_played"]).tolist()]
+        plot_df.insert(plot_df.columns.get_loc("games_played"), "winrate", winrate)
+
+        return plot_df
+
+    def to_plot_df(self):
+        """Read every stored matchup back as plot_df, with win rates, in the order they were stored."""
+        return self._read_plot_df()
+
+    def query(self, start_date=None, end_date=None, decks=None, opposing_decks=None):
+        """Read the matchups played within a date range, optionally only for some decks and opposing decks.
+
+        Arguments:
+            start_date (str): Only return tournaments on or after this date.
+            end_date (str): Only return tournaments on or before this date.
+            decks (list): Only return these active decks.
+            opposing_decks (list): Only return matchups against these decks.
+
+        Returns:
+            plot_df (DataFrame): The matching rows of plot_df, with win rates.
+
+        """
+        where, params = _where(start_date, end_date, decks, opposing_decks)
+
+        return self._read_plot_df(where, params)
+
+    def decks(self, column="deck"):
+        """Return every distinct deck (or opposing_deck), sorted."""
+        if column not in ("deck", "opposing_deck"):
+            raise ValueError(f"Unknown deck column: {column}")
+
+        return [row[0] for row in self.connection.execute(f"SELECT DISTINCT {column} FROM matchup_stats ORDER BY {column}")]
+
+    def games_per_deck(self, start_date=None, end_date=None):
+        """Return the games played by every active deck within a date range, sorted by deck.
+
+        Arguments:
+            start_date (str): Only count tournaments on or after this date.
+            end_date (str): Only count tournaments on or before this date.
+
+        Returns:
+            gp_df (DataFrame): One row per deck with its total games played.
+
+        """
+        where, params = _where(start_date, end_date)
+
+        return pd.read_sql_query(
+            f"SELECT deck, SUM(games_played) AS games_played FROM matchup_stats {where} GROUP BY deck ORDER BY deck",
+            self.connection, params=params
+        )
+
+    def matchup_totals(self, start_date=None, end_date=None):
+        """Sum the wins, losses, ties and games played of every matchup across tournaments.
+
+        Arguments:
+            start_date (str): Only count tournaments on or after this date.
+            end_date (str): Only count tournaments on or before this date.
+
+        Returns:
+            totals (DataFrame): One row per (deck, opposing_deck) with the summed counts.
+
+        """
+        where, params = _where(start_date, end_date)
+
+        return pd.read_sql_query(
+            f"SELECT deck, opposing_deck, SUM(wins) AS wins, SUM(losses) AS losses, SUM(ties) AS ties, "
+            f"SUM(games_played) AS games_played FROM matchup_stats {where} GROUP BY deck, opposing_deck",
+            self.connection, params=params
+        )
+
+
+class ResultsSnapshot:
+    """Read-only copy of the results store in a Feather file, which the Dash app loads instead of querying the store.
+
+    The pipeline writes it next to the store with write_snapshot. Archetypes and URLs are categoricals, dates
+    are datetime64 and counts are float32, so it loads without parsing any text. It answers the same queries
+    as ResultsStore with the same DataFrames, so the app builds the same set index from either.
+
+    Arguments:
+        path (str): Path to the snapshot.
+    """
+
+    def __init__(self, path):
+        # Only needed when there is a snapshot to read
+        import pyarrow.feather as feather
+
+        self.path = path
+        table = feather.read_table(path, memory_map=True)
+        self.store_version = table.schema.metadata[b"store_version"].decode("utf-8")
+        self.plot_df = table.to_pandas()
+
+        # The store's date strings, one string object per distinct date
+        codes, dates = pd.factorize(self.plot_df["date"])
+        self.date_text = dates.strftime(DATE_FORMAT).to_numpy(dtype=object)[codes]
+
+    def close(self):
+        self.plot_df = None
+        self.date_text = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def version(self):
+        """Return the version of the results store the snapshot was written from."""
+        return self.store_version
+
+    def _mask(self, start_date=None, end_date=None, decks=None, opposing_decks=None):
+        mask = np.ones(len(self.plot_df), dtype=bool)
+        if start_date is not None:
+            mask &= (self.plot_df["date"] >= pd.Timestamp(start_date)).to_numpy()
+        if end_date is not None:
+            mask &= (self.plot_df["date"] <= pd.Timestamp(end_date)).to_numpy()
+        for column, values in (("deck", decks), ("opposing_deck", opposing_decks)):
+            if values is not None:
+                mask &= self.plot_df[column].isin(list(values)).to_numpy()
+
+        return mask
+
+    def query(self, start_date=None, end_date=None, decks=None, opposing_decks=None):
+        """Read the matchups played within a date range, as ResultsStore.query does."""
+        mask = self._mask(start_date, end_date, decks, opposing_decks)
+        plot_df = self.plot_df[mask].astype({col: ("object" if dtype == "category" else "float64")
+                                             for col, dtype in SNAPSHOT_DTYPES.items()})
+        plot_df["date"] = self.date_text[mask]
+
+        return plot_df.reset_index(drop=True)
+
+    def decks(self, column="deck"):
+        """Return every distinct deck (or opposing_deck), sorted."""
+        if column not in ("deck", "opposing_deck"):
+            raise ValueError(f"Unknown deck column: {column}")
+
+        return sorted(self.plot_df[column].unique().tolist())
+
+    def games_per_deck(self, start_date=None, end_date=None):
+        """Return the games played by every active deck within a date range, sorted by deck, as ResultsStore does."""
+        mask = self._mask(start_date, end_date)
+        games_played = self.plot_df["games_played"][mask].astype("float64")
+        gp = games_played.groupby(self.plot_df["deck"][mask], observed=True).sum()
+        # Categories are in the order they were first stored, the store sorts by name
+        gp.index = gp.index.astype(object)
+
+        return gp.sort_index().rename_axis("deck").reset_index()
+
+
+def snapshot_path(db_path):
+    """Return the path of the binary snapshot written next to the results store at db_path."""
+    return f"{os.path.splitext(db_path)[0]}.feather"
+
+
+def write_snapshot(plot_df, db_path):
+    """Write plot_df, as read back from the results store at db_path, to the store's binary snapshot.
+
+    The snapshot records the version saved in the store, so readers can tell whether it is up to date,
+    wherever the two files were copied to.
+    Call it once the store is written; the file is replaced in one step.
+
+    Arguments:
+        plot_df (DataFrame): Every matchup in the store, as returned by ResultsStore.to_plot_df.
+        db_path (str): Path to the SQLite results store.
+
+    Returns:
+        path (str): Path of the snapshot.
+
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    snapshot_df = plot_df.astype(SNAPSHOT_DTYPES)
+    snapshot_df["date"] = pd.to_datetime(plot_df["date"], format=DATE_FORMAT)
+    table = pa.Table.from_pandas(snapshot_df, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, b"store_version": store_version(db_path).encode("utf-8")})
+
+    path = snapshot_path(db_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Uncompressed, so loading it is a plain read
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    logging.info(f"Wrote results snapshot of {len(snapshot_df)} matchups to {path}")
+
+    return path
+
+
+def open_results(db_path=RESULTS_DB):
+    """Open the results for reading: the binary snapshot if it is up to date with the store, otherwise the store."""
+    path = snapshot_path(db_path)
+    if os.path.exists(path):
+        snapshot = ResultsSnapshot(path)
+        try:
+            if snapshot.version() == store_version(db_path):
+                return snapshot
+        except FileNotFoundError:
+            # Deployed without the store
+            return snapshot
+        logging.warning(f"{path} is older than {db_path}, reading the results store instead")
+        snapshot.close()
+
+    return ResultsStore(db_path, read_only=True)
+
+
+def store_version(db_path):
+    """Return the version of the results store at db_path.
+
+    The version is saved in the store by every upsert that changes the matchups, so it survives copying
+    the store to another machine, where modified times aren't kept.
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(db_path)
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return _read_version(connection, db_path)
+    finally:
+        connection.close()
+
+
+def _read_version(connection, db_path):
+    try:
+        row = connection.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()
+    except sqlite3.OperationalError:
+        # Written before the store kept a version
+        row = None
+    if row is not None:
+        return row[0]
+
+    # No version saved yet, so fall back to the content of the file
+    sha = hashlib.sha256()
+    with open(db_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+
+def _where(start_date=None, end_date=None, decks=None, opposing_decks=None):
+    """Build the WHERE clause and parameters for a date range and lists of decks."""
+    conditions = []
+    params = []
+    if start_date is not None:
+        conditions.append("date >= ?")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("date <= ?")
+        params.append(end_date)
+    for column, values in (("deck", decks), ("opposing_deck", opposing_decks)):
+        if values is not None:
+            values = list(values)
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    return where, params
@@ -10,7 +10,7 @@ cd C:/Users/andre/Desktop/limitless_scrape/data_collection
 # Scrape data 
 python scrape_and_process.py
 
-# push to heroku
+# push to heroku; the files in results/latest are git-ignored, Heroku builds them from the snapshot log (bin/post_compile)
 git add . 
 git commit -m "scrape and deploy"
 git push heroku main 
@@ -15,6 +15,10 @@ import datetime
 
 from limitless_scrape import *
 from limitless_analysis import *
+from scrape_journal import ScrapeJournal
+from scrape_pipeline import pipelined_latenight_scrape
+from async_scrape import concurrent_latenight_scrape
+from scraped_store import write_scraped
 
 import logging
 logger = logging.getLogger()
@@ -34,78 +38,113 @@ logger.setLevel(logging.INFO)
 # Use checkpoint or scrape everything?
 use_checkpoint = True
 
-# %%
-# 1. Create DataFrame that contans dates and URLS for each tournament
-df_latenight = scrape_for_dates_and_url()
-
-# 2. Use checkpoint. If not using checkpoint, scrape everything
-if use_checkpoint == True:
-    logging.info("Using checkpoint. Loading in checkpoint...")
-    ckpt_df = pd.read_csv("checkpoint/latest/checkpoint.csv")
-    current_results_df = pd.read_csv("results/latest/scrape_results.csv")
-    ignore_df = pd.read_csv("checkpoint/latest/ignore_list.csv")
-
-    # 3. and 4. Instead of filtering the DataFrame, we can use list comprehension to find net new urls. 
-    ckpt_url_ls = ckpt_df['url'].unique().tolist()
-    all_url_ls = df_latenight['URL'].unique().tolist()
-    ignore_ls = ignore_df['url'].unique().tolist()
-    combined_ignore_ls = ckpt_url_ls + ignore_ls 
-    net_new_url_ls = [url for url in all_url_ls if url not in combined_ignore_ls] 
-    
-    # 5. Create url dict; Only use first 2 urls as a test
-    url_dict = create_urls(net_new_url_ls)
-
-    logging.info('Scraping tournaments...')                   
-    # # 6. Scrape urls in dict and add date
-    scrape_results_dict = multi_latenight_scrape(url_dict)
-    scrape_results_dict = add_date_to_dict(scrape_results_dict, df_latenight)
-
-    # 6a. Save results to csv
-    logging.info("Saving scraped results...")
-    scrape_results_to_csv(scrape_results_dict)
-    
-    # 7. Process data: Get WLT counts for each deck in each tournament
-    all_tournament_results_dict = multi_tournament_wr_per_tournament(scrape_results_dict)
-
-    logging.info('Calculating win rates...')
-    # Calculate winrates
-    multi_tournament_wr_calc(all_tournament_results_dict)
-    
-    # Create plot_df
-    plot_df = create_plot_df(all_tournament_results_dict)
-    
-    # 8. Append plot_df to current results, and update checkpoint
-    update_results(current_results_df, plot_df)
-    update_checkpoint(all_tournament_results_dict, ckpt_df)
-                           
-else: 
-    logging.info("Checkpoint not in use. Scraping all data...")
-    # Scrape everything
-    url_list = df_latenight['URL'].unique().tolist()
-    url_dict = create_urls(url_list)
-
-    scrape_results_dict = multi_latenight_scrape(url_dict)
-    scrape_results_dict = add_date_to_dict(scrape_results_dict, df_latenight)
-
-    # Save results to csv
-    logging.info("Saving scraped results...")
-    scrape_results_to_csv(scrape_results_dict)
-    
-    # Process data: Get WLT counts for each deck in each tournament
-    all_tournament_results_dict = multi_tournament_wr_per_tournament(scrape_results_dict)
-
-    # Calculate winrates
-    logging.info('Calculating win rates...')
-    multi_tournament_wr_calc(all_tournament_results_dict)
-    
-    # Create plot_df
-    plot_df = create_plot_df(all_tournament_results_dict)
-
-    # Create blank current results and append net new results (plot_df)
-    headers = ["deck", "opposing_deck", "t_url", "date", "wins", "winrate", "games_played"]
-    current_results_df = pd.DataFrame(columns=headers)
-    update_results(current_results_df, plot_df)
-
-    # Create and save checkpoint 
-    ckpt_df = pd.DataFrame(columns=["date", "name", "url"])
-    update_checkpoint(all_tournament_results_dict, ckpt_df)
\ No newline at end of file
+# Scrape engine: "pipeline" downloads pages in threads and parses them in worker processes, committing them to
+# the scrape journal; "async" downloads and parses every page in this process with asyncio, without the journal
+scrape_engine = "pipeline"
+
+# Maximum number of requests in flight to play.limitlesstcg.com, with either engine
+max_requests_per_host = 8
+
+# Number of threads downloading pages from play.limitlesstcg.com
+fetch_workers = 8
+
+# Number of processes parsing pages; None uses every core
+parse_workers = None
+
+# Most processes counting WLT per tournament; 1 counts them in this process, which is fastest for a day's
+# tournaments, None allows one process per core when there are many tournaments (see pool_workers)
+analysis_workers = 1
+
+# Commit every parsed page to the scrape journal, so a run that dies part way resumes where it stopped
+use_journal = True
+
+
+def scrape(url_dict, journal=None):
+    """Scrape the Standings and Pairings of every tournament in url_dict with the chosen scrape engine."""
+    if scrape_engine == "async":
+        return concurrent_latenight_scrape(url_dict, max_per_host=max_requests_per_host)
+
+    return pipelined_latenight_scrape(url_dict, fetch_workers=fetch_workers, parse_workers=parse_workers,
+                                      journal=journal, max_per_host=max_requests_per_host)
+
+
+# The parse workers re-import this script when processes are spawned, so only scrape when run directly
+if __name__ == "__main__":
+    # %%
+    # 1. Create DataFrame that contans dates and URLS for each tournament
+    df_latenight = scrape_for_dates_and_url()
+    # Only the pipeline commits pages to the journal
+    journal = ScrapeJournal() if use_journal and scrape_engine == "pipeline" else None
+
+    # 2. Use checkpoint. If not using checkpoint, scrape everything
+    if use_checkpoint == True:
+        logging.info("Using checkpoint. Loading in checkpoint...")
+        ckpt_df = pd.read_csv("checkpoint/latest/checkpoint.csv")
+        ignore_df = pd.read_csv("checkpoint/latest/ignore_list.csv")
+
+        # 3. and 4. Instead of filtering the DataFrame, we can use list comprehension to find net new urls. 
+        ckpt_url_ls = ckpt_df['url'].unique().tolist()
+        all_url_ls = df_latenight['URL'].unique().tolist()
+        ignore_ls = ignore_df['url'].unique().tolist()
+        combined_ignore_ls = ckpt_url_ls + ignore_ls 
+        net_new_url_ls = [url for url in all_url_ls if url not in combined_ignore_ls] 
+
+        # 5. Create url dict; Only use first 2 urls as a test
+        url_dict = create_urls(net_new_url_ls)
+
+        logging.info('Scraping tournaments...')                   
+        # # 6. Scrape urls in dict and add date
+        scrape_results_dict = scrape(url_dict, journal)
+        scrape_results_dict = add_date_to_dict(scrape_results_dict, df_latenight)
+
+        logging.info(f"HTTP client stats: {get_client().stats()}")
+
+        # 6a. Save scraped tables to the store
+        logging.info("Saving scraped results...")
+        write_scraped(scrape_results_dict)
+
+        # 7. Process data: Get WLT counts for each deck in each tournament
+        all_tournament_results_dict = multi_tournament_wr_per_tournament(scrape_results_dict, workers=analysis_workers)
+
+        # Calculate win rates and create plot_df
+        logging.info('Calculating win rates...')
+        plot_df = create_plot_df(all_tournament_results_dict)
+
+        # 8. Upsert plot_df into the results store, and update checkpoint
+        update_results(plot_df)
+        checkpointed = update_checkpoint(all_tournament_results_dict, ckpt_df, journal=journal)
+
+        # Checkpointed tournaments are saved for good, so their journal is no longer needed
+        if journal is not None:
+            journal.discard(checkpointed)
+
+    else: 
+        logging.info("Checkpoint not in use. Scraping all data...")
+        # Scrape everything
+        url_list = df_latenight['URL'].unique().tolist()
+        url_dict = create_urls(url_list)
+
+        scrape_results_dict = scrape(url_dict, journal)
+        scrape_results_dict = add_date_to_dict(scrape_results_dict, df_latenight)
+
+        logging.info(f"HTTP client stats: {get_client().stats()}")
+
+        # Save scraped tables to the store
+        logging.info("Saving scraped results...")
+        write_scraped(scrape_results_dict)
+
+        # Process data: Get WLT counts for each deck in each tournament
+        all_tournament_results_dict = multi_tournament_wr_per_tournament(scrape_results_dict, workers=analysis_workers)
+
+        # Calculate win rates and create plot_df
+        logging.info('Calculating win rates...')
+        plot_df = create_plot_df(all_tournament_results_dict)
+
+        # Upsert net new results (plot_df) into the results store
+        update_results(plot_df)
+
+        # Create and save checkpoint 
+        ckpt_df = pd.DataFrame(columns=["date", "name", "url"])
+        checkpointed = update_checkpoint(all_tournament_results_dict, ckpt_df, journal=journal)
+        if journal is not None:
+            journal.discard(checkpointed)
\ No newline at end of file
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import json
+import logging
+import os
+import shutil
+
+import pyarrow.parquet as pq
+
+from scraped_store import tournament_folder, write_table
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+SCRAPE_JOURNAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape_journal")
+
+
+def _write_json(obj, path):
+    """Write obj to a JSON file, replacing any previous version atomically."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+class ScrapeJournal:
+    """Write-ahead journal of a scrape, one folder per tournament.
+
+    The Standings table and every round of Pairings are committed as soon as they are parsed, each in
+    its own file that is written to a temporary file first and then renamed, so a table is either fully
+    on disk or not at all. Pages without a table are committed as a marker. Once every page of a
+    tournament is committed, a complete marker is written. If the scrape dies, the next one loads what
+    was committed and only downloads the pages that are missing.
+
+    Layout of a tournament's folder (named like tournament_ln41):
+        meta.json          URL of the tournament and, once round 1 is parsed, its round count
+        players.parquet    Standings table
+        round_<i>.parquet  Pairings of round i; round_<i>.none if the page had no table
+        complete.json      Written last, once every page is committed
+    """
+
+    def __init__(self, journal_dir=SCRAPE_JOURNAL):
+        self.journal_dir = journal_dir
+
+    def _folder(self, t):
+        return os.path.join(self.journal_dir, tournament_folder(t))
+
+    def _commit_table(self, t, table_name, df):
+        folder = self._folder(t)
+        os.makedirs(folder, exist_ok=True)
+
+        if df is None or (table_name != "players" and df.empty):
+            _write_json(None, os.path.join(folder, f"{table_name}.none"))
+        else:
+            write_table(df, os.path.join(folder, f"{table_name}.parquet"))
+
+    def commit_players(self, t, df):
+        """Commit the Standings table of tournament t."""
+        self._commit_table(t, "players", df)
+
+    def commit_round(self, t, round_i, df, round_count=None):
+        """Commit a round of Pairings of tournament t, with the round count read from round 1 if known."""
+        os.makedirs(self._folder(t), exist_ok=True)
+        if round_i == 1:
+            # Saved before the round, so a committed round 1 always has its round count next to it
+            _write_json({"url": t, "round_count": round_count}, os.path.join(self._folder(t), "meta.json"))
+
+        self._commit_table(t, f"round_{round_i}", df)
+
+    def mark_complete(self, t):
+        """Record that every page of tournament t is committed."""
+        os.makedirs(self._folder(t), exist_ok=True)
+        _write_json({"url": t}, os.path.join(self._folder(t), "complete.json"))
+
+    def is_complete(self, t):
+        return os.path.exists(os.path.join(self._folder(t), "complete.json"))
+
+    def load(self, t):
+        """Load what was committed for tournament t.
+
+        Returns:
+            state (dict): "players" DataFrame (None if the page had no table), "has_players" (whether the
+                          Standings are committed), "rounds" dictionary of round number to DataFrame,
+                          "empty_rounds" set of rounds without a table, "round_count" read from round 1
+                          (None if unknown) and "complete".
+
+        """
+        state = {"players": None, "has_players": False, "rounds": {}, "empty_rounds": set(), "round_count": None,
+                 "complete": self.is_complete(t)}
+        folder = self._folder(t)
+        if not os.path.isdir(folder):
+            return state
+
+        for filename in os.listdir(folder):
+            table_name, ext = os.path.splitext(filename)
+            if filename == "meta.json":
+                with open(os.path.join(folder, filename)) as f:
+                    state["round_count"] = json.load(f)["round_count"]
+            elif table_name == "players" and ext in (".parquet", ".none"):
+                state["has_players"] = True
+                if ext == ".parquet":
+                    state["players"] = pq.read_table(os.path.join(folder, filename)).to_pandas()
+            elif table_name.startswith("round_") and ext == ".parquet":
+                state["rounds"][int(table_name.split("_")[1])] = pq.read_table(os.path.join(folder, filename)).to_pandas()
+            elif table_name.startswith("round_") and ext == ".none":
+                state["empty_rounds"].add(int(table_name.split("_")[1]))
+
+        return state
+
+    def discard(self, tournaments):
+        """Delete the journal of tournaments that have been saved for good, e.g. once the checkpoint has them."""
+        for t in tournaments:
+            shutil.rmtree(self._folder(t), ignore_errors=True)
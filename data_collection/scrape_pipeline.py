@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from urllib.parse import urlparse
+
+from limitless_scrape import fetch_page, find_round_count, parse_pairings_table, parse_players_table, trim_round_urls
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Number of threads downloading pages
+FETCH_WORKERS = 8
+
+# Maximum number of requests in flight to a single host, however many threads are downloading
+MAX_REQUESTS_PER_HOST = 8
+
+# Maximum number of downloaded pages waiting to be parsed; fetchers block when the queue is full
+QUEUE_SIZE = 32
+
+# Seconds to wait on the page queue or the parse futures before checking the other one
+POLL_INTERVAL = 0.05
+
+
+def parse_page(kind, page):
+    """Parse a downloaded page in a worker process and time it.
+
+    Arguments:
+        kind (str): "players" for a Standings page, "round" for a Pairings page.
+        page (str): HTML of the page.
+
+    Returns:
+        result (tuple): DataFrame of the page (or None if it has no table), the round count read from
+                        the round navigation (Pairings pages only), and the seconds spent parsing.
+
+    """
+    start = time.perf_counter()
+
+    if kind == "players":
+        result = (parse_players_table(page), None)
+    else:
+        result = (parse_pairings_table(page), find_round_count(page))
+
+    return result + (time.perf_counter() - start,)
+
+
+class PipelineStats:
+    """Count items and busy time for the fetch and parse stages, and the deepest the page queue got."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.stages = {"fetch": {"items": 0, "busy": 0.0}, "parse": {"items": 0, "busy": 0.0}}
+        self.max_queue_depth = 0
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.stages[stage]["items"] += 1
+            self.stages[stage]["busy"] += seconds
+
+    def queue_depth(self, depth):
+        with self.lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def report(self):
+        """Return items, busy seconds and items per second of wall time for each stage."""
+        wall = time.perf_counter() - self.start
+        report = {"wall": round(wall, 2), "max_queue_depth": self.max_queue_depth}
+        with self.lock:
+            for stage, counts in self.stages.items():
+                report[stage] = {
+                    "items": counts["items"],
+                    "busy": round(counts["busy"], 2),
+                    "per_second": round(counts["items"] / wall, 2) if wall > 0 else None,
+                }
+
+        return report
+
+
+class HostLimiter:
+    """Hand out one semaphore per host so that no host gets more than `limit` concurrent requests."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.semaphores = {}
+
+    def get(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.limit)
+
+            return self.semaphores[host]
+
+
+def fetch_worker(jobs, pages, stats, limiter, stop, errors):
+    """Download pages for jobs until a None job arrives or stop is set; put (job, page) on the bounded page queue.
+
+    A page that can't be downloaded ends the scrape: its error is added to errors and stop is set, so
+    every fetcher drops the jobs still queued instead of downloading them.
+    """
+    while True:
+        job = jobs.get()
+        if job is None or stop.is_set():
+            break
+
+        start = time.perf_counter()
+        try:
+            with limiter.get(job[-1]):
+                page = fetch_page(job[-1])
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+            break
+        stats.add("fetch", time.perf_counter() - start)
+
+        # Blocks while the parsers are behind, which caps the number of pages held in memory,
+        # until the parsers stop taking pages
+        while not stop.is_set():
+            try:
+                pages.put((job, page), timeout=POLL_INTERVAL)
+            except queue.Full:
+                continue
+            stats.queue_depth(pages.qsize())
+            break
+
+
+def handle_page(t, kind, round_i, df, round_count, round_urls, results, submit, journal=None):
+    """Save a parsed page, commit it to the journal, and queue the rounds it tells us about."""
+    if kind == "players":
+        results[t]["players"] = df
+        if journal is not None:
+            journal.commit_players(t, df)
+        return
+
+    if journal is not None:
+        journal.commit_round(t, round_i, df, round_count)
+
+    # A missing or empty table means the tournament has no more rounds
+    if df is None or df.empty:
+        return
+    results[t]["rounds"][round_i] = df
+
+    if round_i == 1 and round_count is not None:
+        # Round count is known, queue all remaining rounds
+        for next_i, next_url in enumerate(trim_round_urls(round_urls, round_count)[1:], start=2):
+            submit(t, "round", next_i, next_url)
+    elif round_count is None and round_i < len(round_urls):
+        # Round count is unknown, probe the next round
+        submit(t, "round", round_i + 1, round_urls[round_i])
+
+
+def pending_pages(t_urls, state):
+    """List the pages of a tournament that still have to be downloaded, given what the journal has committed.
+
+    Arguments:
+        t_urls (dict): Standings and Pairings URLs of the tournament, as in url_dict.
+        state (dict): What was committed for the tournament, as returned by ScrapeJournal.load.
+
+    Returns:
+        jobs (list): (kind, round, url) of every page to download.
+
+    """
+    jobs = []
+    if not state["has_players"]:
+        jobs.append(("players", None, t_urls["standings"]))
+
+    round_urls = t_urls["rounds"]
+    done = set(state["rounds"]) | state["empty_rounds"]
+    if 1 not in done:
+        jobs.append(("round", 1, round_urls[0]))
+    elif state["round_count"] is not None:
+        # Round count is known, every remaining round was queued after round 1
+        for round_i, round_url in enumerate(trim_round_urls(round_urls, state["round_count"])[1:], start=2):
+            if round_i not in done:
+                jobs.append(("round", round_i, round_url))
+    else:
+        # Round count is unknown, carry on probing after the last round with a table
+        round_i = 1
+        while round_i in state["rounds"]:
+            round_i += 1
+        if round_i not in state["empty_rounds"] and round_i <= len(round_urls):
+            jobs.append(("round", round_i, round_urls[round_i - 1]))
+
+    return jobs
+
+
+def pipelined_latenight_scrape(url_dict, fetch_workers=FETCH_WORKERS, parse_workers=None, queue_size=QUEUE_SIZE, stats=None,
+                               journal=None, max_per_host=MAX_REQUESTS_PER_HOST):
+    """Scrape Standings and Pairings tabs for multiple tournaments with separate fetch and parse stages.
+
+    Threads download pages and feed them into a bounded queue; a process pool parses them on every core.
+    No more than max_per_host of the threads download from the same host at once.
+    As in scrape_limitless_latenight, round 1 of each tournament tells us how many rounds to download.
+    At most queue_size pages wait in the queue and at most as many again are being parsed, so memory
+    stays bounded however many tournaments are scraped.
+
+    With a journal, every parsed table is committed as soon as it is parsed and tournaments are marked
+    complete once all their pages are in. A scrape that died part way is resumed: complete tournaments are
+    loaded from the journal and only the pages that were never committed are downloaded.
+
+    Arguments:
+        url_dict (dict): Dictionary that contains URLs for the Standings and Pairings pages of the tournament(s).
+        fetch_workers (int): Number of threads downloading pages.
+        parse_workers (int): Number of processes parsing pages. Defaults to the number of CPUs.
+        queue_size (int): Maximum number of downloaded pages waiting to be parsed.
+        stats (dict): Optional dictionary that is filled with the throughput of each stage.
+        journal (ScrapeJournal): Optional journal to commit parsed tables to and resume from.
+        max_per_host (int): Maximum number of concurrent requests sent to a single host.
+
+    Returns:
+        all_tournament_dict (dict): Dictionary that has DataFrames for the Standings and Pairings tables for each
+                                    tournament present in the url_dict.
+
+    """
+    pipeline_stats = PipelineStats()
+    jobs = queue.Queue()
+    pages = queue.Queue(maxsize=queue_size)
+
+    results = {t: {"players": None, "rounds": {}} for t in url_dict}
+    outstanding = 0
+    # Pages of each tournament that are queued or being parsed
+    remaining = {t: 0 for t in url_dict}
+
+    def submit(t, kind, round_i, url):
+        nonlocal outstanding
+        jobs.put((t, kind, round_i, url))
+        outstanding += 1
+        remaining[t] += 1
+
+    # Standings and round 1 first (or whatever the journal is missing); the other rounds are queued once round 1 is parsed
+    resumed = 0
+    for t, t_urls in url_dict.items():
+        state = journal.load(t) if journal is not None else None
+        if state is None:
+            submit(t, "players", None, t_urls["standings"])
+            submit(t, "round", 1, t_urls["rounds"][0])
+            continue
+
+        results[t] = {"players": state["players"], "rounds": state["rounds"]}
+        if state["has_players"] or state["rounds"] or state["empty_rounds"]:
+            resumed += 1
+        if state["complete"]:
+            continue
+        for kind, round_i, url in pending_pages(t_urls, state):
+            submit(t, kind, round_i, url)
+        if remaining[t] == 0:
+            # Died after the last page was committed but before the tournament was marked
+            journal.mark_complete(t)
+
+    if resumed:
+        logging.info(f"Resuming {resumed} tournaments from the scrape journal, {outstanding} pages left to download")
+
+    limiter = HostLimiter(max_per_host)
+    stop = threading.Event()
+    errors = []
+    fetchers = [threading.Thread(target=fetch_worker, args=(jobs, pages, pipeline_stats, limiter, stop, errors),
+                                 daemon=True)
+                for _ in range(fetch_workers)]
+    for fetcher in fetchers:
+        fetcher.start()
+
+    parse_workers = parse_workers or os.cpu_count() or 1
+    pending = {}
+
+    try:
+        with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+            while outstanding > 0 and not errors:
+                # Hand downloaded pages to the process pool while it has room
+                while len(pending) < queue_size:
+                    try:
+                        job, page = pages.get(timeout=POLL_INTERVAL) if not pending else pages.get_nowait()
+                    except queue.Empty:
+                        break
+                    pending[pool.submit(parse_page, job[1], page)] = job
+
+                if not pending:
+                    continue
+
+                done, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    t, kind, round_i, url = pending.pop(future)
+                    df, round_count, seconds = future.result()
+                    pipeline_stats.add("parse", seconds)
+                    handle_page(t, kind, round_i, df, round_count, url_dict[t]["rounds"], results, submit, journal)
+
+                    # Follow-up rounds are queued by now, so no remaining pages means the tournament is done
+                    outstanding -= 1
+                    remaining[t] -= 1
+                    if remaining[t] == 0 and journal is not None:
+                        journal.mark_complete(t)
+
+            if errors:
+                # Commit the pages that were already downloaded without queueing more, then give up with
+                # the error that stopped the scrape
+                while True:
+                    try:
+                        job, page = pages.get_nowait()
+                    except queue.Empty:
+                        break
+                    pending[pool.submit(parse_page, job[1], page)] = job
+                for future in as_completed(pending):
+                    t, kind, round_i, url = pending[future]
+                    try:
+                        df, round_count, _ = future.result()
+                        handle_page(t, kind, round_i, df, round_count, url_dict[t]["rounds"], results,
+                                    lambda *job: None, journal)
+                    except Exception as e:
+                        logging.warning(f"Dropping {url} after the scrape failed: {e!r}")
+                raise errors[0]
+    finally:
+        stop.set()
+        for _ in fetchers:
+            jobs.put(None)
+
+    report = pipeline_stats.report()
+    logging.info(f"Pipeline stats: {report}")
+    if stats is not None:
+        stats.update(report)
+
+    # Same shape as multi_latenight_scrape, in the order of url_dict
+    all_tournament_dict = {}
+    for t in url_dict:
+        all_round_dict = {}
+        rounds = results[t]["rounds"]
+        round_i = 1
+        while round_i in rounds:
+            all_round_dict[f"round_{round_i}_dict"] = {"df": rounds[round_i]}
+            round_i += 1
+        all_tournament_dict[f"{t}"] = {"players": results[t]["players"], "pairings": all_round_dict}
+
+    return all_tournament_dict
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+SCRAPED_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraped_store")
+
+# Old layout: one folder per tournament with players.csv and round_1.csv ... round_14.csv
+SCRAPED_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraped_data")
+
+# Columns with few distinct values, stored as a dictionary of values plus integer codes
+DICTIONARY_COLUMNS = ["Name", "Deck", "Country", "Player ID", "Player 1 Name", "Player 2 Name",
+                      "Player 1 ID", "Player 2 ID", "Winner ID", "Player 1 Record", "Player 2 Record"]
+
+# Number of threads reading tournament files
+READ_WORKERS = 8
+
+
+def tournament_folder(key):
+    """Name a tournament from its URL the way the scraped_data folders were named, e.g. tournament_ln41."""
+    strings = key.split('/')
+
+    return '_'.join(strings[-3:-1]) if len(strings) > 2 else key
+
+
+def _partition_path(store_dir, dataset, tournament):
+    return os.path.join(store_dir, dataset, f"tournament={tournament}", "part-0.parquet")
+
+
+def write_table(df, path):
+    """Write a DataFrame of strings to a parquet file, replacing any previous version atomically."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path, use_dictionary=[col for col in DICTIONARY_COLUMNS if col in df])
+    os.replace(tmp_path, path)
+
+
+def write_tournament(tournament, t_dict, store_dir=SCRAPED_STORE):
+    """Save a tournament's Standings and Pairings to the store, replacing what was saved for it before.
+
+    Arguments:
+        tournament (str): Name of the tournament in the store, e.g. tournament_ln41.
+        t_dict (dict): Dictionary with the "players" DataFrame and the "pairings" dictionary of rounds.
+        store_dir (str): Folder of the store.
+
+    """
+    write_table(t_dict["players"], _partition_path(store_dir, "players", tournament))
+
+    # Every round in one table, with the round number in a "round" column
+    round_dfs = []
+    for round_key, round_dict in t_dict["pairings"].items():
+        round_num = int(round_key.split("_")[1])
+        round_dfs.append(round_dict["df"].assign(round=round_num))
+
+    if round_dfs:
+        pairings_df = pd.concat(round_dfs, ignore_index=True)
+        pairings_df["round"] = pairings_df["round"].astype("int16")
+        write_table(pairings_df, _partition_path(store_dir, "pairings", tournament))
+
+
+def write_scraped(scrape_results_dict, store_dir=SCRAPED_STORE):
+    """Save scraped data to the store so scraping isn't required everytime a change is made to analysis.
+
+    Tournaments that are already in the store are overwritten.
+
+    Arguments:
+        scrape_results_dict (dict): Dictionary that contains all the scraped tables.
+        store_dir (str): Folder of the store.
+
+    """
+    for key, t_dict in scrape_results_dict.items():
+        write_tournament(tournament_folder(key), t_dict, store_dir)
+
+
+def stored_tournaments(store_dir=SCRAPED_STORE):
+    """Return the names of the tournaments in the store, sorted."""
+    players_dir = os.path.join(store_dir, "players")
+    if not os.path.isdir(players_dir):
+        return []
+
+    return sorted(folder.split("=", 1)[1] for folder in os.listdir(players_dir) if folder.startswith("tournament="))
+
+
+def read_tournament(tournament, store_dir=SCRAPED_STORE):
+    """Read a tournament's Standings and Pairings from the store.
+
+    Arguments:
+        tournament (str): Name of the tournament in the store.
+        store_dir (str): Folder of the store.
+
+    Returns:
+        t_dict (dict): Dictionary with the "players" DataFrame and a "pairings" dictionary with a DataFrame
+                       for every round that has pairings, keyed like csv_to_dict ("round_1_pairings").
+
+    """
+    t_dict = {"players": pq.read_table(_partition_path(store_dir, "players", tournament)).to_pandas(), "pairings": {}}
+
+    pairings_path = _partition_path(store_dir, "pairings", tournament)
+    if os.path.exists(pairings_path):
+        pairings_df = pq.read_table(pairings_path).to_pandas()
+    else:
+        pairings_df = pd.DataFrame({"round": []})
+
+    if len(pairings_df) > 0:
+        if not pairings_df["round"].is_monotonic_increasing:
+            pairings_df = pairings_df.sort_values("round", kind="mergesort")
+
+        # Rounds are contiguous, so slice them out instead of grouping
+        rounds = pairings_df["round"].to_numpy()
+        pairings_df = pairings_df.drop(columns="round")
+        starts = np.flatnonzero(np.r_[True, rounds[1:] != rounds[:-1]])
+        ends = np.r_[starts[1:], len(rounds)]
+        for start, end in zip(starts, ends):
+            round_df = pairings_df.iloc[start:end].reset_index(drop=True)
+            t_dict["pairings"][f"round_{rounds[start]}_pairings"] = {"df": round_df}
+
+    return t_dict
+
+
+def read_scraped(store_dir=SCRAPED_STORE, tournaments=None, workers=READ_WORKERS):
+    """Read every tournament (or only the given ones) from the store.
+
+    Each tournament is one file per dataset, read with its own columns; files are read in parallel.
+
+    Arguments:
+        store_dir (str): Folder of the store.
+        tournaments (list): Names of the tournaments to read. Defaults to every tournament in the store.
+        workers (int): Number of threads reading files.
+
+    Returns:
+        scraped_dict (dict): Dictionary with the Standings and Pairings of every tournament, sorted by name.
+
+    """
+    tournaments = stored_tournaments(store_dir) if tournaments is None else tournaments
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        t_dicts = executor.map(lambda t: read_tournament(t, store_dir), tournaments)
+
+        return dict(zip(tournaments, t_dicts))
+
+
+def read_csv_tournament(t_folder):
+    """Read a tournament folder of the old CSV layout, keeping every value as a string."""
+    t_dict = {"players": pd.read_csv(os.path.join(t_folder, "players.csv"), dtype=str, keep_default_na=False),
+              "pairings": {}}
+
+    for round_file in os.listdir(t_folder):
+        if not round_file.startswith("round_"):
+            continue
+        round_df = pd.read_csv(os.path.join(t_folder, round_file), dtype=str, keep_default_na=False)
+        # Header-only files are rounds that were never played
+        if not round_df.empty:
+            round_num = int(round_file.split("_")[1].split(".")[0])
+            t_dict["pairings"][f"round_{round_num}_pairings"] = {"df": round_df}
+
+    # Same round order as the store
+    t_dict["pairings"] = dict(sorted(t_dict["pairings"].items(), key=lambda item: int(item[0].split("_")[1])))
+
+    return t_dict
+
+
+def migrate_csv_tree(scraped_data=SCRAPED_DATA, store_dir=SCRAPED_STORE, remove=False):
+    """Move the old scraped_data CSV folders into the store, and check every table reads back the same.
+
+    Arguments:
+        scraped_data (str): Folder with one sub-folder of CSVs per tournament.
+        store_dir (str): Folder of the store.
+        remove (bool): Delete scraped_data once every tournament has been checked.
+
+    Returns:
+        migrated (list): Names of the tournaments that were migrated.
+
+    """
+    migrated = []
+    for folder in sorted(os.listdir(scraped_data)):
+        t_folder = os.path.join(scraped_data, folder)
+        if not os.path.isdir(t_folder):
+            continue
+
+        t_dict = read_csv_tournament(t_folder)
+        write_tournament(folder, t_dict, store_dir)
+
+        # Compare with what the store gives back before anything is deleted
+        stored = read_tournament(folder, store_dir)
+        same = stored["players"].equals(t_dict["players"]) and list(stored["pairings"]) == list(t_dict["pairings"])
+        same = same and all(stored["pairings"][key]["df"].equals(round_dict["df"])
+                            for key, round_dict in t_dict["pairings"].items())
+        if not same:
+            raise ValueError(f"{folder} reads back differently from the store, stopping the migration")
+
+        migrated.append(folder)
+
+    logging.info(f"Migrated {len(migrated)} tournaments from {scraped_data} to {store_dir}")
+
+    if remove:
+        shutil.rmtree(scraped_data)
+
+    return migrated
+
+
+if __name__ == "__main__":
+    migrate_csv_tree(remove=True)
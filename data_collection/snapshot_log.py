@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import io
+import json
+import logging
+import os
+import re
+from collections import Counter
+
+import pandas as pd
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+RESULTS_DATED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "dated")
+CHECKPOINT_DATED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoint", "dated")
+
+
+def _as_strings(df):
+    """Return df exactly as it reads back from the CSV that to_csv would write, with every value a string."""
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)), dtype=str, keep_default_na=False)
+
+
+def _rows(df):
+    """Return the rows of df as tuples, which can be hashed and compared."""
+    return list(zip(*(df[col].tolist() for col in df.columns)))
+
+
+def _match_in_order(old_rows, new_rows):
+    """Match the leading rows of new_rows, in order, to rows of old_rows.
+
+    Old rows that are skipped over are dropped; matching stops at the first new row that isn't
+    further down old_rows, and everything from there on is new.
+
+    Returns:
+        kept (list): Positions in old_rows of the matched rows.
+
+    """
+    remaining = Counter(old_rows)
+    kept = []
+    j = 0
+    for row in new_rows:
+        if remaining[row] == 0:
+            break
+        while old_rows[j] != row:
+            remaining[old_rows[j]] -= 1
+            j += 1
+        remaining[row] -= 1
+        kept.append(j)
+        j += 1
+
+    return kept
+
+
+class SnapshotLog:
+    """Append-only log of the dated snapshots of a cumulative CSV, such as scrape_results.csv or checkpoint.csv.
+
+    Each snapshot stores only the rows added since the previous one, before or after the rows it kept,
+    and the positions of the rows it dropped, plus an entry in a JSON manifest. Any dated snapshot is
+    rebuilt by replaying the log up to its date, so the folder grows with new data rather than with the
+    number of runs. A snapshot is stored in full when its columns differ from the previous one, or
+    when it shares too little with it, e.g. after the rows were reordered.
+    """
+
+    def __init__(self, log_dir, name):
+        self.log_dir = log_dir
+        self.name = name
+        self.manifest_path = os.path.join(log_dir, f"{name}_manifest.json")
+
+    def entries(self):
+        """Return the manifest entries, oldest first."""
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path) as f:
+            return json.load(f)["snapshots"]
+
+    def dates(self):
+        return [entry["date"] for entry in self.entries()]
+
+    def _write_manifest(self, entries):
+        # Replaced atomically, so a run that dies part way leaves the previous manifest in place
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"name": self.name, "snapshots": entries}, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _read(self, filename):
+        return pd.read_csv(os.path.join(self.log_dir, filename), dtype=str, keep_default_na=False)
+
+    def _replay(self, entries):
+        """Rebuild the snapshot of the last entry from the newest full snapshot before it."""
+        start = max(i for i, entry in enumerate(entries) if entry["kind"] == "full")
+        state = self._read(entries[start]["file"])
+
+        for entry in entries[start + 1:]:
+            added = self._read(entry["file"])
+            if entry.get("removed_file"):
+                removed = pd.read_csv(os.path.join(self.log_dir, entry["removed_file"]))["row"]
+                state = state.drop(index=removed).reset_index(drop=True)
+            parts = [added, state] if entry["position"] == "prepend" else [state, added]
+            state = pd.concat(parts, ignore_index=True)
+
+        return state.reset_index(drop=True)
+
+    def rebuild(self, date=None):
+        """Rebuild the snapshot saved on a date.
+
+        Arguments:
+            date (str): Date of the snapshot, e.g. "2023-09-28". Defaults to the newest snapshot.
+
+        Returns:
+            snapshot_df (DataFrame): The snapshot as it was saved, with every value as a string.
+
+        """
+        entries = self.entries()
+        dates = [entry["date"] for entry in entries]
+        if not entries:
+            raise ValueError(f"No {self.name} snapshots in {self.log_dir}")
+        if date is not None and date not in dates:
+            raise ValueError(f"No {self.name} snapshot for {date}")
+
+        end = len(entries) if date is None else dates.index(date) + 1
+
+        return self._replay(entries[:end])
+
+    def restore(self, date, path):
+        """Write the snapshot saved on a date back out as a full CSV."""
+        self.rebuild(date).to_csv(path, header=True, index=False)
+
+    def append(self, df, date):
+        """Add a snapshot, storing only the rows that changed since the previous snapshot.
+
+        Saving a second snapshot on the same date replaces the first one.
+
+        Arguments:
+            df (DataFrame): The full cumulative table as of date.
+            date (str): Date of the snapshot, e.g. "2023-09-28".
+
+        Returns:
+            entry (dict): The manifest entry of the snapshot.
+
+        """
+        new_df = _as_strings(df)
+        entries = self.entries()
+
+        if entries and entries[-1]["date"] == date:
+            entries = entries[:-1]
+        if entries and entries[-1]["date"] > date:
+            raise ValueError(f"{self.name} already has a snapshot after {date}")
+
+        entry = {"date": date, "rows": len(new_df), "columns": list(new_df.columns)}
+        delta = None
+        if entries and entries[-1]["columns"] == entry["columns"]:
+            delta = self._delta(self._replay(entries), new_df)
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        if delta is None:
+            entry.update(kind="full", file=f"{self.name}_{date}.full.csv")
+            new_df.to_csv(os.path.join(self.log_dir, entry["file"]), header=True, index=False)
+        else:
+            added, removed, position = delta
+            entry.update(kind="delta", file=f"{self.name}_{date}.added.csv", position=position,
+                         added_rows=len(added), removed_rows=len(removed))
+            added.to_csv(os.path.join(self.log_dir, entry["file"]), header=True, index=False)
+            if len(removed) > 0:
+                entry["removed_file"] = f"{self.name}_{date}.removed.csv"
+                pd.DataFrame({"row": removed}).to_csv(os.path.join(self.log_dir, entry["removed_file"]),
+                                                      header=True, index=False)
+
+        self._write_manifest(entries + [entry])
+        logging.info(f"Saved {self.name} snapshot for {date} ({entry['kind']}, {entry['rows']} rows)")
+
+        return entry
+
+    @staticmethod
+    def _delta(old_df, new_df):
+        """Split new_df into the rows added before or after the rows kept from old_df, and the rows dropped.
+
+        Returns:
+            delta (tuple): The added rows, the positions in old_df of the dropped rows and "append" or
+                           "prepend"; None if a full snapshot would be smaller.
+
+        """
+        old_rows, new_rows = _rows(old_df), _rows(new_df)
+        n_old, n_new = len(old_rows), len(new_rows)
+
+        deltas = []
+        # Appended rows follow the kept rows; prepended rows are found by matching from the end
+        kept = _match_in_order(old_rows, new_rows)
+        deltas.append((new_df.iloc[len(kept):], kept, "append"))
+        kept = [n_old - 1 - j for j in _match_in_order(old_rows[::-1], new_rows[::-1])]
+        deltas.append((new_df.iloc[:n_new - len(kept)], kept, "prepend"))
+
+        added, kept, position = min(deltas, key=lambda delta: len(delta[0]) + n_old - len(delta[1]))
+        if len(added) >= n_new:
+            return None
+        removed = sorted(set(range(n_old)) - set(kept))
+
+        return added.reset_index(drop=True), removed, position
+
+
+def results_log(log_dir=RESULTS_DATED):
+    return SnapshotLog(log_dir, "scrape_results")
+
+
+def checkpoint_log(log_dir=CHECKPOINT_DATED):
+    return SnapshotLog(log_dir, "checkpoint")
+
+
+def migrate_dated(log, remove=False):
+    """Move the full dated copies in a log's folder into the log, and check every one rebuilds byte for byte.
+
+    Arguments:
+        log (SnapshotLog): Log to move the dated copies into, e.g. results_log().
+        remove (bool): Delete the full dated copies once every snapshot has been checked.
+
+    Returns:
+        migrated (list): Dates of the snapshots that were migrated.
+
+    """
+    pattern = re.compile(rf"^{re.escape(log.name)}_(\d{{4}}-\d{{2}}-\d{{2}})\.csv$")
+    dated_files = sorted((match.group(1), filename) for filename in os.listdir(log.log_dir)
+                         if (match := pattern.match(filename)))
+
+    for date, filename in dated_files:
+        log.append(pd.read_csv(os.path.join(log.log_dir, filename), dtype=str, keep_default_na=False), date)
+
+    # Compare with what the log gives back before anything is deleted
+    for date, filename in dated_files:
+        with open(os.path.join(log.log_dir, filename), newline="") as f:
+            original = f.read()
+        if log.rebuild(date).to_csv(index=False) != original:
+            raise ValueError(f"{filename} rebuilds differently from the {log.name} log, stopping the migration")
+
+    logging.info(f"Migrated {len(dated_files)} dated {log.name} snapshots into {log.manifest_path}")
+
+    if remove:
+        for _, filename in dated_files:
+            os.remove(os.path.join(log.log_dir, filename))
+
+    return [date for date, _ in dated_files]
+
+
+if __name__ == "__main__":
+    migrate_dated(results_log(), remove=True)
+    migrate_dated(checkpoint_log(), remove=True)
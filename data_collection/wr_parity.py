@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Check that the vectorized archetype_wr_per_round counts exactly what the original one did.
+
+Run from the data_collection folder with `python wr_parity.py`. Exits with status 1 on any mismatch.
+
+baseline_deck_and_records and baseline_archetype_wr_per_round below are the functions as they were
+before archetype_wr_per_round was vectorized, copied verbatim; only their names are prefixed. Every
+round of every tournament in the scraped data store is counted by both, and must give the same counts:
+
+- with the players' display names, wherever the original name join is unambiguous, i.e. every display
+  name in the standings is unique and every player in the round is in the standings;
+- with the Player IDs standing in for the display names, in every round. The original name join on
+  unique IDs is the Player ID join deck_and_records now does, so this covers rounds with shared or
+  missing names too.
+"""
+
+# imports
+import logging
+import sys
+
+import numpy as np
+import pandas as pd
+
+from limitless_analysis import BYE, archetype_wr_per_round
+from scraped_store import SCRAPED_STORE, read_scraped
+
+
+def baseline_deck_and_records(round_dict, players_df):
+    """Join the players_df and the Pairings DataFrames.
+
+    Join the players_df and the Pairings DataFrames so that each pairing now has the 
+    players' names, IDs, records, deck arcetypes, and who won the pairing, and what 
+    archetype the winner was playing. 
+
+    Arguments: 
+        round_dict (dict): Dictionary containing a DataFrame for the round with data for 
+                           the Player Names, IDs, and their records. 
+        players_df (DataFrame): DataFrame with each player's name, ID, and choice of deck.
+
+    Returns: 
+        round_df (DataFrame): DataFrame which now has both player's names, IDs, choice of deck, 
+                              their records, which player won in each pairing, and what deck the 
+                              winning player was using.
+
+    """
+    # Unpack the given round's DataFrame from dictionary
+    round_df = round_dict["df"]
+
+    # Join round_df and players_df to get deck names 
+    round_df = round_df.merge(players_df[["Deck", "Name"]], left_on="Player 1 Name", right_on="Name").drop("Name", axis=1)
+    round_df = round_df.rename({"Deck": "Player 1 Deck"}, axis=1)
+    round_df = round_df.merge(players_df[["Deck", "Name"]], left_on="Player 2 Name", right_on="Name").drop("Name", axis=1)
+    round_df = round_df.rename({"Deck": "Player 2 Deck"}, axis=1)
+    
+    # Switch Player with Deck name instead so Winner becomes the deck instead
+    round_df["Player 1"] = round_df["Player 1 Deck"]
+    round_df["Player 2"] = round_df["Player 2 Deck"]
+    
+    # Create new column that selects the winning deck
+    conditions = [
+        (round_df['Winner ID'] == round_df['Player 1 ID']),
+        (round_df['Winner ID'] == round_df['Player 2 ID']),
+        (round_df['Winner ID'] == '0'),
+        (round_df['Winner ID'] == '-1')
+    ]
+    
+    winner = (round_df['Player 1 Deck'], round_df["Player 2 Deck"], "Draw", "Loss")
+
+    round_df["Winning Deck"] = np.select(conditions, winner)
+    
+
+    return round_df
+
+
+def baseline_archetype_wr_per_round(round_dict, standings_df, all_archetype_dict):
+    """Count wins, losses and ties for every matchup in a round. 
+
+    Counts wins, losses, and ties of each archetype against every other archetype present
+    in a single round of a tournament. 
+    
+    Arguments:
+        round_dict (dict): Dictionary that contains information for a round. Currently is 
+                        a DataFrame only inside the dictionary. 
+        standings_df (df): DataFrame with the standings for the tournament that the round is in. 
+        all_archetype_dict (dict): Dictionary that will store the win rates for all matchups.
+        
+    Returns: 
+        all_archetype_dict: Dictionary that stores win rates for each archetype. 
+
+    """
+    
+    # Add deck names to each player in the pairings
+    round_df = baseline_deck_and_records(round_dict, standings_df)
+    
+    # find unique archetypes 
+    all_archetypes = standings_df['Deck'].unique().tolist()
+    
+    # Keep track of how many matches were dropped
+    games_dropped = 0
+
+    # For each archetype, find the winrates against each other archetype
+    for archetype in all_archetypes:
+
+        # Dictionary to store all the matchups for current archetype
+        if archetype in all_archetype_dict:
+            mu_dict = all_archetype_dict[archetype]
+        else:
+            mu_dict = {}
+
+        # Try including mirror matches:
+        temp_df1 = round_df[(round_df["Player 1"] == archetype)]
+        temp_df2 = round_df[(round_df["Player 2"] == archetype)]
+        
+        # Update winrates when Player 1 played the given archetype
+        for i in range(len(temp_df1)):
+            row = temp_df1.iloc[i]
+            opposing_deck = row["Player 2"]
+
+            # add opposing deck to mu dict if its not already there; start WLT count at zero
+            if opposing_deck not in mu_dict:
+                mu_dict[opposing_deck] = {"wins": 0, "losses": 0, "ties": 0}
+
+            # Check result and update mu_dict
+            if row["Player 1 Deck"] == row["Player 2 Deck"]:
+                mu_dict[opposing_deck]["wins"] += 0.5
+                mu_dict[opposing_deck]["losses"] += 0.5
+            elif row["Winning Deck"] == row["Player 1 Deck"]:
+                mu_dict[opposing_deck]["wins"] += 1
+            elif (row["Winning Deck"] == row['Player 2 Deck']) or (row["Winning Deck"] == "Loss"):
+                mu_dict[opposing_deck]["losses"] += 1
+            elif row["Winning Deck"] == "Draw":
+                mu_dict[opposing_deck]["ties"] += 1
+            else:
+                games_dropped += 1
+                logging.info(f"Match result undetermined...\n{row}")
+        
+        # Update winrates when Player 2 played the given archetype
+        for i in range(len(temp_df2)):
+            row = temp_df2.iloc[i]
+            opposing_deck = row["Player 1"]
+
+            # add opposing deck to mu dict
+            if opposing_deck not in mu_dict:
+                mu_dict[opposing_deck] = {"wins": 0, "losses": 0, "ties": 0}
+
+            # Check result and update mu_dict
+            if row["Player 1 Deck"] == row["Player 2 Deck"]:
+                mu_dict[opposing_deck]["wins"] += 0.5
+                mu_dict[opposing_deck]["losses"] += 0.5
+            elif row["Winning Deck"] == row["Player 2 Deck"]:
+                mu_dict[opposing_deck]["wins"] += 1
+            elif (row["Winning Deck"] == row["Player 1 Deck"]) or (row["Winning Deck"] == "Loss"):
+                mu_dict[opposing_deck]["losses"] += 1
+            elif row["Winning Deck"] == "Draw":
+                mu_dict[opposing_deck]["ties"] += 1
+            else:
+                games_dropped += 1
+                logging.info(f"Match result undetermined...\n{row}")
+
+        # Update all_archetype_dict
+        all_archetype_dict[archetype] = mu_dict
+
+    # logging.info(f"Games dropped .... {games_dropped}")
+
+    return all_archetype_dict
+
+
+def by_id(round_dict, players_df):
+    """Put the Player IDs in place of the display names, so the original name join becomes the Player ID join."""
+    round_df = round_dict["df"].copy()
+    round_df["Player 1 Name"] = round_df["Player 1 ID"]
+    round_df["Player 2 Name"] = round_df["Player 2 ID"]
+    players_df = players_df.copy()
+    players_df["Name"] = players_df["Player ID"]
+
+    return {"df": round_df}, players_df
+
+
+def unambiguous_names(round_dict, players_df):
+    """Return True if joining the round to the standings on display names matches every player exactly once."""
+    names = players_df["Name"]
+    if names.duplicated().any():
+        return False
+    round_df = round_dict["df"]
+    round_names = pd.concat([round_df["Player 1 Name"], round_df["Player 2 Name"]])
+
+    return round_names[round_names != BYE].isin(names).all()
+
+
+def check(store_dir=SCRAPED_STORE):
+    logging.getLogger().setLevel(logging.ERROR)
+    tournaments = {t: t_dict for t, t_dict in read_scraped(store_dir).items() if "Deck" in t_dict["players"]}
+
+    rounds = by_name = 0
+    mismatches = []
+    for t, t_dict in tournaments.items():
+        players_df = t_dict["players"]
+        for round_num, round_dict in t_dict["pairings"].items():
+            rounds += 1
+            new = archetype_wr_per_round(round_dict, players_df, {})
+
+            id_round, id_players = by_id(round_dict, players_df)
+            if baseline_archetype_wr_per_round(id_round, id_players, {}) != new:
+                mismatches.append(f"{t} {round_num} (by Player ID)")
+
+            if unambiguous_names(round_dict, players_df):
+                by_name += 1
+                if baseline_archetype_wr_per_round(round_dict, players_df, {}) != new:
+                    mismatches.append(f"{t} {round_num} (by name)")
+
+    print(f"{len(tournaments)} tournaments, {rounds} rounds; {rounds} compared by Player ID, {by_name} by name")
+    for mismatch in mismatches:
+        print(f"Different counts: {mismatch}")
+    print(f"Mismatched rounds: {len(mismatches)}")
+
+    return not mismatches
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check() else 1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import logging
+import os
+import threading
+import time
+
+from results_store import store_version
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Seconds between checks of the results store's version
+POLL_INTERVAL = float(os.environ.get("DATA_POLL_SECONDS", 60))
+
+
+class DataWatcher:
+    """Keep the app's data in step with the results store, reloading it in the background when it changes.
+
+    load(db_path) builds everything the app reads (e.g. the set index) from the store and returns it as
+    one object with a version attribute. A thread polls the store's version; when it changes, the new
+    data is loaded next to the old one and then swapped in with a single assignment, so a callback that
+    took the data with get() keeps a complete old or complete new copy, never a mix. If loading fails,
+    the old data is kept and the next poll tries again.
+
+    The data is loaded when the watcher is made, so a server that preloads the app shares it with the
+    workers it forks. The thread is not started until start() is called in a worker, so the server's
+    master process, which only forks, never polls; start() starts it once per process.
+
+    Arguments:
+        db_path (str): Path to the results store.
+        load (callable): Builds the app's data from the store at db_path.
+        interval (float): Seconds between version checks.
+    """
+
+    def __init__(self, db_path, load, interval=POLL_INTERVAL):
+        self.db_path = db_path
+        self.load = load
+        self.interval = interval
+        self.current = load(db_path)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.stop_event = threading.Event()
+
+    def get(self):
+        """Return the current data."""
+        return self.current
+
+    def start(self):
+        """Start the watcher thread in this process if it isn't running."""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.stop_event.clear()
+                self.thread = threading.Thread(target=self._watch, daemon=True, name="data-watcher")
+                self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.pid = None
+
+    def check(self):
+        """Reload the data if the store's version changed. Returns True if new data was swapped in."""
+        try:
+            version = store_version(self.db_path)
+        except FileNotFoundError:
+            # Between a rebuild removing the store and renaming the new one in
+            return False
+        if version == self.current.version:
+            return False
+
+        start = time.perf_counter()
+        try:
+            new_data = self.load(self.db_path)
+        except Exception:
+            logging.exception(f"Reloading {self.db_path} failed, still serving version {self.current.version}")
+            return False
+
+        # One assignment, so readers see either the old or the new data
+        self.current = new_data
+        logging.info(f"Reloaded results version {new_data.version} in {time.perf_counter() - start:.2f}s")
+
+        return True
+
+    def _watch(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
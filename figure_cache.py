@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import atexit
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import plotly.io as pio
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Shared by every worker process on the machine unless FIGURE_CACHE_DIR says otherwise
+FIGURE_CACHE_DIR = os.environ.get("FIGURE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "limitless_figure_cache"))
+
+# Most figures kept, least recently used evicted first
+MAX_ENTRIES = 512
+
+# Seconds a figure is served for before it is rebuilt
+TTL = 24 * 60 * 60
+
+# Hex digits of the hash in a figure's file name, followed by the data version
+KEY_LENGTH = 32
+
+
+def stats_path(pid, cache_dir=FIGURE_CACHE_DIR):
+    return os.path.join(cache_dir, "stats", f"{pid}.json")
+
+
+def remove_stats(pid, cache_dir=FIGURE_CACHE_DIR):
+    """Delete the counts saved by the worker with pid, without loading the app (e.g. from gunicorn's master)."""
+    try:
+        os.remove(stats_path(pid, cache_dir))
+    except FileNotFoundError:
+        pass
+
+
+class FigureCache:
+    """Figures returned by the app's callbacks, saved as JSON files so every gunicorn worker shares them.
+
+    Figures are keyed by the callback name, the version of the results data and the normalized inputs,
+    so a new version of the data never serves an old figure; files of older versions are deleted as soon
+    as a worker sees a new version. A hit touches the file, and once there are more than max_entries
+    files the least recently used ones are deleted. Files older than ttl seconds count as misses.
+
+    Each worker counts its hits, misses and time spent, and saves the counts next to the figures so
+    stats() can add up every worker. A worker's counts are deleted when it exits (gunicorn's child_exit
+    hook also covers workers that were killed), and stats() ignores counts not updated for ttl seconds.
+    """
+
+    def __init__(self, cache_dir=FIGURE_CACHE_DIR, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = None
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "evictions": 0, "hit_seconds": 0.0, "miss_seconds": 0.0}
+        os.makedirs(os.path.join(cache_dir, "figures"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "stats"), exist_ok=True)
+
+        # Looks up the pid on exit, so each forked worker removes its own counts
+        atexit.register(self.remove_stats)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, "figures", f"{key}.json")
+
+    def _write(self, path, text):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def key(self, name, version, inputs):
+        """Hash the callback name, data version and normalized inputs into the name of the figure's file."""
+        return f"{hashlib.sha256(json.dumps([name, version, inputs]).encode('utf-8')).hexdigest()[:KEY_LENGTH]}-{version}"
+
+    def set_version(self, version):
+        """Drop the figures of every other data version, once per version seen by this worker."""
+        version = str(version)
+        if version == self.version:
+            return
+        self.version = version
+
+        figures_dir = os.path.join(self.cache_dir, "figures")
+        for filename in os.listdir(figures_dir):
+            if filename.endswith(".json") and filename[KEY_LENGTH + 1:-len(".json")] != version:
+                try:
+                    os.remove(os.path.join(figures_dir, filename))
+                except FileNotFoundError:
+                    pass
+
+    def get(self, key):
+        """Return the saved figure JSON for key, or None if it isn't cached or has expired."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                # First line is when the figure was saved; the modified time is when it was last used
+                created = float(f.readline())
+                if time.time() - created > self.ttl:
+                    return None
+                text = f.read()
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        return text
+
+    def put(self, key, text):
+        self._write(self._path(key), f"{time.time()}\n{text}")
+        self._evict()
+
+    def _evict(self):
+        """Delete the least recently used figures once there are more than max_entries."""
+        figures_dir = os.path.join(self.cache_dir, "figures")
+        entries = []
+        for filename in os.listdir(figures_dir):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                entries.append((os.stat(os.path.join(figures_dir, filename)).st_mtime, filename))
+            except FileNotFoundError:
+                continue
+
+        evicted = 0
+        for _, filename in sorted(entries)[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(os.path.join(figures_dir, filename))
+                evicted += 1
+            except FileNotFoundError:
+                pass
+        if evicted:
+            with self.lock:
+                self.counts["evictions"] += evicted
+
+    def _stats_path(self, pid):
+        return stats_path(pid, self.cache_dir)
+
+    def remove_stats(self, pid=None):
+        """Delete the counts saved by the worker with pid, this process by default."""
+        remove_stats(pid or os.getpid(), self.cache_dir)
+
+    def _record(self, hit, seconds):
+        with self.lock:
+            self.counts["hits" if hit else "misses"] += 1
+            self.counts["hit_seconds" if hit else "miss_seconds"] += seconds
+            counts = dict(self.counts)
+        self._write(self._stats_path(os.getpid()), json.dumps(counts))
+
+    def memoize(self, name, version, normalize):
+        """Decorate a callback so its figure is served from the cache when the same inputs come back.
+
+        Arguments:
+            name (str): Name of the callback, part of the key.
+            version (callable): Returns the version of the data the callback reads.
+            normalize (callable): Turns the callback's arguments into a JSON-serializable key, so inputs
+                                  that give the same figure (e.g. the same decks in another order) share it.
+
+        Returns:
+            decorator (function): Wraps the callback.
+
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                start = time.perf_counter()
+                data_version = version()
+                self.set_version(data_version)
+                key = self.key(name, data_version, normalize(*args))
+
+                text = self.get(key)
+                if text is not None:
+                    # Dash accepts the figure as a dictionary
+                    figure = json.loads(text)
+                    self._record(True, time.perf_counter() - start)
+                    return figure
+
+                figure = func(*args)
+                # Don't save a figure under this version if the data was reloaded while it was built
+                if version() == data_version:
+                    self.put(key, pio.to_json(figure, validate=False))
+                self._record(False, time.perf_counter() - start)
+                return figure
+
+            return wrapper
+
+        return decorator
+
+    def stats(self):
+        """Add up the counts saved by every worker, with the hit rate and average latency of hits and misses."""
+        totals = {"hits": 0, "misses": 0, "evictions": 0, "hit_seconds": 0.0, "miss_seconds": 0.0}
+        stats_dir = os.path.join(self.cache_dir, "stats")
+        workers = 0
+        for filename in os.listdir(stats_dir):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(stats_dir, filename)
+            try:
+                # Left behind by a worker that died without cleaning up; a live worker writes its counts
+                # again on its next request
+                if time.time() - os.stat(path).st_mtime > self.ttl:
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    counts = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            workers += 1
+            for stat in totals:
+                totals[stat] += counts.get(stat, 0)
+
+        requests = totals["hits"] + totals["misses"]
+        figures_dir = os.path.join(self.cache_dir, "figures")
+
+        return {
+            "workers": workers,
+            "entries": sum(filename.endswith(".json") for filename in os.listdir(figures_dir)),
+            "max_entries": self.max_entries,
+            "version": self.version,
+            "hits": totals["hits"],
+            "misses": totals["misses"],
+            "evictions": totals["evictions"],
+            "hit_rate": round(totals["hits"] / requests, 3) if requests else None,
+            "hit_ms": round(1000 * totals["hit_seconds"] / totals["hits"], 2) if totals["hits"] else None,
+            "miss_ms": round(1000 * totals["miss_seconds"] / totals["misses"], 2) if totals["misses"] else None,
+        }
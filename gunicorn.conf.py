@@ -0,0 +1,36 @@
+# Gunicorn settings for the web dyno, e.g. `gunicorn --config gunicorn.conf.py plot_win_rates:server`
+import gc
+import os
+
+# Import the app, and load the results, once in the master; workers are forked from it and share its
+# memory copy-on-write instead of each loading their own copy
+preload_app = True
+
+# Heroku sets WEB_CONCURRENCY from the dyno size
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+
+
+def on_starting(server):
+    # Runs in the master once the app is preloaded. Collect the garbage left by loading it, then no
+    # collections until the workers are forked: freed objects would leave holes in pages that later
+    # allocations fill, and the forked workers would copy those pages
+    gc.collect()
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    # Move everything the master loaded out of the collector's reach, so collections in the workers
+    # don't write to the shared pages. The master collects again from here on, and its new objects
+    # aren't frozen until the next fork
+    gc.freeze()
+    gc.enable()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def child_exit(server, worker):
+    # Runs in the master, so the figure cache counts of workers that were killed are deleted too
+    import figure_cache
+    figure_cache.remove_stats(worker.pid)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Guard the import cost of the web entry point.
+
+Run from the repository root with `python import_budget.py`. Imports plot_win_rates in a fresh interpreter
+under `python -X importtime` and exits with status 1 if the app's own modules import any module of the
+scraping stack, or if its imports take longer than the budget. The app's own time, which is mostly loading
+the results, doesn't count towards the budget. Only the first import of a module is timed, so it is
+attributed to whichever module imported it first.
+"""
+
+# imports
+import os
+import subprocess
+import sys
+import tempfile
+
+from app_benchmarks import results_db
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINT = "plot_win_rates"
+
+# Modules the web app must not import, with everything under them
+FORBIDDEN = ["limitless_scrape", "limitless_analysis", "scrape_pipeline", "requests", "bs4", "html5lib", "lxml",
+             "plotly.express"]
+
+# Seconds the entry point's imports may take, on top of its own time
+BUDGET = 2.0
+
+
+def import_times(module=ENTRY_POINT, db_path=None):
+    """Import module in a fresh interpreter with -X importtime.
+
+    Returns:
+        times (dict): Self and cumulative import time in seconds of every imported module, by name, with
+                      the name of the module whose import imported it.
+
+    """
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, RESULTS_DB=db_path or results_db(), FIGURE_CACHE_DIR=cache_dir, PYTHONWARNINGS="ignore")
+        output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True).stderr
+
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented two more spaces and printed before the module that imported them
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), level, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+
+    times = {}
+    for i, (name, level, self_s, cumulative_s) in enumerate(rows):
+        parent = next((rows[j][0] for j in range(i + 1, len(rows)) if rows[j][1] < level), None)
+        times[name] = {"self": self_s, "cumulative": cumulative_s, "imported_by": parent}
+
+    return times
+
+
+def is_forbidden(name):
+    return any(name == f or name.startswith(f"{f}.") for f in FORBIDDEN)
+
+
+def is_repo_module(name):
+    return os.path.exists(os.path.join(REPO_DIR, f"{name.split('.')[0]}.py"))
+
+
+def importer(times, name):
+    """Follow the importers of a forbidden module up to the first module that isn't forbidden."""
+    while name is not None and is_forbidden(name):
+        name = times[name]["imported_by"]
+
+    return name
+
+
+def check(module=ENTRY_POINT, budget=BUDGET):
+    times = import_times(module)
+    imports = sum(t["self"] for name, t in times.items() if name != module)
+
+    # Forbidden modules the app's own modules import; libraries such as dash may import some of them themselves
+    by_app, by_libraries = [], []
+    for name in sorted(times):
+        if is_forbidden(name) and not is_forbidden(times[name]["imported_by"] or ""):
+            source = importer(times, name)
+            (by_app if source is None or is_repo_module(source) else by_libraries).append(f"{name} (from {source})")
+
+    print(f"{module}: {len(times)} modules, imports {imports:.2f}s (budget {budget:.2f}s), "
+          f"own time {times[module]['self']:.2f}s")
+    print("Slowest imports:")
+    for name, t in sorted(times.items(), key=lambda item: -item[1]["self"])[:10]:
+        if name != module:
+            print(f"  {1000 * t['self']:7.1f}ms  {name}")
+    if by_libraries:
+        print(f"Imported by libraries, not the app: {', '.join(by_libraries)}")
+    if by_app:
+        print(f"The app imports the scraping stack: {', '.join(by_app)}")
+    if imports > budget:
+        print(f"Imports take {imports:.2f}s, over the {budget:.2f}s budget")
+
+    return not by_app and imports <= budget
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check() else 1)
@@ -2,6 +2,9 @@
 # coding: utf-8
 
 # imports 
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
@@ -13,6 +16,36 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
+# Name and ID the scraper gives the missing opponent of a bye
+BYE = "*Bye*"
+
+
+def player_keys(players_df):
+    """Give every player in the standings an integer key, based on their Player ID.
+
+    A Player ID should only be listed once. If it's listed more than once, the first listing is 
+    kept and the duplicates are reported.
+
+    Arguments:
+        players_df (DataFrame): DataFrame with each player's name, ID, and choice of deck.
+
+    Returns:
+        player_index (Index): Player IDs as strings; the position of an ID is its key.
+        decks (array): Deck of each player, by key.
+
+    """
+    player_ids = players_df["Player ID"].astype(str)
+    duplicated = player_ids.duplicated().to_numpy()
+    if duplicated.any():
+        logging.warning(f"Player IDs listed more than once in the standings, keeping the first: "
+                        f"{player_ids[duplicated].unique().tolist()}")
+
+    player_index = pd.Index(player_ids[~duplicated])
+    decks = players_df["Deck"].to_numpy(dtype=object)[~duplicated]
+
+    return player_index, decks
+
+
 def deck_and_records(round_dict, players_df):
     """Join the players_df and the Pairings DataFrames.
 
@@ -20,6 +53,11 @@ def deck_and_records(round_dict, players_df):
     players' names, IDs, records, deck arcetypes, and who won the pairing, and what 
     archetype the winner was playing. 
 
+    Players are matched on their Player ID, encoded as integer keys, so two players with 
+    the same name can't multiply a pairing. Every pairing appears at most once and in its 
+    original order. Byes and pairings with a player missing from the standings are dropped; 
+    missing players are reported.
+
     Arguments: 
         round_dict (dict): Dictionary containing a DataFrame for the round with data for 
                            the Player Names, IDs, and their records. 
@@ -34,11 +72,24 @@ def deck_and_records(round_dict, players_df):
     # Unpack the given round's DataFrame from dictionary
     round_df = round_dict["df"]
 
+    # Look up both players' keys; -1 means the ID isn't in the standings
+    player_index, decks = player_keys(players_df)
+    p1_ids = round_df["Player 1 ID"].astype(str)
+    p2_ids = round_df["Player 2 ID"].astype(str)
+    p1_keys = player_index.get_indexer(p1_ids)
+    p2_keys = player_index.get_indexer(p2_ids)
+
+    # Byes have no opponent, any other unknown ID is a player missing from the standings
+    missing = pd.concat([p1_ids[p1_keys == -1], p2_ids[p2_keys == -1]])
+    missing = missing[missing != BYE]
+    if len(missing) > 0:
+        logging.warning(f"Dropping pairings with players missing from the standings: {missing.unique().tolist()}")
+
     # Join round_df and players_df to get deck names 
-    round_df = round_df.merge(players_df[["Deck", "Name"]], left_on="Player 1 Name", right_on="Name").drop("Name", axis=1)
-    round_df = round_df.rename({"Deck": "Player 1 Deck"}, axis=1)
-    round_df = round_df.merge(players_df[["Deck", "Name"]], left_on="Player 2 Name", right_on="Name").drop("Name", axis=1)
-    round_df = round_df.rename({"Deck": "Player 2 Deck"}, axis=1)
+    found = (p1_keys != -1) & (p2_keys != -1)
+    round_df = round_df[found].copy()
+    round_df["Player 1 Deck"] = decks[p1_keys[found]]
+    round_df["Player 2 Deck"] = decks[p2_keys[found]]
     
     # Switch Player with Deck name instead so Winner becomes the deck instead
     round_df["Player 1"] = round_df["Player 1 Deck"]
@@ -60,11 +111,91 @@ def deck_and_records(round_dict, players_df):
     return round_df
 
 
+# Result of a pairing, seen from the side of the deck being counted
+MIRROR, WIN, LOSS, TIE, UNDETERMINED = 0, 1, 2, 3, -1
+
+
+def matchup_results(round_df):
+    """Stack every pairing from both players' side and code the result for that side.
+
+    Arguments:
+        round_df (DataFrame): Pairings with decks, as returned by deck_and_records.
+
+    Returns:
+        results (DataFrame): Two rows per pairing with the deck, the opposing deck and the result
+                             code (MIRROR, WIN, LOSS, TIE or UNDETERMINED) for the deck. Player 1's
+                             side of every pairing comes first, then Player 2's, in pairing order.
+
+    """
+    p1_deck = round_df["Player 1 Deck"].to_numpy(dtype=object)
+    p2_deck = round_df["Player 2 Deck"].to_numpy(dtype=object)
+    winning_deck = round_df["Winning Deck"].to_numpy(dtype=object)
+
+    sides = []
+    for deck, opposing_deck in ((p1_deck, p2_deck), (p2_deck, p1_deck)):
+        conditions = [
+            deck == opposing_deck,
+            winning_deck == deck,
+            (winning_deck == opposing_deck) | (winning_deck == "Loss"),
+            winning_deck == "Draw"
+        ]
+        result = np.select(conditions, [MIRROR, WIN, LOSS, TIE], default=UNDETERMINED)
+        sides.append(pd.DataFrame({"deck": deck, "opposing_deck": opposing_deck, "result": result}))
+
+    return pd.concat(sides, ignore_index=True)
+
+
+def wlt_counts(results, keys=("deck", "opposing_deck")):
+    """Count wins, losses, ties, mirrors and undetermined results for each group of keys.
+
+    Arguments:
+        results (DataFrame): Output of matchup_results, plus any extra key columns.
+        keys (tuple): Columns to group by.
+
+    Returns:
+        counts (DataFrame): One row per group, in order of first appearance, with the counts of 
+                            each result. Rows without a deck are left out.
+
+    """
+    results = results[results["deck"].notna()]
+    result = results["result"]
+    counts = results[list(keys)].assign(
+        wins=(result == WIN).astype(int),
+        losses=(result == LOSS).astype(int),
+        ties=(result == TIE).astype(int),
+        mirrors=(result == MIRROR).astype(int),
+        undetermined=(result == UNDETERMINED).astype(int)
+    )
+
+    return counts.groupby(list(keys), sort=False, dropna=False).sum().reset_index()
+
+
+def add_counts(mu_dict, opposing_deck, counts):
+    """Add a group's counts to the WLT dictionary of a matchup.
+
+    A mirror match is half a win and half a loss. Counts only become floats once a mirror has been
+    added, the same as adding the results one match at a time.
+    """
+    # add opposing deck to mu dict if its not already there; start WLT count at zero
+    if opposing_deck not in mu_dict:
+        mu_dict[opposing_deck] = {"wins": 0, "losses": 0, "ties": 0}
+
+    wlt = mu_dict[opposing_deck]
+    if counts.mirrors > 0:
+        wlt["wins"] += float(counts.wins + 0.5 * counts.mirrors)
+        wlt["losses"] += float(counts.losses + 0.5 * counts.mirrors)
+    else:
+        wlt["wins"] += int(counts.wins)
+        wlt["losses"] += int(counts.losses)
+    wlt["ties"] += int(counts.ties)
+
+
 def archetype_wr_per_round(round_dict, standings_df, all_archetype_dict):
     """Count wins, losses and ties for every matchup in a round. 
 
     Counts wins, losses, and ties of each archetype against every other archetype present
-    in a single round of a tournament. 
+    in a single round of a tournament. Every pairing is counted from both players' side at 
+    once, then grouped by (deck, opposing deck).
     
     Arguments:
         round_dict (dict): Dictionary that contains information for a round. Currently is 
@@ -82,11 +213,36 @@ def archetype_wr_per_round(round_dict, standings_df, all_archetype_dict):
     
     # find unique archetypes 
     all_archetypes = standings_df['Deck'].unique().tolist()
-    
+
+    # WLT counts for every (deck, opposing deck) pair in the round
+    counts = wlt_counts(matchup_results(round_df))
+
     # Keep track of how many matches were dropped
-    games_dropped = 0
+    games_dropped = counts["undetermined"].sum()
+    if games_dropped > 0:
+        logging.info(f"Match result undetermined for {games_dropped} results...")
+
+    return update_archetype_dict(all_archetype_dict, counts, all_archetypes)
 
-    # For each archetype, find the winrates against each other archetype
+
+def update_archetype_dict(all_archetype_dict, counts, all_archetypes):
+    """Add grouped WLT counts to all_archetype_dict.
+
+    Arguments:
+        all_archetype_dict (dict): Dictionary that stores the WLT counts for all matchups.
+        counts (DataFrame): Output of wlt_counts grouped by deck and opposing deck.
+        all_archetypes (list): Archetypes to add to all_archetype_dict, even if they have no counts.
+
+    Returns:
+        all_archetype_dict (dict): The updated dictionary.
+
+    """
+    # Group the counts by deck, opposing decks stay in order of first appearance
+    deck_counts = {}
+    for row in counts.itertuples(index=False):
+        deck_counts.setdefault(row.deck, []).append(row)
+
+    # For each archetype, update the counts against each other archetype
     for archetype in all_archetypes:
 
         # Dictionary to store all the matchups for current archetype
@@ -95,73 +251,54 @@ def archetype_wr_per_round(round_dict, standings_df, all_archetype_dict):
         else:
             mu_dict = {}
 
-        # Try including mirror matches:
-        temp_df1 = round_df[(round_df["Player 1"] == archetype)]
-        temp_df2 = round_df[(round_df["Player 2"] == archetype)]
-        
-        # Update winrates when Player 1 played the given archetype
-        for i in range(len(temp_df1)):
-            row = temp_df1.iloc[i]
-            opposing_deck = row["Player 2"]
-
-            # add opposing deck to mu dict if its not already there; start WLT count at zero
-            if opposing_deck not in mu_dict:
-                mu_dict[opposing_deck] = {"wins": 0, "losses": 0, "ties": 0}
-
-            # Check result and update mu_dict
-            if row["Player 1 Deck"] == row["Player 2 Deck"]:
-                mu_dict[opposing_deck]["wins"] += 0.5
-                mu_dict[opposing_deck]["losses"] += 0.5
-            elif row["Winning Deck"] == row["Player 1 Deck"]:
-                mu_dict[opposing_deck]["wins"] += 1
-            elif (row["Winning Deck"] == row['Player 2 Deck']) or (row["Winning Deck"] == "Loss"):
-                mu_dict[opposing_deck]["losses"] += 1
-            elif row["Winning Deck"] == "Draw":
-                mu_dict[opposing_deck]["ties"] += 1
-            else:
-                games_dropped += 1
-                logging.info(f"Match result undetermined...\n{row}")
-        
-        # Update winrates when Player 2 played the given archetype
-        for i in range(len(temp_df2)):
-            row = temp_df2.iloc[i]
-            opposing_deck = row["Player 1"]
-
-            # add opposing deck to mu dict
-            if opposing_deck not in mu_dict:
-                mu_dict[opposing_deck] = {"wins": 0, "losses": 0, "ties": 0}
-
-            # Check result and update mu_dict
-            if row["Player 1 Deck"] == row["Player 2 Deck"]:
-                mu_dict[opposing_deck]["wins"] += 0.5
-                mu_dict[opposing_deck]["losses"] += 0.5
-            elif row["Winning Deck"] == row["Player 2 Deck"]:
-                mu_dict[opposing_deck]["wins"] += 1
-            elif (row["Winning Deck"] == row["Player 1 Deck"]) or (row["Winning Deck"] == "Loss"):
-                mu_dict[opposing_deck]["losses"] += 1
-            elif row["Winning Deck"] == "Draw":
-                mu_dict[opposing_deck]["ties"] += 1
-            else:
-                games_dropped += 1
-                logging.info(f"Match result undetermined...\n{row}")
+        for row in deck_counts.get(archetype, []):
+            add_counts(mu_dict, row.opposing_deck, row)
 
         # Update all_archetype_dict
         all_archetype_dict[archetype] = mu_dict
 
-    # logging.info(f"Games dropped .... {games_dropped}")
-
     return all_archetype_dict
 
 
-def archetype_wr_per_tournament(t_dict):
+def stack_rounds(t_dict):
+    """Stack the Pairings DataFrames of every round in a tournament into one DataFrame.
+
+    Arguments:
+        t_dict: Dictionary that contains the Players DataFrame and for each round in the 
+                tournament, the Pairings DataFrame.
+
+    Returns:
+        stacked_df (DataFrame): Pairings of every round, with the round number in a "Round" column.
+                                None if the tournament has no rounds.
+
+    """
+    round_dfs = []
+    for round_key, round_dict in t_dict["pairings"].items():
+        # Keys look like "round_3_dict" or "round_3_pairings"
+        round_num = int(round_key.split("_")[1])
+        round_dfs.append(round_dict["df"].assign(Round=round_num))
+
+    if len(round_dfs) == 0:
+        return None
+
+    return pd.concat(round_dfs, ignore_index=True)
+
+
+def archetype_wr_per_tournament(t_dict, single_pass=True):
     """Count wins, losses and ties for every matchup for a tournament.
 
     Counts wins, losses, and ties of each archetype against every other archetype in each
     round in the tournament.
 
+    By default all rounds are stacked into one DataFrame, so the decks are joined and the 
+    results are counted once for the whole tournament instead of once per round. This also 
+    gives the counts of every round under "t_wlt_by_round". With single_pass=False, 
+    archetype_wr_per_round is called for every round instead.
+
     Arguments: 
         t_dict: Dictionary that contains the Players DataFrame and for each round in the 
                 tournament, the Pairings DataFrame.
+        single_pass (bool): Count every round at once.
     
     Returns: 
         t_wlt_dict (dict): Nested dictionary where the keys are each archetype present at the
@@ -180,6 +317,9 @@ def archetype_wr_per_tournament(t_dict):
                                 }}
                             }  
 
+                           In single pass mode, t_wlt_dict also has a "t_wlt_by_round" key with 
+                           the same nested dictionary for every round number.
+
     """
     
     # Create empty dicionaries to store data
@@ -188,9 +328,37 @@ def archetype_wr_per_tournament(t_dict):
 
     standings_df = t_dict["players"]
     
-    for round_num in t_dict['pairings']:
-        round_dict = t_dict["pairings"][round_num]
-        all_archetype_dict = archetype_wr_per_round(round_dict, standings_df, all_archetype_dict)
+    if single_pass:
+        all_archetypes = standings_df['Deck'].unique().tolist()
+        by_round_dict = {}
+        stacked_df = stack_rounds(t_dict)
+
+        if stacked_df is not None:
+            # One join for every round, then count both sides of every pairing
+            round_df = deck_and_records({"df": stacked_df}, standings_df)
+            results = matchup_results(round_df)
+            results["Round"] = np.concatenate([round_df["Round"].to_numpy()] * 2)
+
+            # Order by round so opposing decks are first seen in the same order as round by round
+            results = results.sort_values("Round", kind="mergesort")
+
+            games_dropped = (results["result"] == UNDETERMINED).sum()
+            if games_dropped > 0:
+                logging.info(f"Match result undetermined for {games_dropped} results...")
+
+            counts = wlt_counts(results)
+            update_archetype_dict(all_archetype_dict, counts, all_archetypes)
+
+            round_counts = wlt_counts(results, keys=("Round", "deck", "opposing_deck"))
+            for round_num, counts in round_counts.groupby("Round", sort=True):
+                by_round_dict[round_num] = update_archetype_dict({}, counts, counts["deck"].unique().tolist())
+        # No rounds, nothing to count: all_archetype_dict stays empty, as it does round by round
+
+        t_wlt_dict["t_wlt_by_round"] = by_round_dict
+    else:
+        for round_num in t_dict['pairings']:
+            round_dict = t_dict["pairings"][round_num]
+            all_archetype_dict = archetype_wr_per_round(round_dict, standings_df, all_archetype_dict)
     
     # Save all_archetype_dict into t_wlt_dict
     t_wlt_dict["name"] = t_dict["name"]
@@ -201,14 +369,73 @@ def archetype_wr_per_tournament(t_dict):
     return t_wlt_dict
 
 
-def multi_tournament_wr_per_tournament(all_tournament_dict):
+# Columns the analysis reads; every other column is left behind when tournaments are sent to worker processes
+PAIRINGS_COLUMNS = ["Player 1 ID", "Player 2 ID", "Winner ID"]
+PLAYERS_COLUMNS = ["Player ID", "Deck"]
+
+# Number of chunks handed to each worker process when no chunksize is given
+CHUNKS_PER_WORKER = 4
+
+# Fewest tournaments per worker process. With fewer, e.g. a day's tournaments, starting the processes and
+# pickling the tournaments takes longer than counting them in this process
+MIN_TOURNAMENTS_PER_WORKER = 16
+
+
+def slim_tournament(t_dict):
+    """Copy a tournament dictionary with only the columns the analysis reads, so there is less to pickle."""
+    players_df = t_dict["players"]
+    pairings = {}
+    for round_key, round_dict in t_dict["pairings"].items():
+        round_df = round_dict["df"]
+        pairings[round_key] = {"df": round_df[[col for col in PAIRINGS_COLUMNS if col in round_df]]}
+
+    return {
+        "name": t_dict["name"],
+        "date": t_dict["date"],
+        "players": players_df[[col for col in PLAYERS_COLUMNS if col in players_df]],
+        "pairings": pairings
+    }
+
+
+def archetype_wr_per_tournament_chunk(chunk):
+    """Run archetype_wr_per_tournament on a list of (t_url, t_dict) pairs in a worker process."""
+    return [(t, archetype_wr_per_tournament(t_dict)) for t, t_dict in chunk]
+
+
+def pool_workers(n_tournaments, workers=None):
+    """Return the number of worker processes to count n_tournaments with; 1 means counting them in this process.
+
+    A process pool is only used with more than one CPU, and with at least MIN_TOURNAMENTS_PER_WORKER
+    tournaments for every worker.
+
+    Arguments:
+        n_tournaments (int): Number of tournaments to count.
+        workers (int): Most worker processes to use. None allows one per CPU.
+
+    Returns:
+        workers (int): Number of worker processes.
+
+    """
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, cpus, n_tournaments // MIN_TOURNAMENTS_PER_WORKER)
+
+    return max(workers, 1)
+
+
+def multi_tournament_wr_per_tournament(all_tournament_dict, workers=1, chunksize=None):
     """Count wins, losses and ties for every matchup for multiple tournaments. 
 
     Unpack the all_tournament_dict and count wins, losses and ties for each archetype for each tournament in
     the all_tournament_dictionary, and store the results in a dictionary.
 
+    Tournaments are counted in this process by default. Asked for more workers, they are counted in a process
+    pool if pool_workers says there are enough CPUs and tournaments for it to pay off.
+
     Arguments:
         all_tournament_dict (dict): Dictionary that contains Standings and Pairings for multiple tournaments. 
+        workers (int): Most worker processes. 1 counts every tournament in this process, None allows one per CPU.
+        chunksize (int): Number of tournaments sent to a worker at a time. Defaults to splitting the tournaments 
+                         into CHUNKS_PER_WORKER chunks per worker.
 
     Returns:
         all_tournament_results_dict (dict): Dictionary that counts the wins, losses, and ties for each archetype in 
@@ -219,14 +446,53 @@ def multi_tournament_wr_per_tournament(all_tournament_dict):
     
     # Empty dictionary to store results 
     all_tournament_results_dict = {}
-    
-    for t in all_tournament_dict:
-        t_dict = all_tournament_dict[t]
+
+    if workers != 1:
+        workers = pool_workers(len(all_tournament_dict), workers)
+
+    if workers <= 1:
+        for t in all_tournament_dict:
+            t_dict = all_tournament_dict[t]
+            
+            all_archetype_dict = archetype_wr_per_tournament(t_dict)
+            # Put results in all results dictionary 
+            all_tournament_results_dict[f"{t}"] = all_archetype_dict
         
-        all_archetype_dict = archetype_wr_per_tournament(t_dict)
-        # Put results in all results dictionary 
-        all_tournament_results_dict[f"{t}"] = all_archetype_dict
-    
+        return all_tournament_results_dict
+
+    return pooled_wr_per_tournament(all_tournament_dict, workers, chunksize)
+
+
+def pooled_wr_per_tournament(all_tournament_dict, workers, chunksize=None):
+    """Count wins, losses and ties for every matchup for multiple tournaments in a process pool.
+
+    Tournaments are sent to the workers in chunks, with only the columns the analysis reads, so pickling the 
+    DataFrames doesn't eat up the time saved. Results are always in the order of all_tournament_dict.
+
+    Arguments:
+        all_tournament_dict (dict): Dictionary that contains Standings and Pairings for multiple tournaments. 
+        workers (int): Number of worker processes.
+        chunksize (int): Number of tournaments sent to a worker at a time. Defaults to splitting the tournaments 
+                         into CHUNKS_PER_WORKER chunks per worker.
+
+    Returns:
+        all_tournament_results_dict (dict): Same as multi_tournament_wr_per_tournament.
+
+    """
+    all_tournament_results_dict = {}
+
+    # Split the tournaments into chunks, in order
+    items = [(f"{t}", slim_tournament(t_dict)) for t, t_dict in all_tournament_dict.items()]
+    chunksize = chunksize or -(-len(items) // (workers * CHUNKS_PER_WORKER))
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+    logging.info(f"Counting {len(items)} tournaments in {len(chunks)} chunks with {workers} worker processes...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map returns chunks in the order they were submitted
+        for chunk_results in pool.map(archetype_wr_per_tournament_chunk, chunks):
+            for t, all_archetype_dict in chunk_results:
+                all_tournament_results_dict[t] = all_archetype_dict
+
     return all_tournament_results_dict
         
     
@@ -252,11 +518,127 @@ def calc_wr(archetype_dict):
         archetype_dict[key]['games_played'] = games_played
         
         
+# Position of each count along the last axis of the matchup tensor
+WLT_KEYS = ["wins", "losses", "ties"]
+
+
+def build_matchup_tensor(all_tournament_results_dict):
+    """Encode the WLT counts of every tournament as integer codes and count arrays.
+
+    Tournaments and archetypes are given integer codes, and every (tournament, deck, opposing deck)
+    matchup that was played becomes one entry with its wins, losses and ties. Entries are kept in the
+    order of all_tournament_results_dict. This is the sparse form of an array with shape
+    (tournaments, decks, decks, 3): most decks never meet at a given tournament, so only the entries
+    that exist are stored. See dense_matchup_tensor for the dense array.
+
+    Arguments: 
+        all_tournament_results_dict (dict): Dictionary with the counts the wins, losses, and ties for each 
+                                            archetype in every tournament.
+
+    Returns:
+        tensor (dict): Dictionary with:
+                       "tournaments": list of tournament URLs, indexed by tournament code.
+                       "dates": list of tournament dates, indexed by tournament code.
+                       "decks": list of archetypes, indexed by deck code.
+                       "t_idx", "deck_idx", "opp_idx": integer codes of each entry.
+                       "wlt": float32 array of shape (entries, 3) with wins, losses and ties.
+
+    """
+    tournaments = list(all_tournament_results_dict.keys())
+    dates = [t_dict['date'] for t_dict in all_tournament_results_dict.values()]
+
+    t_idx = []
+    decks = []
+    opposing_decks = []
+    wlt = []
+
+    for t_i, t_dict in enumerate(all_tournament_results_dict.values()):
+        for deck_of_interest, archetype_dict in t_dict['t_wlt_dict'].items():
+            for opposing_deck, wlt_counts in archetype_dict.items():
+                t_idx.append(t_i)
+                decks.append(deck_of_interest)
+                opposing_decks.append(opposing_deck)
+                wlt.append([wlt_counts[key] for key in WLT_KEYS])
+
+    # One vocabulary for both sides of the matchup
+    deck_codes, deck_vocab = pd.factorize(pd.Series(decks + opposing_decks, dtype=object), use_na_sentinel=False)
+    code_dtype = np.int16 if len(deck_vocab) < np.iinfo(np.int16).max else np.int32
+
+    tensor = {
+        "tournaments": tournaments,
+        "dates": dates,
+        "decks": deck_vocab.tolist(),
+        "t_idx": np.array(t_idx, dtype=np.int32),
+        "deck_idx": deck_codes[:len(decks)].astype(code_dtype),
+        "opp_idx": deck_codes[len(decks):].astype(code_dtype),
+        # Counts are whole or half games, which float32 stores exactly
+        "wlt": np.array(wlt, dtype=np.float32).reshape(-1, len(WLT_KEYS)),
+    }
+
+    return tensor
+
+
+def matchup_winrates(wlt):
+    """Calculate win rates and games played from an array of WLT counts.
+
+    Arguments:
+        wlt (array): Array whose last axis holds wins, losses and ties.
+
+    Returns:
+        winrate (array): Wins divided by games played, rounded to 2 decimals. NaN if no games were played.
+        games_played (array): Wins, losses and ties added together.
+
+    """
+    wlt = np.asarray(wlt, dtype=np.float64)
+    games_played = wlt.sum(axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        winrate = wlt[..., 0] / games_played
+
+    # Python's round works on the exact binary value (round(0.475, 2) == 0.47) where np.round would give 0.48
+    winrate = np.array([round(wr, 2) for wr in winrate.ravel().tolist()], dtype=np.float64).reshape(winrate.shape)
+
+    return winrate, games_played
+
+
+def dense_matchup_tensor(tensor):
+    """Expand the matchup tensor into a dense array of shape (tournaments, decks, decks, 3).
+
+    Only use this for a handful of tournaments; the full history has hundreds of archetypes.
+    """
+    dense = np.zeros((len(tensor["tournaments"]), len(tensor["decks"]), len(tensor["decks"]), len(WLT_KEYS)), dtype=np.float32)
+    dense[tensor["t_idx"], tensor["deck_idx"], tensor["opp_idx"]] = tensor["wlt"]
+
+    return dense
+
+
+def sum_over_tournaments(tensor, tournament_mask=None):
+    """Add up the WLT counts of every matchup across tournaments.
+
+    Arguments:
+        tensor (dict): Output of build_matchup_tensor.
+        tournament_mask (array): Optional boolean array with one value per tournament; only 
+                                 tournaments marked True are added up.
+
+    Returns:
+        totals (array): Array of shape (decks, decks, 3) with the summed wins, losses and ties.
+
+    """
+    n_decks = len(tensor["decks"])
+    keep = slice(None) if tournament_mask is None else np.asarray(tournament_mask)[tensor["t_idx"]]
+
+    totals = np.zeros((n_decks, n_decks, len(WLT_KEYS)), dtype=np.float64)
+    np.add.at(totals, (tensor["deck_idx"][keep], tensor["opp_idx"][keep]), tensor["wlt"][keep])
+
+    return totals
+
+
 def multi_tournament_wr_calc(all_results_dict):
     """ Use the WLT counts for every deck and calculate win rates for multiple tournaments.
     
     For each tournament scraped, look at each deck played and look at its record against every archetype it played against 
-    in a given tournament. Use the WLT counts to calculate winrates. 
+    in a given tournament. Use the WLT counts to calculate winrates. The win rates are calculated for every matchup
+    at once from the matchup tensor, then written back into the dictionaries.
     
     Arguments: 
         all_results_dict (dict): Dictionary that contains a dictionary per tournament. Each tournament dictionary contains 
@@ -264,15 +646,25 @@ def multi_tournament_wr_calc(all_results_dict):
                                                      
     """
     
+    winrate, games_played = matchup_winrates(build_matchup_tensor(all_results_dict)["wlt"])
+
+    # Entries of the tensor are in the same order as the dictionaries
+    i = 0
     for t_dict in all_results_dict.values():
         for archetype_dict in t_dict['t_wlt_dict'].values():
-            calc_wr(archetype_dict)
-            
+            for wlt_counts in archetype_dict.values():
+                wlt_counts['winrate'] = winrate[i].item()
+                wlt_counts['games_played'] = games_played[i].item()
+                i += 1
+
+
 def create_plot_df(all_tournament_results_dict):
-    """Loop through all_tournament_results_dict to populate a DataFrame used for plotting later.
+    """Create the DataFrame used for plotting from the matchup tensor.
 
     Each row contains the active deck, the opposing deck, date of the tournament, the win rate for the 
     active deck against the opposing deck, and the number of games played between the two decks. 
+    Rows are in the same order as the dictionaries. multi_tournament_wr_calc doesn't need to be run 
+    first.
 
     Arguments: 
         all_tournaments_results_dict (dict): Dictionary with the counts the wins, losses, and ties for each archetype in 
@@ -286,22 +678,34 @@ def create_plot_df(all_tournament_results_dict):
 
     """
     
-    headers = ["deck", "opposing_deck", "t_url", "date", "wins", "winrate", "games_played"]
-    plot_df = pd.DataFrame(columns = headers)
+    return tensor_to_plot_df(build_matchup_tensor(all_tournament_results_dict))
 
-    # first loop gets t_dict as value
-    for t_url, t_dict in all_tournament_results_dict.items():
-        date = t_dict['date']
-        # Second loop will give us deck of interest name, and the archetype dict
-        for deck_of_interest, archetype_dict in t_dict['t_wlt_dict'].items():
-            # Third loop gives opposing deck name and WLT counts
-            for opposing_deck, wlt_counts in archetype_dict.items():
-                row = [deck_of_interest, opposing_deck, t_url, date, wlt_counts["wins"], wlt_counts['winrate'], wlt_counts['games_played']]
 
-                # Put data in df 
-                length = len(plot_df)
-                plot_df.loc[length] = row
+def tensor_to_plot_df(tensor):
+    """Turn the matchup tensor into plot_df by looking up every code at once.
 
+    Arguments:
+        tensor (dict): Output of build_matchup_tensor.
+
+    Returns:
+        plot_df (DataFrame): DataFrame with the deck, opposing deck, t_url, date, wins, losses, ties, winrate and 
+                             games_played of every matchup in the tensor.
+
+    """
+    winrate, games_played = matchup_winrates(tensor["wlt"])
+    decks = np.array(tensor["decks"], dtype=object)
+
+    plot_df = pd.DataFrame({
+        "deck": decks[tensor["deck_idx"]],
+        "opposing_deck": decks[tensor["opp_idx"]],
+        "t_url": np.array(tensor["tournaments"], dtype=object)[tensor["t_idx"]],
+        "date": np.array(tensor["dates"], dtype=object)[tensor["t_idx"]],
+        "wins": tensor["wlt"][:, 0].astype(np.float64),
+        "losses": tensor["wlt"][:, 1].astype(np.float64),
+        "ties": tensor["wlt"][:, 2].astype(np.float64),
+        "winrate": winrate,
+        "games_played": games_played,
+    })
 
     return plot_df
 
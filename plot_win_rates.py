@@ -2,28 +2,29 @@
 # coding: utf-8
 
 # Standard imports
-import numpy as np
+import os
 import pandas as pd
 
-from limitless_scrape import *
-from limitless_analysis import *
+# Read-only queries only; the scraper and its HTTP and HTML parsing stack are never imported by the web app
+from win_rate_queries import daily_win_rates, graph_inputs, heatmap_inputs, heatmap_tables, selected_decks
+from results_store import open_results
+from set_index import SetIndex
+from figure_cache import FigureCache
+from data_watcher import DataWatcher
 
 import textwrap
 
-import plotly.express as px
 import plotly.graph_objects as go
-import plotly 
 import dash 
 from dash import dcc
 from dash import html
 from dash.dependencies import Input, Output, State
+from flask import jsonify
 
 app = dash.Dash(__name__)
 server = app.server
 
 
-# Read in data
-plot_df = pd.read_csv('data_collection/results/latest/scrape_results.csv')
 set_calendar_df = pd.read_csv('set_release_calendar.csv')
 
 # Make sure set_names don't have white space
@@ -32,70 +33,107 @@ set_calendar_df["set_name"] = set_calendar_df["set_name"].str.strip()
 # Find latest set
 LATEST_SET = set_calendar_df["set_name"].unique().tolist()[-1]
 
+RESULTS_DB = os.environ.get('RESULTS_DB', 'data_collection/results/latest/results.db')
+
+class AppData:
+    """One version of the results: every set's matchups and deck lists, sliced once when the version is loaded."""
+
+    def __init__(self, db_path):
+        # The binary snapshot written by the pipeline if it is up to date, otherwise the results store
+        with open_results(db_path) as results:
+            self.version = results.version()
+            self.set_index = SetIndex(results, set_calendar_df)
+            self.decks = results.decks('deck')
+            self.opp_decks = results.decks('opposing_deck')
+
+# Load the results, and reload them in the background whenever the pipeline writes a new version.
+# Callbacks take app_data.get() once, so they only ever see one complete version
+app_data = DataWatcher(RESULTS_DB, AppData)
+
+# Each worker starts its own watcher on its first request, so nothing polls in the gunicorn master,
+# which preloads the app and forks the workers
+server.before_request(app_data.start)
+
+# Figures are cached on disk for every worker, keyed by the version of the data they were built from
+figure_cache = FigureCache()
+
+def current_data_version():
+    return app_data.get().version
+
+@server.route("/cache-stats")
+def cache_stats():
+    return jsonify(figure_cache.stats())
+
 def textwrapper(s, width=50):
     return "<br>".join(textwrap.wrap(s,width=width))
 
-app.layout = html.Div([
+# The layout is built for every page load, so the dropdowns list the decks of the version being served
+def serve_layout():
+    data = app_data.get()
+
+    return html.Div([
     
-    html.Div(
-        className="my_row",
-        children=[ 
-            html.Div(
-                className="dropdown_card",
-                children=[
-                    html.Label(["Choose archetypes to display on the graph:"], style={'font-weight': 'bold', "display": "block", "text-align": "center"}),
-                    dcc.Dropdown(
-                        id='dropdown_format', 
-                        options=[{'label': x, 'value': x} for x in set_calendar_df['set_name'].unique()], 
-                        value=LATEST_SET,
-                        multi=False, 
-                        disabled=False,
-                        clearable=True, 
-                        searchable=True,
-                        placeholder='Select a set',
-                        persistence=True, 
-                        persistence_type='memory'),
+        html.Div(
+            className="my_row",
+            children=[ 
+                html.Div(
+                    className="dropdown_card",
+                    children=[
+                        html.Label(["Choose archetypes to display on the graph:"], style={'font-weight': 'bold', "display": "block", "text-align": "center"}),
+                        dcc.Dropdown(
+                            id='dropdown_format', 
+                            options=[{'label': x, 'value': x} for x in set_calendar_df['set_name'].unique()], 
+                            value=LATEST_SET,
+                            multi=False, 
+                            disabled=False,
+                            clearable=True, 
+                            searchable=True,
+                            placeholder='Select a set',
+                            persistence=True, 
+                            persistence_type='memory'),
                     
-                    dcc.Dropdown(
-                        id='dropdown_deck', 
-                        options=[{'label': x, 'value': x} for x in plot_df.sort_values('deck')['deck'].unique()], 
-            #           value='Mew Genesect',
-                        multi=False, 
-                        disabled=False,
-                        clearable=True, 
-                        searchable=True,
-                        placeholder='Select archetype',
-                        persistence='string', 
-                        persistence_type='memory'),
+                        dcc.Dropdown(
+                            id='dropdown_deck', 
+                            options=[{'label': x, 'value': x} for x in data.decks], 
+                #           value='Mew Genesect',
+                            multi=False, 
+                            disabled=False,
+                            clearable=True, 
+                            searchable=True,
+                            placeholder='Select archetype',
+                            persistence='string', 
+                            persistence_type='memory'),
                     
-                    dcc.Dropdown(
-                        id='dropdown_opp_deck', 
-                        options=[{'label': x, 'value': x} for x in plot_df.sort_values('opposing_deck')['opposing_deck'].unique()], 
-                        value = ["Palkia Inteleon", "Mew Genesect", "Kyurem Palkia", "Giratina LZ Box", "Lost Zone Box"],
-                        multi=True, 
-                        disabled=False,
-                        clearable=True, 
-                        searchable=True,
-                        placeholder='Show winrates against...',
-                        persistence='string', 
-                        persistence_type='memory'),
-                ])
+                        dcc.Dropdown(
+                            id='dropdown_opp_deck', 
+                            options=[{'label': x, 'value': x} for x in data.opp_decks], 
+                            value = ["Palkia Inteleon", "Mew Genesect", "Kyurem Palkia", "Giratina LZ Box", "Lost Zone Box"],
+                            multi=True, 
+                            disabled=False,
+                            clearable=True, 
+                            searchable=True,
+                            placeholder='Show winrates against...',
+                            persistence='string', 
+                            persistence_type='memory'),
+                    ])
+                ]
+        ),
+
+        html.Div(
+            className="my_row",
+            children=[
+                html.Div([
+                    dcc.Graph(id='our_graph')
+                    ], className='graph_card'),
+
+                html.Div([
+                    dcc.Graph(id='heatmap')
+                    ], className='graph_card'),
             ]
-    ),
-
-    html.Div(
-        className="my_row",
-        children=[
-            html.Div([
-                dcc.Graph(id='our_graph')
-                ], className='graph_card'),
-
-            html.Div([
-                dcc.Graph(id='heatmap')
-                ], className='graph_card'),
-        ]
-    )
-], className="create_container")        
+        )
+    ], className="create_container")
+
+app.layout = serve_layout
         
 
 # Filter what active decks are available in the dropdown based on format that is selected
@@ -104,13 +142,8 @@ app.layout = html.Div([
     Input('dropdown_format', 'value')
 )
 def available_active_decks(selected_format):
-    # Filter by date
-    set_df = set_calendar_df[set_calendar_df["set_name"]==selected_format]
-    start_date = set_df.iloc[0]['start_date']
-    end_date = set_df.iloc[0]['end_date']
-    
-    filtered_by_date_df = plot_df[(plot_df['date'] >= start_date) & (plot_df['date'] <= end_date)]
-    return [{'label': x, 'value': x} for x in filtered_by_date_df.sort_values('deck')['deck'].unique()]
+    # Decks played within the set's dates
+    return [{'label': x, 'value': x} for x in app_data.get().set_index.decks(selected_format)]
 
 # Set active deck to most popular deck
 @app.callback(
@@ -118,18 +151,8 @@ def available_active_decks(selected_format):
     Input('dropdown_format', 'value')
 )
 def set_active_deck(selected_format):
-    # Filter by date
-    set_df = set_calendar_df[set_calendar_df["set_name"]==selected_format]
-    start_date = set_df.iloc[0]['start_date']
-    end_date = set_df.iloc[0]['end_date']
-    
-    filtered_by_date_df = plot_df[(plot_df['date'] >= start_date) & (plot_df['date'] <= end_date)]
-
-    # group by games played 
-    gp_df = filtered_by_date_df.groupby('deck').sum()['games_played'].reset_index()
-
     # Return top played deck 
-    return [{'label': x, 'value': x} for x in gp_df.sort_values('games_played', ascending=False)['deck'].unique()][0]['value']
+    return app_data.get().set_index.top_decks(selected_format, 1)[0]
 
 
 # Filter what opposing decks are available in the dropdown based on the format and active deck selected
@@ -141,18 +164,8 @@ def set_active_deck(selected_format):
     ]
 )
 def available_opp_decks(selected_format, selected_active_deck):
-    # Filter by date
-    set_df = set_calendar_df[set_calendar_df["set_name"]==selected_format]
-    start_date = set_df.iloc[0]['start_date']
-    end_date = set_df.iloc[0]['end_date']
-    
-    filtered_by_date_df = plot_df[(plot_df['date'] >= start_date) & (plot_df['date'] <= end_date)]
-    
-    # Filter for deck of interest
-    filtered_df = filter_plot_df(filtered_by_date_df, selected_active_deck)
-    
-    # Return list of opposing decks after filters are applied 
-    return [{'label': x, 'value': x} for x in filtered_df.sort_values('opposing_deck')['opposing_deck'].unique()]
+    # Return list of opposing decks the deck of interest played against in the set
+    return [{'label': x, 'value': x} for x in app_data.get().set_index.opp_decks(selected_format, selected_active_deck)]
 
 # Set opposing decks to top 5 most played in the selected format
 @app.callback(
@@ -160,18 +173,8 @@ def available_opp_decks(selected_format, selected_active_deck):
     Input('dropdown_format', 'value'),
 )
 def available_opp_decks(selected_format):
-    # Filter by date
-    set_df = set_calendar_df[set_calendar_df["set_name"]==selected_format]
-    start_date = set_df.iloc[0]['start_date']
-    end_date = set_df.iloc[0]['end_date']
-    
-    filtered_by_date_df = plot_df[(plot_df['date'] >= start_date) & (plot_df['date'] <= end_date)]
-
-    # group by games played 
-    gp_df = filtered_by_date_df.groupby('deck').sum('games_played').reset_index()
-    
     # Return 5 most played deck  
-    return  [x['value'] for x in [{'label': x, 'value': x} for x in gp_df.sort_values('games_played', ascending=False)['deck'].unique()]][0:5]
+    return app_data.get().set_index.top_decks(selected_format, 5)
 
 
 # Plot our graph based on our selections in the dropdown 
@@ -183,7 +186,7 @@ def available_opp_decks(selected_format):
         Input('dropdown_opp_deck', 'value')
      ]
      )
-     
+@figure_cache.memoize("build_graph", current_data_version, graph_inputs)
 def build_graph(dropdown_format, dropdown_deck, dropdown_opp_deck):
     """Plot win rates for selected active deck and selected opposing decks in the selected format.
 
@@ -202,32 +205,15 @@ def build_graph(dropdown_format, dropdown_deck, dropdown_opp_deck):
                                          menus.  
     """
      
-    # Get a set's start and end date
-    set_df = set_calendar_df[set_calendar_df["set_name"]==dropdown_format]
-    start_date = set_df.iloc[0]['start_date']
-    end_date = set_df.iloc[0]['end_date']
-    
-    # Filter dataframe by date
-    format_df = plot_df[(plot_df['date'] >= start_date) & (plot_df['date'] <= end_date)]
-    
-    # Filter for deck of interest
-    active_deck_df = filter_plot_df(format_df, dropdown_deck)
-    
-    # Filter the data for opposing deck
-    opp_deck_df = active_deck_df[active_deck_df["opposing_deck"].isin(dropdown_opp_deck)]
+    # Look up the matchups of the deck of interest against the opposing decks within the set
+    opp_deck_df = app_data.get().set_index.matchups(dropdown_format, [dropdown_deck], opposing_decks=dropdown_opp_deck)
 
     # Aggregate by day - need weighted win rates here
-    gp_per_day = opp_deck_df.groupby(["deck", "opposing_deck", "date"]).sum().reset_index()
-    gp_per_day["gp_per_day"] = gp_per_day["games_played"]
-    
-    join_conditions = ["deck", "opposing_deck", "date"]
-    weighted_df = opp_deck_df.merge(gp_per_day[["deck", "opposing_deck", "date", "gp_per_day"]], how="left", on=join_conditions)
-
-    weighted_df['wt'] = weighted_df["games_played"] / weighted_df["gp_per_day"]
-    weighted_df['wt_wr'] = round(weighted_df['winrate'] * weighted_df['wt'], 2)
-
-    weighted_df = weighted_df.groupby(["deck", "opposing_deck", "date"]).sum(["games_played", "wt_wr"]).reset_index()
+    weighted_df = daily_win_rates(opp_deck_df)
      
+    # plotly.express is only imported once a line graph is drawn
+    import plotly.express as px
+
     # Create line graph
     fig = px.scatter(weighted_df, 
                      x='date', 
@@ -265,66 +251,16 @@ def build_graph(dropdown_format, dropdown_deck, dropdown_opp_deck):
         Input('dropdown_opp_deck', 'value')
      ]
      )  
+@figure_cache.memoize("build_heatmap", current_data_version, heatmap_inputs)
 def build_heatmap(selected_format, selected_active_deck, selected_opp_deck):
-    # Filter by selected format 
-    set_df = set_calendar_df[set_calendar_df["set_name"]==selected_format]
-    start_date = set_df.iloc[0]['start_date']
-    end_date = set_df.iloc[0]['end_date']
-    
-    # Filter dataframe by date
-    format_df = plot_df[(plot_df['date'] >= start_date) & (plot_df['date'] <= end_date)]   
-
-    # Create list of decks selected in dropdown 
-    selected_opp_deck.append(selected_active_deck)
-    unique_decks = []
-    for deck in selected_opp_deck:
-        if deck not in unique_decks:
-            unique_decks.append(deck)
+    # Create list of decks selected in dropdown, without changing the dropdown's list
+    unique_decks = selected_decks(selected_active_deck, selected_opp_deck)
     
-    # Filter active deck by decks in unique decks, filter again on opposing deck by unique decks also 
-    active_deck_df = format_df[format_df['deck'].isin(unique_decks)] 
-    filtered_df = active_deck_df[active_deck_df['opposing_deck'].isin(unique_decks)]
-
-    # blank heatmaps for wins and games played
-    heatmap_gp = pd.DataFrame(columns=unique_decks, index=unique_decks)
-    heatmap_wr = pd.DataFrame(columns=unique_decks, index=unique_decks)
-
-    # Get total games played and weighted win rates
-    filtered_df["total_games"] = filtered_df.apply(lambda x: total_gp(filtered_df, x), axis=1)
-    filtered_df["weight"] = filtered_df["games_played"]/filtered_df["total_games"]
-    filtered_df["wt_wr"] = filtered_df["winrate"] * filtered_df["weight"]
-    
-    # Create aggregated df 
-    agg_df = filtered_df.groupby(['deck', 'opposing_deck']).agg({"wt_wr": "sum", "games_played": "sum"}).reset_index()
+    # Look up matchups within the set where both the active and opposing deck are in unique decks
+    filtered_df = app_data.get().set_index.matchups(selected_format, unique_decks, opposing_decks=unique_decks)
 
-    # Loop through active decks to fill in columns in blank heatmaps
-    for active_deck in heatmap_wr:
-        filtered_df = agg_df[agg_df['deck']==active_deck]
-        
-        # Find win rate for every deck in index (opposing deck)
-        wr_ls = []
-        gp_ls = []
-        for deck in heatmap_wr.index:
-            if deck in filtered_df['opposing_deck'].unique():
-                winrate = filtered_df[filtered_df['opposing_deck']==deck].iloc[0]['wt_wr']
-                gp = filtered_df[filtered_df['opposing_deck']==deck].iloc[0]['games_played']
-                wr_ls.append(round(winrate,2))
-                gp_ls.append(gp)
-            else:
-                winrate = None
-                wr_ls.append(winrate)
-                gp_ls.append(None)
-            
-        # set column to mu 
-        heatmap_wr[active_deck] = wr_ls
-        heatmap_gp[active_deck] = gp_ls
-
-    # Heatmap hovertext
-    hovertext = []
-    for xi, xx in enumerate(heatmap_wr.columns):
-        hovertext.append(list())
-        for yi, yy in enumerate(heatmap_wr.index):
-            hovertext[-1].append(f"Active Deck: {yy}<br />Opposing Deck: {xx}<br />Win Rate: {heatmap_wr.values[xi][yi]}<br />Games Played: {heatmap_gp.values[xi][yi]}")
+    # Weighted win rates of every pair of decks, and the heatmap hovertext
+    heatmap_wr, hovertext = heatmap_tables(filtered_df, unique_decks)
 
     fig = go.Figure(data=go.Heatmap(
                    z=heatmap_wr.values,
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# imports
+import numpy as np
+import pandas as pd
+
+# Text columns of plot_df, kept as codes into their distinct values
+CATEGORY_COLUMNS = ["deck", "opposing_deck", "t_url", "date"]
+
+
+class SetIndex:
+    """Matchups of every set, sliced once when the app starts, with the deck lists the dropdowns need.
+
+    For every set in the calendar, keeps the set's rows of plot_df split by active deck, the active
+    decks sorted by name and by games played, and the sorted opposing decks of every active deck.
+    The callbacks look these up by set name instead of filtering the calendar and querying the whole
+    results store on every dropdown change.
+
+    Each set's rows are kept once, as one flat read-only array per column, with the deck, URL and date
+    columns stored as integer codes into their distinct values; the rows of an active deck are an array
+    of positions. Under gunicorn's preload, workers share these arrays with the master, where a frame
+    of Python strings would be copied into every worker as soon as its refcounts were touched.
+
+    Arguments:
+        results_store (ResultsStore): Store, or up to date ResultsSnapshot, to read the matchups from.
+        set_calendar_df (DataFrame): Name, start date and end date of every set.
+    """
+
+    def __init__(self, results_store, set_calendar_df):
+        self.sets = {}
+        for set_name, start_date, end_date in set_calendar_df[["set_name", "start_date", "end_date"]].itertuples(index=False):
+            if set_name not in self.sets:
+                self.sets[set_name] = self._build_set(results_store, start_date, end_date)
+
+    @staticmethod
+    def _build_set(results_store, start_date, end_date):
+        set_df = results_store.query(start_date, end_date)
+        gp_df = results_store.games_per_deck(start_date, end_date)
+
+        columns = {}
+        categories = {}
+        for col in set_df.columns:
+            values = set_df[col].to_numpy()
+            if col in CATEGORY_COLUMNS:
+                codes, uniques = pd.factorize(values)
+                # Missing values have no code, so such a column is kept as it is
+                if len(codes) == 0 or codes.min() >= 0:
+                    values = codes.astype(np.int32)
+                    categories[col] = pd.Index(uniques, dtype=object)
+            values.flags.writeable = False
+            columns[col] = values
+
+        # Positions of each active deck's rows, in the order they were stored
+        deck_rows = set_df.groupby("deck", sort=False).indices
+
+        # Opposing decks are never missing, so they always have codes
+        opp_codes, opp_names = columns["opposing_deck"], categories["opposing_deck"].to_numpy()
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "empty_df": set_df.iloc[:0].copy(),
+            "columns": columns,
+            "categories": categories,
+            "deck_rows": deck_rows,
+            "decks": gp_df["deck"].unique().tolist(),
+            "decks_by_games": gp_df.sort_values("games_played", ascending=False)["deck"].unique().tolist(),
+            "opp_decks": {deck: sorted(opp_names[np.unique(opp_codes[rows])].tolist()) for deck, rows in deck_rows.items()},
+        }
+
+    def dates(self, set_name):
+        """Return the start and end date of a set."""
+        set_entry = self.sets[set_name]
+
+        return set_entry["start_date"], set_entry["end_date"]
+
+    def decks(self, set_name):
+        """Return the active decks played during a set, sorted by name."""
+        return self.sets[set_name]["decks"]
+
+    def top_decks(self, set_name, n=None):
+        """Return the n most played active decks of a set (all of them if n is None), most played first."""
+        return self.sets[set_name]["decks_by_games"][:n]
+
+    def opp_decks(self, set_name, deck):
+        """Return the decks an active deck played against during a set, sorted by name."""
+        return self.sets[set_name]["opp_decks"].get(deck, [])
+
+    def matchups(self, set_name, decks, opposing_decks=None):
+        """Return a set's matchups of some active decks, optionally only against some opposing decks.
+
+        Arguments:
+            set_name (str): Name of the set.
+            decks (list): Active decks.
+            opposing_decks (list): Only return matchups against these decks.
+
+        Returns:
+            plot_df (DataFrame): The matching rows of plot_df, with win rates.
+
+        """
+        set_entry = self.sets[set_name]
+        deck_rows = [set_entry["deck_rows"][deck] for deck in dict.fromkeys(decks) if deck in set_entry["deck_rows"]]
+        if not deck_rows:
+            return set_entry["empty_df"].copy()
+
+        # Sorted positions keep the order the rows were stored in
+        rows = np.sort(np.concatenate(deck_rows))
+        columns, categories = set_entry["columns"], set_entry["categories"]
+        if opposing_decks is not None:
+            if "opposing_deck" in categories:
+                codes = categories["opposing_deck"].get_indexer(list(opposing_decks))
+                rows = rows[np.isin(columns["opposing_deck"][rows], codes[codes >= 0])]
+            else:
+                rows = rows[pd.Series(columns["opposing_deck"][rows]).isin(list(opposing_decks)).to_numpy()]
+
+        return pd.DataFrame({col: categories[col].to_numpy()[values[rows]] if col in categories else values[rows]
+                             for col, values in columns.items()})
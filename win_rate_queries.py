@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Read-only win rate queries behind the Dash app's callbacks.
+
+Only needs numpy and pandas: nothing here scrapes, parses HTML or plots, so the web workers don't import
+the scraper, its HTTP and HTML parsing stack or plotly.express to answer a dropdown change.
+"""
+
+# imports
+import numpy as np
+
+MATCHUP_DAY = ["deck", "opposing_deck", "date"]
+
+
+def graph_inputs(dropdown_format, dropdown_deck, dropdown_opp_deck):
+    """Normalize the line graph's inputs; the graph doesn't depend on the order the opposing decks were picked in."""
+    return [dropdown_format, dropdown_deck, sorted(set(dropdown_opp_deck)) if dropdown_opp_deck is not None else None]
+
+
+def selected_decks(selected_active_deck, selected_opp_deck):
+    """Return the opposing decks then the active deck, without duplicates or changing the dropdown's list."""
+    return list(dict.fromkeys((selected_opp_deck or []) + [selected_active_deck]))
+
+
+def heatmap_inputs(selected_format, selected_active_deck, selected_opp_deck):
+    """Normalize the heatmap's inputs; its axes follow the order the decks were picked in."""
+    return [selected_format, selected_decks(selected_active_deck, selected_opp_deck)]
+
+
+def daily_win_rates(opp_deck_df):
+    """Weight each tournament's win rate by its share of the day's games, and add them up per matchup and day.
+
+    Arguments:
+        opp_deck_df (DataFrame): Matchups of the active deck against the selected opposing decks.
+
+    Returns:
+        weighted_df (DataFrame): One row per (deck, opposing_deck, date), with the weighted win rate in wt_wr
+                                 and the day's games played.
+
+    """
+    gp_per_day = opp_deck_df.groupby(MATCHUP_DAY).sum().reset_index()
+    gp_per_day["gp_per_day"] = gp_per_day["games_played"]
+
+    weighted_df = opp_deck_df.merge(gp_per_day[MATCHUP_DAY + ["gp_per_day"]], how="left", on=MATCHUP_DAY)
+
+    weighted_df['wt'] = weighted_df["games_played"] / weighted_df["gp_per_day"]
+    weighted_df['wt_wr'] = round(weighted_df['winrate'] * weighted_df['wt'], 2)
+
+    return weighted_df.groupby(MATCHUP_DAY).sum(["games_played", "wt_wr"]).reset_index()
+
+
+def heatmap_tables(filtered_df, unique_decks):
+    """Average win rate of every pair of selected decks across tournaments, weighted by games played.
+
+    Arguments:
+        filtered_df (DataFrame): Matchups where both the active and opposing deck are in unique_decks.
+        unique_decks (list): Selected decks, in the order they were picked.
+
+    Returns:
+        heatmap_wr (DataFrame): Win rates rounded to 2 places, active decks as columns and opposing decks
+                                as rows. Active decks without any matchup are None rather than NaN.
+        hovertext (list): Hover text of every cell, row by row.
+
+    """
+    # Get total games played and weighted win rates
+    filtered_df["total_games"] = filtered_df.groupby(["deck", "opposing_deck"])["games_played"].transform("sum")
+    filtered_df["weight"] = filtered_df["games_played"]/filtered_df["total_games"]
+    filtered_df["wt_wr"] = filtered_df["winrate"] * filtered_df["weight"]
+
+    # Create aggregated df
+    agg_df = filtered_df.groupby(['deck', 'opposing_deck']).agg({"wt_wr": "sum", "games_played": "sum"}).reset_index()
+
+    # Active decks as columns, opposing decks as rows, in the order the decks were selected
+    heatmap_wr = agg_df.pivot(index="opposing_deck", columns="deck", values="wt_wr").reindex(index=unique_decks, columns=unique_decks).round(2)
+    heatmap_gp = agg_df.pivot(index="opposing_deck", columns="deck", values="games_played").reindex(index=unique_decks, columns=unique_decks)
+
+    # Active decks without any matchup are None rather than NaN
+    for heatmap in (heatmap_wr, heatmap_gp):
+        for active_deck in heatmap.columns[heatmap.isna().all()]:
+            heatmap[active_deck] = [None] * len(heatmap)
+
+    # Heatmap hovertext; a cleared active deck dropdown gives None, shown as "None"
+    decks = np.array([str(deck) for deck in unique_decks], dtype=object)
+    hovertext = ("Active Deck: " + decks[np.newaxis, :] + "<br />Opposing Deck: " + decks[:, np.newaxis]
+                 + "<br />Win Rate: " + heatmap_wr.values.astype(str).astype(object)
+                 + "<br />Games Played: " + heatmap_gp.values.astype(str).astype(object)).tolist()
+
+    return heatmap_wr, hovertext